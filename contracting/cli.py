@@ -0,0 +1,177 @@
+import argparse
+import json
+import platform
+import sys
+
+from contracting.compilation import batch
+from contracting.execution import bundle, replay
+from contracting.execution.metering import calibration, profiler
+
+
+def print_replay(summary, out):
+    latency = summary['latency']
+
+    print('transactions:  {} ({} failed)'.format(summary['transactions'], summary['failed']), file=out)
+    print('time:          {:.3f}s'.format(summary['seconds']), file=out)
+    print('tx/s:          {:.1f}'.format(summary['transactions_per_second']), file=out)
+    print('stamps/s:      {:.1f}'.format(summary['stamps_per_second']), file=out)
+    print('latency (ms):  p50 {:.3f}  p90 {:.3f}  p99 {:.3f}  max {:.3f}'.format(
+        latency['p50'] * 1000, latency['p90'] * 1000, latency['p99'] * 1000, latency['max'] * 1000), file=out)
+
+    if summary['checked']:
+        print('write sets:    {} checked, {} mismatched'.format(summary['checked'], summary['mismatched']), file=out)
+
+    for m in summary['mismatches']:
+        print('  #{transaction} {contract}.{function}: '
+              'missing {missing} extra {extra} changed {changed}'.format(**m), file=out)
+
+        if m['missing_deletes'] or m['extra_deletes']:
+            print('    deletes: missing {missing_deletes} extra {extra_deletes}'.format(**m), file=out)
+
+        if m['missing_deltas'] or m['extra_deltas'] or m['changed_deltas']:
+            print('    deltas: missing {missing_deltas} extra {extra_deltas} changed {changed_deltas}'.format(**m),
+                  file=out)
+
+
+def run_replay(args, out=sys.stdout):
+    report = replay.replay_file(args.log,
+                                db=args.db,
+                                collection=args.collection,
+                                commit=args.commit,
+                                verify=args.verify,
+                                metering=not args.no_metering,
+                                limit=args.limit,
+                                profile=args.profile is not None)
+
+    summary = report.summary()
+
+    if args.profile is not None:
+        with open(args.profile, 'w') as f:
+            profiler.write_collapsed(profiler.entries(report.profile), f)
+
+    if args.json:
+        print(json.dumps(summary), file=out)
+    else:
+        print_replay(summary, out)
+
+    # A mismatched write set means the upgrade under test is not deterministic against the log.
+    return 1 if summary['mismatched'] else 0
+
+
+def print_calibration(summary, out):
+    print('python:        {} on {}'.format(summary['python'], summary['machine']), file=out)
+    print('{:<20} {:>10} {:>10} {:>10}'.format('workload', 'us/iter', 'current', 'candidate'), file=out)
+    for w in summary['workloads']:
+        print('{name:<20} {microseconds:>10.3f} {current:>10.0f} {candidate:>10.0f}'.format(**w), file=out)
+
+    print('most mispriced opcodes:', file=out)
+    for op in summary['mispriced']:
+        print('  {name:<24} current {current:>5}  candidate {candidate:>5}'.format(**op), file=out)
+
+
+def run_calibrate(args, out=sys.stdout):
+    try:
+        report = calibration.calibrate(repeat=args.repeat)
+    except NotImplementedError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            calibration.write_table(report.candidate, f, note='Calibrated on {} {}.'.format(
+                platform.machine(), platform.python_version()))
+
+    summary = report.summary(top=args.top)
+
+    if args.json:
+        print(json.dumps(summary), file=out)
+    else:
+        print_calibration(summary, out)
+
+    return 0
+
+
+def print_batch(results, out):
+    failed = 0
+    for result in results:
+        if result['violations']:
+            failed += 1
+
+        for v in result['violations']:
+            print('{}:{}: {} {}'.format(result['path'], v['line'] or 0, v['code'], v['message']), file=out)
+
+    print('{} contracts, {} with violations'.format(len(results), failed), file=out)
+
+
+def run_batch(args, out=sys.stdout):
+    results = batch.process(args.paths, mode=args.command, jobs=args.jobs, output=getattr(args, 'output', None))
+
+    if args.json:
+        print(json.dumps(results), file=out)
+    else:
+        print_batch(results, out)
+
+    return 1 if any(result['violations'] for result in results) else 0
+
+
+def run_bundle(args, out=sys.stdout):
+    count = bundle.export_bundle(args.output, db=args.db, collection=args.collection, names=args.contracts)
+    print('{} contracts written to {}'.format(count, args.output), file=out)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='contracting', description='Contracting command line tools.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    r = commands.add_parser('replay', help='Replay a JSONL transaction log against a state snapshot.')
+    r.add_argument('log', help='JSONL file with one transaction per line.')
+    r.add_argument('--db', default='lamden', help='Database holding the snapshot.')
+    r.add_argument('--collection', default='state', help='Collection holding the snapshot.')
+    r.add_argument('--commit', action='store_true', help='Write results into the snapshot instead of memory.')
+    r.add_argument('--verify', action='store_true',
+                   help='Compare the writes, deletes and deltas of each transaction with the recorded ones.')
+    r.add_argument('--no-metering', action='store_true', help='Run without stamp metering.')
+    r.add_argument('--limit', type=int, default=None, help='Stop after this many transactions.')
+    r.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    r.add_argument('--profile', metavar='PATH', default=None,
+                   help='Write where the stamps went, as folded stacks for flamegraphs, to this file.')
+    r.set_defaults(func=run_replay)
+
+    c = commands.add_parser('calibrate', help='Fit opcode costs to how long opcodes take on this machine.')
+    c.add_argument('--output', metavar='PATH', default=None, help='Write the candidate cost table to this file.')
+    c.add_argument('--repeat', type=int, default=5, help='Time each workload this many times and keep the best.')
+    c.add_argument('--top', type=int, default=10, help='How many mispriced opcodes to report.')
+    c.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    c.set_defaults(func=run_calibrate)
+
+    for command, description in ((batch.LINT, 'Lint contracts, in parallel.'),
+                                 (batch.COMPILE, 'Lint and compile contracts, in parallel.')):
+        b = commands.add_parser(command, help=description)
+        b.add_argument('paths', nargs='+', help='Contract files, or directories to search for {} files.'.format(
+            batch.CONTRACT_SUFFIX))
+        b.add_argument('--jobs', '-j', type=int, default=None, help='Worker processes. Defaults to one per CPU.')
+        b.add_argument('--json', action='store_true', help='Print the results as JSON.')
+        if command == batch.COMPILE:
+            b.add_argument('--output', metavar='DIR', default=None,
+                           help='Write the compiled source of each contract into this directory.')
+        b.set_defaults(func=run_batch)
+
+    e = commands.add_parser('bundle', help='Pack the compiled contracts in a database into one file for fast loading.')
+    e.add_argument('output', help='File to write the bundle to.')
+    e.add_argument('--db', default='lamden', help='Database holding the contracts.')
+    e.add_argument('--collection', default='state', help='Collection holding the contracts.')
+    e.add_argument('--contracts', nargs='+', default=None, help='Only bundle these contracts.')
+    e.set_defaults(func=run_bundle)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
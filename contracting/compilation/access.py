@@ -0,0 +1,286 @@
+import ast
+import sys
+
+from contracting import config
+
+# What each exported function of a contract may read and write, worked out from its source. Summaries are
+# conservative: a function may touch less than its summary says, never more, unless the summary is marked dynamic,
+# which means it does something (importlib, a foreign hash named at runtime, a call into a contract with no summary)
+# whose reach can't be known ahead of time.
+#
+# State is named down to the variable, as '<contract>.<variable>', since keys inside a Hash are only known at runtime.
+# Calls into imported contracts are listed as '<contract>.<function>' and folded into the summary by resolve().
+#
+# Summaries only cover what contract code does. The executor's write to the sender's balance in the currency contract,
+# which pays for every metered transaction, is left out of all of them, so a scheduler has to count it separately.
+
+READ_METHODS = {'get', 'all', 'iter', 'top', 'range', 'rank'}
+WRITE_METHODS = {'set', 'add'}
+
+MODULE = '<module>'
+
+FOREIGN_CLASS_NAMES = {'ForeignVariable', 'ForeignHash'}
+
+# Writing to these reads the old value too
+ORDERED_CLASS_NAMES = {'OrderedHash'}
+
+# Adding to these with += or -= doesn't read them
+COUNTER_CLASS_NAMES = {'Counter'}
+
+# Names that reach contracts chosen at runtime: importlib imports them by name and __Contract submits new ones, as the
+# submission contract does
+DYNAMIC_NAMES = {'importlib', '__Contract'}
+
+# System contracts are written with the decorator the compiler turns @export into
+PRIVATE_EXPORT_DECORATOR = config.PRIVATE_METHOD_PREFIX + config.EXPORT_DECORATOR_STRING
+
+
+def string_constant(node):
+    if sys.version_info < (3, 8):
+        return node.s if isinstance(node, ast.Str) else None
+    return node.value if isinstance(node, ast.Constant) and isinstance(node.value, str) else None
+
+
+def state_key(contract, name):
+    return '{}{}{}'.format(contract, config.INDEX_SEPARATOR, name)
+
+
+def call_key(contract, function):
+    return '{}{}{}'.format(contract, config.INDEX_SEPARATOR, function)
+
+
+class Summary:
+    def __init__(self):
+        self.reads = set()
+        self.writes = set()
+        self.calls = set()  # Functions of imported contracts
+        self.local_calls = set()  # Functions of this contract
+        self.dynamic = False
+
+    def merge(self, other):
+        self.reads |= other.reads
+        self.writes |= other.writes
+        self.calls |= other.calls
+        self.dynamic = self.dynamic or other.dynamic
+
+    def to_dict(self):
+        return {
+            'reads': sorted(self.reads),
+            'writes': sorted(self.writes),
+            'calls': sorted(self.calls),
+            'dynamic': self.dynamic
+        }
+
+
+class AccessAnalyzer(ast.NodeVisitor):
+    def __init__(self, module_name='__main__'):
+        self.module_name = module_name
+
+        self.variables = {}  # ORM name -> state key, or None when it is only known at runtime
+        self.ordered = set()
+        self.counters = set()
+        self.imports = {}  # Name a contract is imported as -> contract name
+        self.functions = set()
+        self.exported = []
+
+        self.summaries = {}
+        self.current = None
+
+    def analyze(self, tree):
+        # Definitions first, since functions can use names defined below them
+        for node in tree.body:
+            self.define(node)
+
+        module = self.summaries[MODULE] = Summary()
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef):
+                self.current = self.summaries[node.name] = Summary()
+                for child in node.body:
+                    self.visit(child)
+            elif not isinstance(node, (ast.Import, ast.Assign)) or not self.is_definition(node):
+                # Module level code runs every time the contract is imported
+                self.current = module
+                self.visit(node)
+
+        return {name: self.closure(name).to_dict() for name in self.exported}
+
+    def is_definition(self, node):
+        if isinstance(node, ast.Import):
+            return True
+
+        return isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name) and \
+            node.value.func.id in config.ORM_CLASS_NAMES
+
+    def define(self, node):
+        if isinstance(node, ast.FunctionDef):
+            self.functions.add(node.name)
+            if any(self.is_export(d) for d in node.decorator_list):
+                self.exported.append(node.name)
+
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                self.imports[alias.asname or alias.name] = alias.name
+
+        elif isinstance(node, ast.Assign) and self.is_definition(node):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self.variables[target.id] = self.variable_key(target.id, node.value)
+                    if node.value.func.id in ORDERED_CLASS_NAMES:
+                        self.ordered.add(target.id)
+                    elif node.value.func.id in COUNTER_CLASS_NAMES:
+                        self.counters.add(target.id)
+
+    def is_export(self, decorator):
+        if isinstance(decorator, ast.Call):
+            return isinstance(decorator.func, ast.Name) and decorator.func.id == PRIVATE_EXPORT_DECORATOR
+
+        return isinstance(decorator, ast.Name) and decorator.id == config.EXPORT_DECORATOR_STRING
+
+    def variable_key(self, name, call):
+        if call.func.id not in FOREIGN_CLASS_NAMES:
+            return state_key(self.module_name, name)
+
+        keywords = {k.arg: string_constant(k.value) for k in call.keywords}
+        contract, variable = keywords.get('foreign_contract'), keywords.get('foreign_name')
+
+        if contract is None or variable is None or call.args:
+            return None
+
+        return state_key(contract, variable)
+
+    def closure(self, name):
+        # The function's own summary with everything it calls in this contract, and the module code
+        summary = Summary()
+        summary.merge(self.summaries[MODULE])
+
+        seen = set()
+        pending = [name]
+        while pending:
+            function = pending.pop()
+            if function in seen:
+                continue
+            seen.add(function)
+
+            summary.merge(self.summaries[function])
+            pending.extend(self.summaries[function].local_calls)
+
+        return summary
+
+    def access(self, name, read=False, write=False):
+        key = self.variables[name]
+        if key is None:
+            self.current.dynamic = True
+            return
+
+        if read or (write and name in self.ordered):
+            self.current.reads.add(key)
+        if write:
+            self.current.writes.add(key)
+
+    def visit_Subscript(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id in self.variables:
+            if isinstance(node.ctx, ast.Load):
+                self.access(node.value.id, read=True)
+            else:
+                self.access(node.value.id, write=True)
+
+            self.visit(node.slice)
+        else:
+            self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        target = node.target
+        if isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name) and \
+                target.value.id in self.variables:
+            if target.value.id not in self.counters or not isinstance(node.op, (ast.Add, ast.Sub)):
+                self.access(target.value.id, read=True)
+
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            name = func.value.id
+
+            if name in self.variables:
+                if func.attr in READ_METHODS:
+                    self.access(name, read=True)
+                elif func.attr in WRITE_METHODS:
+                    self.access(name, write=True)
+                else:
+                    # clear() reads the keys it deletes
+                    self.access(name, read=True, write=True)
+
+                self.visit_arguments(node)
+                return
+
+            if name in self.imports:
+                self.current.calls.add(call_key(self.imports[name], func.attr))
+                self.visit_arguments(node)
+                return
+
+        self.generic_visit(node)
+
+    def visit_arguments(self, node):
+        for arg in node.args:
+            self.visit(arg)
+        for keyword in node.keywords:
+            self.visit(keyword.value)
+
+    def visit_Name(self, node):
+        # Any use of these the methods above don't account for could do anything with them
+        if node.id in self.variables:
+            self.access(node.id, read=True, write=True)
+        elif node.id in self.imports or node.id in DYNAMIC_NAMES or node.id in config.ORM_CLASS_NAMES:
+            self.current.dynamic = True
+        elif node.id in self.functions:
+            self.current.local_calls.add(node.id)
+
+    def visit_FunctionDef(self, node):
+        # A function defined inside another can only run when the outer one does
+        self.generic_visit(node)
+
+
+def analyze(tree, module_name='__main__'):
+    return AccessAnalyzer(module_name).analyze(tree)
+
+
+def resolve(access, lookup):
+    """
+    Folds the summaries of the imported contract functions each function calls into its own. lookup(contract) returns
+    the stored access summaries of a contract, or None. A call that can't be followed makes the caller dynamic.
+    """
+    resolved = {}
+
+    for name, summary in access.items():
+        summary = {
+            'reads': set(summary['reads']),
+            'writes': set(summary['writes']),
+            'calls': set(summary['calls']),
+            'dynamic': summary['dynamic']
+        }
+
+        for call in list(summary['calls']):
+            contract, function = call.split(config.INDEX_SEPARATOR, 1)
+
+            callee = lookup(contract)
+            callee = callee.get(function) if callee is not None else None
+
+            # Summaries are stored resolved, so a callee's covers everything it calls in turn
+            if callee is None:
+                summary['dynamic'] = True
+                continue
+
+            summary['reads'].update(callee['reads'])
+            summary['writes'].update(callee['writes'])
+            summary['calls'].update(callee['calls'])
+            summary['dynamic'] = summary['dynamic'] or callee['dynamic']
+
+        resolved[name] = {
+            'reads': sorted(summary['reads']),
+            'writes': sorted(summary['writes']),
+            'calls': sorted(summary['calls']),
+            'dynamic': summary['dynamic']
+        }
+
+    return resolved
@@ -0,0 +1,112 @@
+import ast
+import multiprocessing
+import os
+import re
+
+from contracting.compilation.compiler import ContractingCompiler
+from contracting.compilation.linter import Linter
+
+# Lints or compiles every contract under some paths on a pool of processes. Each worker keeps one Linter for all the
+# files it is given. Results come back in the order the files were found, one dict per file:
+#   {'path': ..., 'name': ..., 'violations': [{'line': ..., 'code': ..., 'message': ...}, ...]}
+
+LINT = 'lint'
+COMPILE = 'compile'
+
+CONTRACT_SUFFIX = '.s.py'
+
+# The linter reports violations as text, like 'Line 3 : S2- Illicit use of '_' before variable : _x'
+VIOLATION = re.compile(r'^Line (\d+)\s*:\s*(S\d+)-\s*(.*)$')
+
+_linter = None
+
+
+def find_contracts(paths):
+    # Files named directly are always included. Directories are searched for contract files.
+    found = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(os.path.join(root, f) for f in sorted(files) if f.endswith(CONTRACT_SUFFIX))
+        else:
+            found.append(path)
+
+    return found
+
+
+def contract_name(path):
+    # The name a contract is submitted under, as the tests do it: the file name up to the first dot
+    return os.path.basename(path).split('.')[0]
+
+
+def parse_violation(text):
+    match = VIOLATION.match(text)
+    if match is None:
+        return {'line': None, 'code': None, 'message': text}
+
+    line, code, message = match.groups()
+    return {'line': int(line), 'code': code, 'message': message.strip()}
+
+
+def start_worker():
+    global _linter
+    _linter = Linter()
+
+
+def process_file(task):
+    mode, path, output = task
+    name = contract_name(path)
+    result = {'path': path, 'name': name, 'violations': []}
+
+    try:
+        with open(path) as f:
+            source = f.read()
+
+        if mode == LINT:
+            alerts = _linter.check(ast.parse(source))
+        else:
+            # A compiler per file, since one that fails halfway keeps its state, but the worker's linter for all
+            compiler = ContractingCompiler(module_name=name, linter=_linter)
+            try:
+                code, _, _ = compiler.parse_to_compiled(source)
+            except Exception:
+                if compiler.lint_alerts is None:
+                    raise
+
+            alerts = compiler.lint_alerts
+            if alerts is None and output is not None:
+                with open(os.path.join(output, name + '.py'), 'w') as f:
+                    f.write(code)
+
+    except SyntaxError as e:
+        result['violations'].append({'line': e.lineno, 'code': 'SyntaxError', 'message': e.msg})
+    except Exception as e:
+        result['violations'].append({'line': None, 'code': type(e).__name__, 'message': str(e)})
+    else:
+        if alerts is not None:
+            result['violations'].extend(parse_violation(a) for a in alerts)
+
+    return result
+
+
+def process(paths, mode=LINT, jobs=None, output=None):
+    files = find_contracts(paths)
+    tasks = [(mode, path, output) for path in files]
+
+    if output is not None:
+        os.makedirs(output, exist_ok=True)
+
+    jobs = jobs or os.cpu_count() or 1
+    jobs = min(jobs, len(tasks))
+
+    if jobs <= 1:
+        start_worker()
+        return [process_file(task) for task in tasks]
+
+    # Several files to a chunk so the workers aren't waiting on the parent for each one
+    chunksize = max(1, len(tasks) // (jobs * 4))
+
+    with multiprocessing.Pool(jobs, initializer=start_worker) as pool:
+        return pool.map(process_file, tasks, chunksize=chunksize)
@@ -0,0 +1,167 @@
+import collections
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import threading
+
+import astor
+
+from contracting import config
+
+# Bump whenever the linter or the compiler's transformations change what they produce, so cached results from an
+# older compiler are never reused. Marshalled code is only readable by the Python version that wrote it, so that is
+# part of the key too.
+COMPILER_VERSION = 8
+VERSION_TAG = '{}:py{}.{}:astor{}'.format(COMPILER_VERSION, sys.version_info[0], sys.version_info[1],
+                                         astor.__version__)
+
+# What is cached, each under its own key:
+#   lint      source                   -> the linter's alerts, or None for clean code
+#   code      source and module name   -> canonical source. The compiler writes the contract name into the code, so
+#                                         identical code under another name only reuses the lint result.
+#   contract  source and module name   -> canonical source, marshalled code compiled from the transformed tree and
+#                                         the access summary of each exported function (see access.py)
+#   compiled  canonical source         -> marshalled code object, as the driver stores it under __compiled__
+LINT = 'lint'
+CODE = 'code'
+CONTRACT = 'contract'
+COMPILED = 'compiled'
+
+MISSING = object()
+
+
+def cache_key(kind, *parts):
+    h = hashlib.sha256()
+    for part in (VERSION_TAG, kind) + parts:
+        h.update(part.encode())
+        h.update(b'\0')
+
+    return h.hexdigest()
+
+
+class CompilationCache:
+    """
+    Memory first, then (if a directory is given) disk. Disk entries are written whole to a temporary file and renamed
+    into place, so concurrent writers and readers never see half an entry.
+    """
+    def __init__(self, size=config.COMPILATION_CACHE_SIZE, directory=config.COMPILATION_CACHE_DIR):
+        self.size = size
+        self.directory = directory
+
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key, MISSING)
+            if value is not MISSING:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.directory is not None:
+            try:
+                with open(self.path(key), 'rb') as f:
+                    value, = marshal.loads(f.read())
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+            else:
+                self.remember(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return MISSING
+
+    def remember(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def put(self, key, value):
+        self.remember(key, value)
+
+        if self.directory is not None:
+            path = self.path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(marshal.dumps((value,)))
+                os.replace(tmp, path)
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def parse_to_code(self, source, module_name='__main__', lint=True):
+        # Same result as ContractingCompiler.parse_to_code, which raises the linter's alerts for code that fails linting
+        return self.transform(CODE, source, module_name, lint, 'parse_to_code')
+
+    def compile_contract(self, source, module_name='__main__', lint=True):
+        # Same result as ContractingCompiler.parse_to_compiled: (canonical source, marshalled code, access summaries)
+        return self.transform(CONTRACT, source, module_name, lint, 'parse_to_compiled')
+
+    def transform(self, kind, source, module_name, lint, method):
+        from contracting.compilation.compiler import ContractingCompiler
+
+        key = cache_key(kind, source, module_name, str(lint))
+        result = self.get(key)
+        if result is not MISSING:
+            return result
+
+        # Source already linted under another name only needs transforming
+        lint_key = cache_key(LINT, source)
+        if lint:
+            alerts = self.get(lint_key)
+            if alerts is not MISSING:
+                if alerts is not None:
+                    raise Exception(alerts)
+                lint = False
+
+        compiler = ContractingCompiler(module_name=module_name)
+        try:
+            result = getattr(compiler, method)(source, lint=lint)
+        except Exception:
+            if lint and compiler.lint_alerts is not None:
+                self.put(lint_key, compiler.lint_alerts)
+            raise
+
+        if lint:
+            self.put(lint_key, None)
+        self.put(key, result)
+
+        return result
+
+    def compile(self, code):
+        # Marshalled code object for canonical source, compiled the way the driver always has
+        key = cache_key(COMPILED, code)
+        blob = self.get(key)
+
+        if blob is MISSING:
+            # Bound to a name first: marshal flags objects that have other references, and the driver always has
+            code_obj = compile(code, '', 'exec')
+            blob = marshal.dumps(code_obj)
+            self.put(key, blob)
+
+        return blob
+
+
+compilation_cache = CompilationCache()
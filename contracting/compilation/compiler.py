@@ -1,8 +1,86 @@
 import ast
 import astor
+import marshal
+import sys
+from collections import defaultdict
 
 from contracting import config
+from contracting.compilation import access
 from contracting.compilation.linter import Linter
+from contracting.compilation.instrumenter import MeteringInstrumenter
+
+HASH_CLASS_NAMES = {'Hash', 'ForeignHash', 'OrderedHash', 'Counter'}
+
+# Augmented assignment operators by their symbol, which is how Hash._update is told what to do
+AUGMENTED_OPERATORS = {
+    ast.Add: '+=',
+    ast.Sub: '-=',
+    ast.Mult: '*=',
+    ast.Div: '/=',
+    ast.FloorDiv: '//=',
+    ast.Mod: '%=',
+    ast.Pow: '**=',
+    ast.LShift: '<<=',
+    ast.RShift: '>>=',
+    ast.BitAnd: '&=',
+    ast.BitOr: '|=',
+    ast.BitXor: '^=',
+    ast.MatMult: '@=',
+}
+
+
+def fixed_hashes(tree):
+    # Hashes defined at module level and never bound again anywhere, so every use of the name is that Hash
+    defined = set()
+    for statement in tree.body:
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                and isinstance(statement.targets[0], ast.Name) and isinstance(statement.value, ast.Call) \
+                and isinstance(statement.value.func, ast.Name) and statement.value.func.id in HASH_CLASS_NAMES:
+            defined.add(statement.targets[0].id)
+
+    if not defined:
+        return defined
+
+    bindings = defaultdict(int)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            bindings[node.id] += 1
+        elif isinstance(node, ast.arg):
+            bindings[node.arg] += 1
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bindings[node.name] += 1
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bindings[node.name] += 1
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bindings[(alias.asname or alias.name).split('.')[0]] += 1
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            for name in node.names:
+                bindings[name] += 1
+
+    return {name for name in defined if bindings[name] == 1}
+
+
+def subscript_key(node):
+    # The key of a subscript as a list of expressions, and whether it is a tuple of them, or None when its shape
+    # isn't known until it runs
+    key = node.slice
+    if sys.version_info < (3, 9):
+        if not isinstance(key, ast.Index):
+            return None
+        key = key.value
+
+    if isinstance(key, ast.Tuple):
+        if not 0 < len(key.elts) <= config.MAX_HASH_DIMENSIONS:
+            return None
+        if any(isinstance(k, (ast.Starred, ast.Slice)) for k in key.elts):
+            return None
+        return key.elts, True
+
+    if isinstance(key, (ast.Slice, ast.Starred)):
+        return None
+
+    return [key], False
 
 
 class ContractingCompiler(ast.NodeTransformer):
@@ -11,22 +89,36 @@ class ContractingCompiler(ast.NodeTransformer):
         self.module_name = module_name
         self.linter = linter
         self.lint_alerts = None
+        self.linting = False
+        self.access = None
         self.constructor_visited = False
         self.private_names = set()
         self.orm_names = set()
-        self.visited_names = set()  # store the method visits
+        self.hash_names = set()
+        self.visited_names = defaultdict(list)  # Name nodes by the name they had when visited
 
-    def parse(self, source: str, lint=True):
+    def parse(self, source: str, lint=True, analyze=False):
         self.constructor_visited = False
 
         tree = ast.parse(source)
 
+        # Worked out from the tree as written, before any names are changed
+        if analyze:
+            self.access = access.analyze(tree, self.module_name)
+
+        self.hash_names = fixed_hashes(tree)
+
+        # The linter checks each node just before it is transformed, so the tree is only walked once
+        self.linting = lint
         if lint:
-            self.lint_alerts = self.linter.check(tree)
-            # compilation.fix_missing_locations(tree)
+            self.linter.start()
 
         tree = self.visit(tree)
 
+        if lint:
+            self.linting = False
+            self.lint_alerts = self.linter.finish()
+
         if self.lint_alerts is not None:
             raise Exception(self.lint_alerts)
 
@@ -34,26 +126,37 @@ class ContractingCompiler(ast.NodeTransformer):
 
         # An Expr node can have a value func of compilation.Name, or compilation.Attribute which you much access the value of.
         # This code branching is not ideal and should be investigated for simplicity.
-        for node in self.visited_names:
-            if node.id in self.private_names or node.id in self.orm_names:
-                node.id = self.privatize(node.id)
+        for name in self.private_names | self.orm_names:
+            for node in self.visited_names.get(name, ()):
+                if node.id == name:
+                    node.id = self.privatize(node.id)
 
         ast.fix_missing_locations(tree)
 
         # reset state
         self.private_names = set()
         self.orm_names = set()
-        self.visited_names = set()
+        self.hash_names = set()
+        self.visited_names = defaultdict(list)
 
         return tree
 
+    def visit(self, node):
+        if self.linting:
+            self.linter.lint(node)
+        return super().visit(node)
+
     @staticmethod
     def privatize(s):
         return '{}{}'.format(config.PRIVATE_METHOD_PREFIX, s)
 
-    def compile(self, source: str, lint=True):
+    def compile(self, source: str, lint=True, instrument=False):
         tree = self.parse(source, lint=lint)
 
+        # Build the metering into the code itself, for running with config.METERING_INSTRUMENTED
+        if instrument:
+            tree = MeteringInstrumenter().instrument(tree)
+
         compiled_code = compile(tree, '<compilation>', 'exec')
 
         return compiled_code
@@ -63,7 +166,18 @@ class ContractingCompiler(ast.NodeTransformer):
         code = astor.to_source(tree)
         return code
 
+    def parse_to_compiled(self, source, lint=True):
+        # The canonical source, kept for reading, the marshalled code and what each exported function may read and
+        # write. The code is compiled from the canonical source rather than the tree, so its line numbers (in
+        # tracebacks and profiles) point into the source that is stored, as they do under instrumented metering.
+        tree = self.parse(source, lint=lint, analyze=True)
+        code = astor.to_source(tree)
+        code_obj = compile(code, '', 'exec')
+        return code, marshal.dumps(code_obj), self.access
+
     def visit_FunctionDef(self, node):
+        # Children first, so the linter sees the decorators as written
+        self.generic_visit(node)
 
         # Presumes all decorators are valid, as caught by linter.
         if node.decorator_list:
@@ -90,8 +204,6 @@ class ContractingCompiler(ast.NodeTransformer):
             self.private_names.add(node.name)
             node.name = self.privatize(node.name)
 
-        self.generic_visit(node)
-
         return node
 
     def visit_Assign(self, node):
@@ -103,10 +215,64 @@ class ContractingCompiler(ast.NodeTransformer):
 
         self.generic_visit(node)
 
+        if len(node.targets) == 1:
+            call = self.hash_access(node.targets[0], '_set', [node.value])
+            if call is not None:
+                return ast.copy_location(ast.Expr(value=call), node)
+
+        return node
+
+    def visit_AugAssign(self, node):
+        self.generic_visit(node)
+
+        read = self.hash_access(node.target, '_read', [])
+        if read is not None:
+            # A second name for the hash, renamed along with the first if the hash is private
+            name = ast.Name(id=node.target.value.id, ctx=ast.Load())
+            self.visited_names[name.id].append(name)
+
+            call = ast.Call(
+                func=ast.Attribute(value=name, attr='_update', ctx=ast.Load()),
+                args=[read, ast.Str(s=AUGMENTED_OPERATORS[type(node.op)]), node.value],
+                keywords=[]
+            )
+            return ast.copy_location(ast.Expr(value=ast.copy_location(call, node)), node)
+
+        return node
+
+    def visit_Subscript(self, node):
+        self.generic_visit(node)
+
+        if isinstance(node.ctx, ast.Load):
+            call = self.hash_access(node, '_get', [])
+            if call is not None:
+                return call
+
         return node
 
+    def hash_access(self, node, method, args):
+        # h[k] and h[a, b] on a contract's own hashes call the accessors that skip working out what kind of key it is.
+        # Anything else is left to Hash.__getitem__ and Hash.__setitem__.
+        if not isinstance(node, ast.Subscript) or not isinstance(node.value, ast.Name) \
+                or node.value.id not in self.hash_names:
+            return None
+
+        key = subscript_key(node)
+        if key is None:
+            return None
+
+        elts, is_tuple = key
+        method = '{}_{}'.format(method, 'parts' if is_tuple else 'key')
+
+        call = ast.Call(
+            func=ast.Attribute(value=node.value, attr=method, ctx=ast.Load()),
+            args=args + elts,
+            keywords=[]
+        )
+        return ast.copy_location(call, node)
+
     def visit_Name(self, node):
-        self.visited_names.add(node)
+        self.visited_names[node.id].append(node)
         return node
 
     def visit_Expr(self, node):
@@ -114,7 +280,15 @@ class ContractingCompiler(ast.NodeTransformer):
         return node
 
     def visit_Num(self, node):
-        if isinstance(node.n, float):
+        return self.decimal_literal(node, node.n)
+
+    def visit_Constant(self, node):
+        # Every literal is a Constant from Python 3.8. Handling them here skips ast's deprecated detour to visit_Num.
+        return self.decimal_literal(node, node.value)
+
+    @staticmethod
+    def decimal_literal(node, value):
+        if isinstance(value, float):
             return ast.Call(func=ast.Name(id='decimal', ctx=ast.Load()),
-                            args=[ast.Str(str(node.n))], keywords=[])
+                            args=[ast.Str(str(value))], keywords=[])
         return node
\ No newline at end of file
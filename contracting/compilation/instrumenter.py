@@ -0,0 +1,254 @@
+import ast
+import dis
+import copy
+
+from contracting.execution.metering.costs import load_costs, UNKNOWN_COST
+
+METER_NAME = '__meter'
+
+# Cost of the implicit work done on every loop iteration (advancing the iterator and binding the target).
+ITERATION_OPCODES = ('FOR_ITER', 'STORE_FAST')
+
+STATEMENT_LISTS = ('body', 'orelse', 'finalbody')
+
+
+def assigned_names(nodes):
+    # Names a function binds locally, without looking into nested functions
+    names = set()
+    declared_global = set()
+
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.Lambda)):
+            continue
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, ast.Global):
+            declared_global.update(node.names)
+        stack.extend(ast.iter_child_nodes(node))
+
+    return names - declared_global
+
+
+class MeteringInstrumenter(ast.NodeTransformer):
+    """
+    Inserts __meter(cost) calls so contract code pays for itself without a trace function.
+
+    Every statement list (module, function and loop bodies, branches) starts with a call charging the bytecode of
+    the statements it runs straight through, priced with the tracer's cost table. Loop bodies also pay for the loop
+    header on each iteration, and comprehensions charge each iteration through extra conditions. A block is charged
+    in full when it is entered, so leaving it early (return, break, an exception) slightly overcharges.
+    """
+    def __init__(self, costs=None):
+        # The tracer's cost table by default, so stamps mean the same thing whichever mode is used
+        self.costs = costs if costs is not None else load_costs()
+
+        # Local names of the function being instrumented, or None at module level
+        self._locals = None
+        self._baselines = {}
+
+    def instrument(self, tree):
+        tree = self.visit(tree)
+        ast.fix_missing_locations(tree)
+        return tree
+
+    def cost_of(self, opcode):
+        if opcode < len(self.costs):
+            return self.costs[opcode]
+        return UNKNOWN_COST
+
+    def opcode_cost(self, code):
+        return sum(self.cost_of(instruction.opcode) for instruction in dis.get_instructions(code))
+
+    def wrapped_cost(self, statement):
+        # Statements are compiled inside a loop (and a function taking the current locals as arguments, when in one)
+        # so they compile to the same loads and stores they will really use, and so return, break and continue are
+        # legal.
+        loop = ast.While(test=ast.NameConstant(value=True), body=[statement], orelse=[])
+
+        if self._locals is None:
+            module = ast.Module(body=[loop])
+        else:
+            args = ast.parse('def __wrapper({}): pass'.format(', '.join(sorted(self._locals)))).body[0]
+            args.body = [loop]
+            module = ast.Module(body=[args])
+
+        module.type_ignores = []
+        ast.fix_missing_locations(module)
+
+        code = compile(module, '<metering>', 'exec')
+        if self._locals is not None:
+            code = next(c for c in code.co_consts if hasattr(c, 'co_code'))
+
+        return self.opcode_cost(code)
+
+    def baseline(self):
+        key = self._locals is None
+        if key not in self._baselines:
+            self._baselines[key] = self.wrapped_cost(ast.Pass())
+        return self._baselines[key]
+
+    def statement_cost(self, node):
+        # Only the statement's own header is priced here. Nested bodies are instrumented, and priced, on their own.
+        node = copy.deepcopy(node)
+        for field in STATEMENT_LISTS:
+            if getattr(node, field, None):
+                setattr(node, field, [ast.Pass()] if field == 'body' else [])
+
+        for handler in getattr(node, 'handlers', []):
+            handler.body = [ast.Pass()]
+
+        try:
+            cost = self.wrapped_cost(node) - self.baseline()
+        except SyntaxError:
+            # global and nonlocal declarations can't be compiled on their own. They execute nothing anyway.
+            cost = 0
+
+        return max(cost, 0)
+
+    def expression_cost(self, node):
+        return self.statement_cost(ast.Expr(value=node))
+
+    def iteration_cost(self):
+        return sum(self.cost_of(dis.opmap[name]) for name in ITERATION_OPCODES)
+
+    def meter_call(self, cost):
+        return ast.Call(func=ast.Name(id=METER_NAME, ctx=ast.Load()), args=[ast.Num(n=cost)], keywords=[])
+
+    def charge_true(self, cost):
+        # __meter returns None, so this is always true
+        return ast.UnaryOp(op=ast.Not(), operand=self.meter_call(cost))
+
+    def instrument_block(self, statements, extra=0):
+        # Price the block before the nested bodies have meters of their own added to them
+        cost = extra + sum(self.statement_cost(s) for s in statements)
+
+        statements = [self.visit(s) for s in statements]
+
+        index = 0
+        if statements and isinstance(statements[0], ast.Expr) and isinstance(statements[0].value, ast.Str):
+            index = 1   # Keep docstrings in place
+
+        statements.insert(index, ast.Expr(value=self.meter_call(cost)))
+        return statements
+
+    def visit_Module(self, node):
+        node.body = self.instrument_block(node.body)
+        return node
+
+    def visit_FunctionDef(self, node):
+        node.decorator_list = [self.visit(d) for d in node.decorator_list]
+        node.args = self.visit(node.args)
+
+        outer = self._locals
+
+        arguments = node.args.args + node.args.kwonlyargs + [a for a in (node.args.vararg, node.args.kwarg) if a]
+        self._locals = {a.arg for a in arguments} | assigned_names(node.body)
+
+        node.body = self.instrument_block(node.body)
+
+        self._locals = outer
+        return node
+
+    def visit_If(self, node):
+        node.test = self.visit(node.test)
+        node.body = self.instrument_block(node.body)
+        if node.orelse:
+            node.orelse = self.instrument_block(node.orelse)
+        return node
+
+    def visit_For(self, node):
+        header = self.iteration_cost()
+
+        node.iter = self.visit(node.iter)
+        node.body = self.instrument_block(node.body, extra=header)
+        if node.orelse:
+            node.orelse = self.instrument_block(node.orelse)
+        return node
+
+    def visit_While(self, node):
+        # The test runs again before every iteration
+        header = self.expression_cost(node.test)
+
+        node.test = self.visit(node.test)
+        node.body = self.instrument_block(node.body, extra=header)
+        if node.orelse:
+            node.orelse = self.instrument_block(node.orelse)
+        return node
+
+    def generic_visit(self, node):
+        # Any other statement with bodies of its own (try, with, ...) gets each of them metered
+        for field in STATEMENT_LISTS:
+            statements = getattr(node, field, None)
+            if isinstance(statements, list) and statements and isinstance(statements[0], ast.stmt):
+                setattr(node, field, self.instrument_block(statements))
+
+        for handler in getattr(node, 'handlers', []):
+            handler.body = self.instrument_block(handler.body)
+
+        for field, value in ast.iter_fields(node):
+            if field in STATEMENT_LISTS or field == 'handlers':
+                continue
+            if isinstance(value, list):
+                setattr(node, field, [self.visit(v) if isinstance(v, ast.AST) else v for v in value])
+            elif isinstance(value, ast.AST):
+                setattr(node, field, self.visit(value))
+
+        return node
+
+    def visit_comprehension_owner(self, node, elements):
+        # Comprehensions run as functions of their own, with their targets as locals
+        outer = self._locals
+        self._locals = (outer or set()) | assigned_names(g.target for g in node.generators)
+
+        element_cost = sum(self.expression_cost(e) for e in elements)
+
+        for generator in node.generators:
+            # Each iteration pays for advancing the loop and for its filters up front
+            cost = self.iteration_cost() + sum(self.expression_cost(i) for i in generator.ifs)
+
+            generator.iter = self.visit(generator.iter)
+            generator.ifs = [self.charge_true(cost)] + [self.visit(i) for i in generator.ifs]
+
+        # Elements are only built once every filter has passed, so they are charged last
+        node.generators[-1].ifs.append(self.charge_true(element_cost))
+
+        for name in ('elt', 'key', 'value'):
+            if hasattr(node, name):
+                setattr(node, name, self.visit(getattr(node, name)))
+
+        self._locals = outer
+        return node
+
+    def visit_ListComp(self, node):
+        return self.visit_comprehension_owner(node, [node.elt])
+
+    def visit_SetComp(self, node):
+        return self.visit_comprehension_owner(node, [node.elt])
+
+    def visit_GeneratorExp(self, node):
+        return self.visit_comprehension_owner(node, [node.elt])
+
+    def visit_DictComp(self, node):
+        return self.visit_comprehension_owner(node, [node.key, node.value])
+
+    def visit_Lambda(self, node):
+        outer = self._locals
+        self._locals = (outer or set()) | {a.arg for a in node.args.args}
+
+        # (__meter(cost) or body) evaluates to the body
+        cost = self.expression_cost(node.body)
+        node.body = ast.BoolOp(op=ast.Or(), values=[self.meter_call(cost), self.visit(node.body)])
+
+        self._locals = outer
+        return node
+
+
+def instrument(source: str, costs=None):
+    tree = ast.parse(source)
+    return MeteringInstrumenter(costs=costs).instrument(tree)
+
+
+def compile_instrumented(source: str, filename='<compilation>', costs=None):
+    return compile(instrument(source, costs=costs), filename, 'exec')
@@ -1,19 +1,16 @@
 import ast
-import sys
 
 from .. import config
 
-from ..compilation.whitelists import ALLOWED_AST_TYPES, ALLOWED_ANNOTAION_TYPES, VIOLATION_TRIGGERS, ILLEGAL_BUILTINS
+from ..compilation.whitelists import ALLOWED_AST_TYPES, ALLOWED_ANNOTAION_TYPES, VIOLATION_TRIGGERS, ILLEGAL_BUILTINS, \
+    STDLIB_MODULES, is_stdlib_module
 
 from contracting.db.driver import ContractDriver
 
-from stdlib_list import stdlib_list
-
 class Linter(ast.NodeVisitor):
 
     def __init__(self, driver=ContractDriver()):
         self._violations = []
-        self._functions = []
         self._is_one_export = False
         self._is_success = True
         self._constructor_visited = False
@@ -22,8 +19,9 @@ class Linter(ast.NodeVisitor):
         self.return_annotation = set()
         self.arg_types = set()
 
-        self.builtins = set(stdlib_list(f'{sys.version_info.major}.{sys.version_info.minor}'))
+        self.builtins = STDLIB_MODULES
         self.driver = driver
+        self._checks = {}
 
     def ast_types(self, t, lnum):
         if type(t) not in ALLOWED_AST_TYPES:
@@ -45,55 +43,84 @@ class Linter(ast.NodeVisitor):
                 self._violations.append(str)
                 self._is_success = False
 
-    def visit_Name(self, node):
+    # Each check looks at a single node and never walks into its children, so the compiler can run them as it
+    # transforms the tree (see lint) instead of walking the tree a second time. The visit_ methods run them on their own.
+    def lint(self, node):
+        try:
+            check = self._checks[node.__class__]
+        except KeyError:
+            check = self._checks[node.__class__] = getattr(self, 'lint_' + node.__class__.__name__, None)
+
+        if check is not None:
+            check(node)
+
+    def lint_Name(self, node):
         self.not_system_variable(node.id, node.lineno)
+
+    def visit_Name(self, node):
+        self.lint_Name(node)
         self.generic_visit(node)
         return node
 
-    def visit_Attribute(self, node):
+    def lint_Attribute(self, node):
         self.not_system_variable(node.attr, node.lineno)
+
+    def visit_Attribute(self, node):
+        self.lint_Attribute(node)
         self.generic_visit(node)
         return node
 
-    def visit_Import(self, node):
+    def lint_Import(self, node):
         for n in node.names:
-            if n.name in self.builtins:
+            if is_stdlib_module(n.name):
                 self._is_success = False
                 str = "Line {}: ".format(node.lineno) + VIOLATION_TRIGGERS[13]
                 self._violations.append(str)
+
+    def visit_Import(self, node):
+        self.lint_Import(node)
         return node
 
-    def visit_ImportFrom(self, node):
+    def lint_ImportFrom(self, node):
         str = "Line {}: ".format(node.lineno) + VIOLATION_TRIGGERS[3]
         self._violations.append(str)
         self._is_success = False
 
+    def visit_ImportFrom(self, node):
+        self.lint_ImportFrom(node)
+
     '''
     Why are we even doing any logic instead of just failing on visiting these?
     '''
-    def visit_ClassDef(self, node):
+    def lint_ClassDef(self, node):
         # self.log.error("Classes are not allowed in Seneca contracts")
         str = "Line {}: ".format(node.lineno) + VIOLATION_TRIGGERS[5]
         self._violations.append(str)
         self._is_success = False
-        self.generic_visit(node)
         #raise CompilationException
+
+    def visit_ClassDef(self, node):
+        self.lint_ClassDef(node)
+        self.generic_visit(node)
         return node
 
-    def visit_AsyncFunctionDef(self, node):
+    def lint_AsyncFunctionDef(self, node):
         # self.log.error("Async functions are not allowed in Seneca contracts")
         str = "Line {}: ".format(node.lineno) + VIOLATION_TRIGGERS[6]
         self._violations.append(str)
 
         self._is_success = False
-        self.generic_visit(node)
         # raise CompilationException
+
+    def visit_AsyncFunctionDef(self, node):
+        self.lint_AsyncFunctionDef(node)
+        self.generic_visit(node)
         return node
 
-    def visit_Assign(self, node):
+    def lint_Assign(self, node):
         # resource_names, func_name = Assert.valid_assign(node, Parser.parser_scope)
         if isinstance(node.value, ast.Call) and not isinstance(node.value.func, ast.Attribute) and node.value.func.id in config.ORM_CLASS_NAMES:
-            if node.value.func.id in ['Variable', 'Hash']:
+            if node.value.func.id in ['Variable', 'Hash', 'OrderedHash', 'Counter']:
                 kwargs = [k.arg for k in node.value.keywords]
                 if 'contract' in kwargs or 'name' in kwargs:
                     self._is_success = False
@@ -108,8 +135,9 @@ class Linter(ast.NodeVisitor):
             except AttributeError:
                 pass
 
+    def visit_Assign(self, node):
+        self.lint_Assign(node)
         self.generic_visit(node)
-
         return node
 
     def visit_AugAssign(self, node):
@@ -117,7 +145,7 @@ class Linter(ast.NodeVisitor):
         self.generic_visit(node)
         return node
 
-    def visit_Call(self, node):
+    def lint_Call(self, node):
         # Prevent calling of illegal builtins
         if isinstance(node.func, ast.Name):
             if node.func.id in ILLEGAL_BUILTINS:
@@ -125,6 +153,8 @@ class Linter(ast.NodeVisitor):
                 str = "Line {}: ".format(node.lineno) + VIOLATION_TRIGGERS[13]
                 self._violations.append(str)
 
+    def visit_Call(self, node):
+        self.lint_Call(node)
         self.generic_visit(node)
         return node
 
@@ -135,7 +165,11 @@ class Linter(ast.NodeVisitor):
         self.generic_visit(node)
         return node
 
-    def visit_FunctionDef(self, node):
+    def visit_Constant(self, node):
+        # Every literal is a Constant from Python 3.8, and none of them need checking
+        return node
+
+    def lint_FunctionDef(self, node):
         self.no_nested_imports(node)
 
         # Only allow 1 decorator per function definition.
@@ -188,6 +222,8 @@ class Linter(ast.NodeVisitor):
             else:
                 self.return_annotation.add((None, node.lineno))
 
+    def visit_FunctionDef(self, node):
+        self.lint_FunctionDef(node)
         self.generic_visit(node)
         return node
 
@@ -209,7 +245,6 @@ class Linter(ast.NodeVisitor):
 
     def _reset(self):
         self._violations = []
-        self._functions = []
         self._is_one_export = False
         self._is_success = True
         self._constructor_visited = False
@@ -236,23 +271,10 @@ class Linter(ast.NodeVisitor):
         for t, lineno in self.return_annotation:
             self.check_return_types(t,lineno)
 
-
-    def _collect_function_defs(self, root):
-        for node in ast.walk(root):
-            if isinstance(node, ast.FunctionDef):
-                self._functions.append(node.name)
-            elif isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-                for n in node.names:
-                    if n.asname:
-                        self._functions.append(n.asname)
-                    else:
-                        self._functions.append(n.name.split('.')[-1])
-
-    def check(self, ast_tree):
+    def start(self):
         self._reset()
-        # pass 1 - collect function def and imports
-        self._collect_function_defs(ast_tree)
-        self.visit(ast_tree)
+
+    def finish(self):
         self._final_checks()
         if self._is_success is False:
             #print(self.dump_violations())
@@ -260,6 +282,11 @@ class Linter(ast.NodeVisitor):
         else:
             return None
 
+    def check(self, ast_tree):
+        self.start()
+        self.visit(ast_tree)
+        return self.finish()
+
     def dump_violations(self):
         import pprint
         pp = pprint.PrettyPrinter(indent = 4)
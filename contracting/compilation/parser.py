@@ -50,7 +50,7 @@ def variables_for_contract(contract_code: str):
         if type(assign.value) == ast.Call:
             if assign.value.func.id == 'Variable':
                 variables.append(assign.targets[0].id.lstrip('__'))
-            elif assign.value.func.id == 'Hash':
+            elif assign.value.func.id in ('Hash', 'OrderedHash', 'Counter'):
                 hashes.append(assign.targets[0].id.lstrip('__'))
 
     return {
@@ -1,4 +1,6 @@
-import ast, builtins
+import ast, builtins, sys
+
+from contracting.compilation import stdlib_modules
 
 ALLOWED_BUILTINS = {'Exception', 'False', 'None', 'True', 'abs', 'all', 'any', 'ascii', 'bin', 'bool', 'bytearray',
                     'bytes', 'chr', 'dict', 'divmod', 'filter', 'format', 'frozenset', 'hex', 'int', 'isinstance',
@@ -15,6 +17,18 @@ ALLOWED_AST_TYPES = {ast.Module, ast.Eq, ast.Call, ast.Dict, ast.Attribute, ast.
                      ast.NotIn, ast.Gt, ast.Lt, ast.Starred, ast.Mod, ast.NotEq, ast.For, ast.While, ast.ListComp,
                      ast.comprehension, ast.Slice, ast.USub, ast.BoolOp, ast.And, ast.Or, ast.Mult}
 
+# Standard library modules, which contracts can't import and no contract can be imported as. Worked out once here
+# rather than on every import a contract makes.
+if hasattr(sys, 'stdlib_module_names'):
+    STDLIB_MODULES = frozenset(sys.stdlib_module_names) | {'__main__'}
+else:
+    STDLIB_MODULES = stdlib_modules.MODULES[sys.version_info[:2]]
+
+
+def is_stdlib_module(name):
+    return name.split('.', 1)[0] in STDLIB_MODULES
+
+
 ALLOWED_ANNOTAION_TYPES = {'dict', 'list', 'str', 'int', 'float', 'bool', 'datetime.timedelta', 'datetime.datetime', 'Any'}
 
 VIOLATION_TRIGGERS = [
@@ -14,7 +14,7 @@ INIT_DECORATOR_STRING = 'construct'
 INIT_FUNC_NAME = '__{}'.format(PRIVATE_METHOD_PREFIX)
 VALID_DECORATORS = {EXPORT_DECORATOR_STRING, INIT_DECORATOR_STRING}
 
-ORM_CLASS_NAMES = {'Variable', 'Hash', 'ForeignVariable', 'ForeignHash'}
+ORM_CLASS_NAMES = {'Variable', 'Hash', 'ForeignVariable', 'ForeignHash', 'OrderedHash', 'Counter'}
 
 MAX_HASH_DIMENSIONS = 16
 MAX_KEY_SIZE = 1024
@@ -24,3 +24,26 @@ READ_COST_PER_BYTE = 3
 WRITE_COST_PER_BYTE = 25
 
 STAMPS_PER_TAU = 20
+
+# How many keys iterating over a Hash reads from the database at a time
+ITER_BATCH_SIZE = 100
+
+# Line metering charges the opcode each executed line starts on. Opcode metering charges every executed instruction,
+# which prices long expressions and comprehensions accurately at the cost of slower execution (Python 3.7+).
+# Instrumented metering runs contracts compiled with their costs built in, so no trace function is needed at all.
+METERING_LINE = 'line'
+METERING_OPCODE = 'opcode'
+METERING_INSTRUMENTED = 'instrumented'
+METERING_MODE = METERING_LINE
+
+# Memory metering counts the large blocks (512 bytes and up) a metered transaction allocates. A transaction may hold
+# at most MEMORY_LIMIT bytes in them at once; an allocation past that raises MemoryError in the contract. Allocations
+# the driver and caches make for the contract count as well, and depend on what the process did before, so the point
+# a transaction is stopped at can differ between nodes. That makes a limit a consensus risk for transactions near it,
+# so it is off (0) unless a node sets one, and memory is never charged for in stamps.
+MEMORY_LIMIT = 0
+
+# Compiled contracts are cached by a hash of their source, in memory (up to COMPILATION_CACHE_SIZE entries) and, if
+# COMPILATION_CACHE_DIR is set, on disk as well so other processes and later runs can reuse them.
+COMPILATION_CACHE_SIZE = 1024
+COMPILATION_CACHE_DIR = None
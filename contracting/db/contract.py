@@ -1,7 +1,10 @@
-from contracting.compilation.compiler import ContractingCompiler
-from contracting.db.driver import ContractDriver
+from contracting.compilation.access import resolve
+from contracting.compilation.cache import compilation_cache
+from contracting.compilation.instrumenter import compile_instrumented, METER_NAME
+from contracting.db.driver import ContractDriver, ACCESS_KEY
 from contracting.execution.runtime import rt
 from types import ModuleType
+import marshal
 from contracting.stdlib import env
 from contracting import config
 
@@ -16,23 +19,33 @@ class Contract:
         if self._driver.get_contract(name) is not None:
             raise Exception('Contract already exists.')
 
-        c = ContractingCompiler(module_name=name)
-
-        code_obj = c.parse_to_code(code, lint=True)
+        code_obj, compiled, access = compilation_cache.compile_contract(code, module_name=name, lint=True)
 
         scope = env.gather()
         scope.update({'__contract__': True})
         scope.update(rt.env)
+        scope['__name__'] = name
 
-        exec(code_obj, scope)
+        if rt.instrumented:
+            # The constructor has to pay for itself like any other contract code
+            scope[METER_NAME] = rt.tracer.add_cost
+            exec(compile_instrumented(code_obj), scope)
+        else:
+            exec(marshal.loads(compiled), scope)
 
         if scope.get(config.INIT_FUNC_NAME) is not None:
             if constructor_args is None:
                 constructor_args = {}
             scope[config.INIT_FUNC_NAME](**constructor_args)
 
+        # Calls into imported contracts are followed through the summaries stored with them. Looking those up is the
+        # node's business, not the contract's, so it is neither charged for nor recorded as a read.
+        access = resolve(access, lambda contract: self._driver.peek(self._driver.make_key(contract, ACCESS_KEY)))
+
         now = scope.get('now')
         if now is not None:
-            self._driver.set_contract(name=name, code=code_obj, owner=owner, overwrite=False, timestamp=now)
+            self._driver.set_contract(name=name, code=code_obj, owner=owner, overwrite=False, timestamp=now,
+                                      compiled=compiled, access=access)
         else:
-            self._driver.set_contract(name=name, code=code_obj, owner=owner, overwrite=False)
+            self._driver.set_contract(name=name, code=code_obj, owner=owner, overwrite=False, compiled=compiled,
+                                      access=access)
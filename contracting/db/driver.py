@@ -3,9 +3,10 @@ from contracting.execution.runtime import rt
 from contracting.stdlib.bridge.time import Datetime
 from contracting.stdlib.bridge.decimal import ContractingDecimal
 from contracting import config
+from contracting.compilation.cache import compilation_cache
 from datetime import datetime
-import marshal
 import decimal
+import re
 
 import pymongo
 
@@ -17,6 +18,11 @@ AUTHOR_KEY = '__author__'
 OWNER_KEY = '__owner__'
 TIME_KEY = '__submitted__'
 COMPILED_KEY = '__compiled__'
+ACCESS_KEY = '__access__'
+
+# Bytes values, like compiled contracts, are stored as they are instead of as hex in JSON. In memory they are marked
+# with a prefix no JSON text can start with.
+BINARY_PREFIX = b'\x00'
 
 
 class Driver:
@@ -30,13 +36,16 @@ class Driver:
         if v is None:
             return None
 
+        if isinstance(v['v'], bytes):
+            return v['v']
+
         return decode(v['v'])
 
     def set(self, key, value):
         if value is None:
             self.__delitem__(key)
         else:
-            v = encode(value)
+            v = value if isinstance(value, bytes) else encode(value)
             self.db.update_one({'_id': key}, {'$set': {'v': v}}, upsert=True, )
 
     def flush(self):
@@ -45,17 +54,30 @@ class Driver:
     def delete(self, key: str):
         self.__delitem__(key)
 
-    def iter(self, prefix: str, length=0):
-        cur = self.db.find({'_id': {'$regex': f'^{prefix}'}})
+    def iter(self, prefix: str, length=0, start_after=None):
+        # Keys under the prefix in order, only those after start_after if it is given, and at most length of them
+        query = {'$regex': '^' + re.escape(prefix)}
+        if start_after is not None:
+            query['$gt'] = start_after
 
-        keys = []
-        for entry in cur:
-            keys.append(entry['_id'])
-            if 0 < length <= len(keys):
-                break
+        cur = self.db.find({'_id': query}).sort('_id', pymongo.ASCENDING)
+        if length > 0:
+            cur = cur.limit(length)
 
-        keys.sort()
-        return keys
+        return [entry['_id'] for entry in cur]
+
+    def get_many(self, keys):
+        # The values of the keys that exist, in one query
+        values = {}
+        for entry in self.db.find({'_id': {'$in': list(keys)}}):
+            v = entry['v']
+            values[entry['_id']] = v if isinstance(v, bytes) else decode(v)
+
+        return values
+
+    def delete_prefix(self, prefix: str):
+        # Every key under the prefix, in one query
+        self.db.delete_many({'_id': {'$regex': '^' + re.escape(prefix)}})
 
     def keys(self):
         k = []
@@ -85,12 +107,18 @@ class InMemDriver(Driver):
     def get(self, item):
         key = item.encode()
         value = self.db.get(key)
+
+        if value is not None and value.startswith(BINARY_PREFIX):
+            return value[len(BINARY_PREFIX):]
+
         return decode(value)
 
     def set(self, key: str, value):
         k = key.encode()
         if value is None:
             self.__delitem__(key)
+        elif isinstance(value, bytes):
+            self.db[k] = BINARY_PREFIX + value
         else:
             v = encode(value).encode()
             self.db[k] = v
@@ -98,18 +126,32 @@ class InMemDriver(Driver):
     def delete(self, key: str):
         self.__delitem__(key)
 
-    def iter(self, prefix: str, length=0):
+    def iter(self, prefix: str, length=0, start_after=None):
         p = prefix.encode()
+        after = start_after.encode() if start_after is not None else None
 
         l = []
-        for k in sorted(self.db.keys()):
-            if k.startswith(p):
-                l.append(k.decode())
+        for k in sorted(k for k in self.db.keys() if k.startswith(p) and (after is None or k > after)):
+            l.append(k.decode())
             if 0 < length <= len(l):
                 break
 
         return l
 
+    def get_many(self, keys):
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+
+        return values
+
+    def delete_prefix(self, prefix: str):
+        p = prefix.encode()
+        for k in [k for k in self.db.keys() if k.startswith(p)]:
+            del self.db[k]
+
     def keys(self):
         return sorted([k.decode() for k in self.db.keys()])
 
@@ -140,6 +182,8 @@ class CacheDriver:
 
         self.reads = set()
         self.pending_writes = {}
+        self.pending_deletes = []  # Prefixes deleted whole, as tombstones over everything stored under them
+        self.pending_deltas = {}  # Amounts added to keys that haven't been read, summed into them at commit
 
     def get(self, key: str, mark=True):
         # Try to get from cache
@@ -148,10 +192,15 @@ class CacheDriver:
             rt.deduct_read(*encode_kv(key, v))
             return v
 
-        # If it doesn't exist, get from db, add to cache
-        dv = self.driver.get(key)
+        # If it doesn't exist, get from db, add to cache. Keys under a deleted prefix are gone without asking the db.
+        dv = None if self.pending_deletes and self.is_deleted(key) else self.driver.get(key)
         rt.deduct_read(*encode_kv(key, dv))
 
+        # Reading a key that was added to turns what was added into an ordinary write of the sum
+        if self.pending_deltas and key in self.pending_deltas:
+            dv = self.pending_deltas.pop(key) if dv is None else dv + self.pending_deltas.pop(key)
+            self.pending_writes[key] = dv
+
         self.cache[key] = dv
 
         # Add key to reads
@@ -160,6 +209,16 @@ class CacheDriver:
 
         return dv
 
+    def peek(self, key):
+        # What this transaction would read for the key, without charging for it or recording it as a read
+        if key in self.cache:
+            return self.cache[key]
+
+        if self.pending_deletes and self.is_deleted(key):
+            return None
+
+        return self.driver.get(key)
+
     def set(self, key, value, mark=True):
         rt.deduct_write(*encode_kv(key, value))
 
@@ -170,20 +229,107 @@ class CacheDriver:
         if mark:
             self.pending_writes[key] = value
 
+        if self.pending_deltas:
+            self.pending_deltas.pop(key, None)
+
     def delete(self, key, mark=True):
         self.set(key, None, mark=mark)
 
+    def add(self, key, delta):
+        # Adds to a number without reading it, unless this transaction already has, so transactions that only add to
+        # a key don't depend on its value. Deltas commute, so they are summed and added to what is stored at commit.
+        if key in self.cache:
+            value = self.cache[key]
+            self.set(key, delta if value is None else value + delta)
+            return
+
+        rt.deduct_write(*encode_kv(key, delta))
+
+        if type(delta) == decimal.Decimal or type(delta) == float:
+            delta = ContractingDecimal(str(delta))
+
+        value = self.pending_deltas.get(key)
+        self.pending_deltas[key] = delta if value is None else value + delta
+
+    def materialize(self, prefix):
+        # Reads every key under the prefix that was added to, so it is stored like any other
+        for k in [k for k in self.pending_deltas if k.startswith(prefix)]:
+            self.get(k)
+
+    def delete_prefix(self, prefix):
+        # Deletes every key under the prefix. Only the keys this transaction already holds are touched; the rest are
+        # covered by the tombstone until commit deletes the range in one go. It costs what deleting each key would, plus
+        # a write of the prefix, so the keys are listed (but not read) when metering.
+        rt.deduct_write(*encode_kv(prefix, None))
+
+        if rt.tracer.is_started():
+            for k in sorted(self.prefix_keys(prefix)):
+                rt.deduct_write(*encode_kv(k, None))
+
+        for k in self.cache:
+            if k.startswith(prefix):
+                self.cache[k] = None
+
+        for k in [k for k in self.pending_writes if k.startswith(prefix)]:
+            del self.pending_writes[k]
+
+        for k in [k for k in self.pending_deltas if k.startswith(prefix)]:
+            del self.pending_deltas[k]
+
+        if not self.is_deleted(prefix):
+            self.pending_deletes.append(prefix)
+
+    def prefix_keys(self, prefix):
+        # The keys under the prefix that hold something, as far as this transaction can tell
+        keys = set() if self.is_deleted(prefix) else set(self.driver.iter(prefix))
+        keys.update(k for k in self.pending_deltas if k.startswith(prefix))
+
+        for k, v in self.cache.items():
+            if k.startswith(prefix):
+                if v is None:
+                    keys.discard(k)
+                else:
+                    keys.add(k)
+
+        return keys
+
+    def is_deleted(self, key):
+        for prefix in self.pending_deletes:
+            if key.startswith(prefix):
+                return True
+        return False
+
     def commit(self):
+        # Ranges first, since anything written after a range was deleted is in the pending writes. Each range is only
+        # deleted once, so a later commit can't wipe out keys written under it since.
+        for prefix in self.pending_deletes:
+            self.driver.delete_prefix(prefix)
+
+        self.pending_deletes.clear()
+
         for k, v in self.pending_writes.items():
             if v is None:
                 self.driver.delete(k)
             else:
                 self.driver.set(k, v)
 
+        # Once a delta is committed its key holds the sum, which is written again by any later commit like other writes
+        for k, delta in self.pending_deltas.items():
+            value = self.driver.get(k)
+            value = delta if value is None else value + delta
+
+            self.driver.set(k, value)
+            self.cache[k] = value
+            self.pending_writes[k] = value
+
+        self.pending_deltas.clear()
+
     def clear_pending_state(self):
         self.cache.clear()
         self.reads.clear()
         self.pending_writes.clear()
+        self.pending_deletes.clear()
+        self.pending_deltas.clear()
 
 
 class ContractDriver(CacheDriver):
@@ -192,23 +338,82 @@ class ContractDriver(CacheDriver):
         self.delimiter = '.'
 
     def items(self, prefix=''):
+        self.materialize(prefix)
+
         # Get all of the items in the cache currently
         _items = {}
         keys = set()
         for k, v in self.cache.items():
-            if k.startswith(prefix) and v is not None:
-                _items[k] = v
+            if k.startswith(prefix):
+                # A key cached as None has been deleted, or isn't in the db either
+                if v is not None:
+                    _items[k] = v
                 keys.add(k)
 
-        # Get all of the keys we need
-        db_keys = set(self.driver.iter(prefix=prefix))
+        # Get all of the keys we need, unless they were all deleted
+        db_keys = set() if self.is_deleted(prefix) else set(self.driver.iter(prefix=prefix))
 
         # Subtract the already gotten keys
         for k in db_keys - keys:
-            _items[k] = self.get(k) # Cache get will add the keys to the cache
+            v = self.get(k) # Cache get will add the keys to the cache
+            if v is not None:
+                _items[k] = v
 
         return _items
 
+    def iter_items(self, prefix='', start_after=None, limit=0, batch_size=config.ITER_BATCH_SIZE):
+        # Yields the items under the prefix in key order, after start_after if it is given and at most limit of them.
+        # Keys come from the database a page at a time, merged with the keys the cache held when iteration started; the
+        # cache wins where both have a key, and a key it holds as None has been deleted. Each item is metered as it is
+        # yielded, so stopping early only pays for what was seen.
+        self.materialize(prefix)
+
+        cached = sorted(k for k in self.cache if k.startswith(prefix) and (start_after is None or k > start_after))
+        c = 0
+
+        yielded = 0
+        after = start_after
+        done = False
+
+        # After the whole prefix was deleted, only what was written since is left
+        deleted = self.is_deleted(prefix)
+
+        while not done:
+            length = batch_size if limit <= 0 else min(batch_size, limit - yielded)
+            page = [] if deleted else self.driver.iter(prefix, length=length, start_after=after)
+
+            done = len(page) < length
+            if page:
+                after = page[-1]
+
+            # The cached keys that sort among this page, or all that are left after the last one
+            end = c
+            while end < len(cached) and (done or cached[end] <= after):
+                end += 1
+
+            keys = sorted(set(page).union(cached[c:end]))
+            c = end
+
+            fetched = self.driver.get_many([k for k in page if k not in self.cache and not self.is_deleted(k)])
+
+            for key in keys:
+                if key in self.cache:
+                    value = self.cache[key]
+                else:
+                    value = fetched.get(key)
+                    self.cache[key] = value
+                    self.reads.add(key)
+
+                if value is None:
+                    continue
+
+                rt.deduct_read(*encode_kv(key, value))
+                yield key, value
+
+                yielded += 1
+                if yielded == limit:
+                    return
+
     def keys(self, prefix=''):
         return list(self.items(prefix).keys())
 
@@ -244,25 +449,40 @@ class ContractDriver(CacheDriver):
     def get_compiled(self, name):
         return self.get_var(name, COMPILED_KEY)
 
-    def set_contract(self, name, code, owner=None, overwrite=False, timestamp=Datetime._from_datetime(datetime.now())):
+    def get_access(self, name):
+        return self.get_var(name, ACCESS_KEY)
+
+    def set_contract(self, name, code, owner=None, overwrite=False, timestamp=None, compiled=None, access=None):
+        # compiled is the marshalled code when the caller already has it. Otherwise the source is compiled here.
+        # access is what each exported function may read and write, for contracts that went through the compiler.
+        # Without a timestamp the contract is stamped with the time it is stored.
+        if timestamp is None:
+            timestamp = Datetime._from_datetime(datetime.now())
+
         if self.get_contract(name) is None:
-            code_obj = compile(code, '', 'exec')
-            code_blob = marshal.dumps(code_obj)
+            code_blob = compiled if compiled is not None else compilation_cache.compile(code)
 
             self.set_var(name, CODE_KEY, value=code)
             self.set_var(name, COMPILED_KEY, value=code_blob)
             self.set_var(name, OWNER_KEY, value=owner)
             self.set_var(name, TIME_KEY, value=timestamp)
 
+            if access is not None:
+                self.set_var(name, ACCESS_KEY, value=access)
+
     def delete_contract(self, name):
-        for key in self.keys(name):
-            if self.cache.get(key) is not None:
-                del self.cache[key]
+        prefix = self.make_key(name, '')
+
+        for key in [k for k in self.cache if k.startswith(prefix)]:
+            del self.cache[key]
+
+        for key in [k for k in self.pending_writes if k.startswith(prefix)]:
+            del self.pending_writes[key]
 
-            if self.pending_writes.get(key) is not None:
-                del self.pending_writes[key]
+        for key in [k for k in self.pending_deltas if k.startswith(prefix)]:
+            del self.pending_deltas[key]
 
-            self.driver.delete(key)
+        self.driver.delete_prefix(prefix)
 
     def flush(self):
         self.driver.flush()
@@ -103,7 +103,9 @@ def encode_kv(key, value):
     #     value = ''
 
     k = key.encode()
-    v = encode(value).encode()
+
+    # Drivers store bytes as they are, so that is what reading or writing them costs
+    v = value if isinstance(value, bytes) else encode(value).encode()
     return k, v
 
 
@@ -1,3 +1,6 @@
+import operator
+from decimal import Decimal
+
 from contracting.db.driver import ContractDriver
 from contracting.execution.runtime import rt
 from contracting import config
@@ -5,13 +8,77 @@ from contracting.stdlib.bridge.decimal import ContractingDecimal
 
 driver = rt.env.get('__Driver') or ContractDriver()
 
+# The in-place operators the compiler passes to Hash._update for augmented assignments, by their symbol
+UPDATE_OPERATORS = {
+    '+=': operator.iadd,
+    '-=': operator.isub,
+    '*=': operator.imul,
+    '/=': operator.itruediv,
+    '//=': operator.ifloordiv,
+    '%=': operator.imod,
+    '**=': operator.ipow,
+    '<<=': operator.ilshift,
+    '>>=': operator.irshift,
+    '&=': operator.iand,
+    '|=': operator.ior,
+    '^=': operator.ixor,
+    '@=': operator.imatmul,
+}
+
+# What OrderedHash and Counter hold
+NUMBER_TYPES = (int, float, Decimal, ContractingDecimal)
+
+# OrderedHash keeps its index under '<contract>.<name>.__order__:'. No variable name contains the separator, so this
+# can't be another variable or part of the hash itself.
+ORDER_INDEX = '__order__'
+
+# Order keys give exponents a fixed width so they compare as strings
+EXPONENT_OFFSET = 5000
+INVERT = str.maketrans('0123456789', '9876543210')
+
+
+def order_key(value):
+    # A string that sorts before those of smaller numbers: positives (by exponent, then digits, both inverted so that
+    # larger comes first), then zero, then negatives. After the digits of a positive number comes the delimiter, which
+    # sorts after every digit, so 1.23 is before 1.2. A negative number ends in '/', which sorts before every digit, so
+    # -1.2 is before -1.23.
+    assert type(value) in NUMBER_TYPES, 'Only numbers can be ordered.'
+
+    if type(value) == ContractingDecimal:
+        value = value._d
+    elif type(value) == float:
+        value = Decimal(str(value))
+    else:
+        value = Decimal(value)
+
+    assert value.is_finite(), 'Only finite numbers can be ordered.'
+
+    if value == 0:
+        return '4'
+
+    sign, digits, _ = value.as_tuple()
+    digits = ''.join(str(d) for d in digits).rstrip('0')
+
+    exponent = value.adjusted() + EXPONENT_OFFSET
+    assert 0 <= exponent < 2 * EXPONENT_OFFSET, 'Number is too large or too small to order.'
+    exponent = '{:04d}'.format(exponent)
+
+    if sign:
+        return '6' + exponent + digits + '/'
+
+    return '2' + (exponent + digits).translate(INVERT)
+
 class Datum:
+    __slots__ = ('_driver', '_key')
+
     def __init__(self, contract, name, driver: ContractDriver):
         self._driver = driver
         self._key = self._driver.make_key(contract, name)
 
 
 class Variable(Datum):
+    __slots__ = ('_type',)
+
     def __init__(self, contract, name, driver: ContractDriver=driver, t=None):
         self._type = None
 
@@ -34,16 +101,23 @@ class Variable(Datum):
 
 
 class Hash(Datum):
+    __slots__ = ('_delimiter', '_default_value', '_prefix', '_keys')
+
     def __init__(self, contract, name, driver: ContractDriver=driver, default_value=None):
         super().__init__(contract, name, driver=driver)
         self._delimiter = config.DELIMITER
         self._default_value = default_value
+        self._prefix = self._key + self._delimiter
+
+        # Multi-dimensional keys already validated, by the tuple. Contract modules are loaded afresh for each
+        # transaction, so this only lives as long as one.
+        self._keys = {}
 
     def _set(self, key, value):
-        self._driver.set('{}{}{}'.format(self._key, self._delimiter, key), value)
+        self._driver.set(self._prefix + key, value)
 
     def _get(self, item):
-        value = self._driver.get('{}{}{}'.format(self._key, self._delimiter, item))
+        value = self._driver.get(self._prefix + item)
 
         # Add Python defaultdict behavior for easier smart contracting
         if value is None:
@@ -60,47 +134,121 @@ class Hash(Datum):
                 len(key), config.MAX_HASH_DIMENSIONS
             )
 
-            new_key_str = ''
-            for k in key:
-                assert not isinstance(k, slice), 'Slices prohibited in hashes.'
+            return self._validate_parts(key)
+
+        return self._validate_single(key)
+
+    def _validate_parts(self, key):
+        # Every check but the number of dimensions, which the compiler already knows for the keys it passes here
+        try:
+            validated = self._keys.get(key)
+        except TypeError:
+            validated = None  # A part that can't be hashed, like a list
+
+        if validated is not None:
+            return validated
 
+        parts = []
+        strings = True
+        for k in key:
+            assert not isinstance(k, slice), 'Slices prohibited in hashes.'
+
+            if k.__class__ is not str:
+                strings = False
                 k = str(k)
 
-                assert config.DELIMITER not in k, 'Illegal delimiter in key.'
-                assert config.INDEX_SEPARATOR not in k, 'Illegal separator in key.'
+            assert config.DELIMITER not in k, 'Illegal delimiter in key.'
+            assert config.INDEX_SEPARATOR not in k, 'Illegal separator in key.'
 
-                new_key_str += '{}{}'.format(k, self._delimiter)
+            parts.append(k)
 
-            key = new_key_str[:-len(self._delimiter)]
-        else:
-            key = str(key)
+        validated = self._delimiter.join(parts)
+
+        assert len(validated) <= config.MAX_KEY_SIZE, 'Key is too long ({}). Max is {}.'.format(
+            len(validated), config.MAX_KEY_SIZE)
 
-            assert config.DELIMITER not in key, 'Illegal delimiter in key.'
-            assert config.INDEX_SEPARATOR not in key, 'Illegal separator in key.'
+        # Only keys made of strings are remembered: a string is only ever equal to the same string, while 1, 1.0 and
+        # True are equal tuple members that turn into different keys
+        if strings:
+            self._keys[key] = validated
 
+        return validated
+
+    def _validate_single(self, key):
+        # A single expression can still evaluate to a tuple
+        if isinstance(key, tuple):
+            return self._validate_key(key)
+
+        key = str(key)
+
+        assert config.DELIMITER not in key, 'Illegal delimiter in key.'
+        assert config.INDEX_SEPARATOR not in key, 'Illegal separator in key.'
         assert len(key) <= config.MAX_KEY_SIZE, 'Key is too long ({}). Max is {}.'.format(len(key), config.MAX_KEY_SIZE)
+
         return key
 
+    # The compiler turns subscripts of a contract's own hashes into these when it can see the shape of the key:
+    # h[k] into h._get_key(k), and h[a, b] into h._get_parts(a, b). The value comes first in the setters so it is
+    # still evaluated before the key, as it is in an assignment.
+    def _get_key(self, key):
+        return self._get(self._validate_single(key))
+
+    def _get_parts(self, *key):
+        return self._get(self._validate_parts(key))
+
+    def _set_key(self, value, key):
+        self._set(self._validate_single(key), value)
+
+    def _set_parts(self, value, *key):
+        self._set(self._validate_parts(key), value)
+
+    # h[k] += v becomes h._update(h._read_key(k), '+=', v): the key is checked and built once, and the read still
+    # happens before v is evaluated and the write after, so the driver sees exactly what the two subscripts did.
+    def _read_key(self, key):
+        key = self._validate_single(key)
+        return key, self._get(key)
+
+    def _read_parts(self, *key):
+        key = self._validate_parts(key)
+        return key, self._get(key)
+
+    def _update(self, read, op, operand):
+        key, value = read
+        self._set(key, UPDATE_OPERATORS[op](value, operand))
+
     def _prefix_for_args(self, args):
         multi = self._validate_key(args)
-        prefix = '{}{}'.format(self._key, self._delimiter)
-        if multi != '':
-            prefix += '{}{}'.format(multi, self._delimiter)
+        if multi == '':
+            return self._prefix
 
-        return prefix
+        return self._prefix + multi + self._delimiter
 
     def all(self, *args):
         prefix = self._prefix_for_args(args)
         return self._driver.values(prefix=prefix)
 
+    def iter(self, *args, start_after=None, limit=0):
+        # Yields (key, value) pairs in key order without reading the whole hash. Keys are given as they would be
+        # subscripted, so a page can start after the last key of the one before it.
+        prefix = self._prefix_for_args(args)
+        if start_after is not None:
+            start_after = self._prefix + self._validate_key(start_after)
+
+        skip = len(self._prefix)
+        for key, value in self._driver.iter_items(prefix=prefix, start_after=start_after, limit=limit):
+            yield self._unpack(key[skip:]), value
+
+    def _unpack(self, key):
+        # A stored key as it would be subscripted: a string, or a tuple of them for more than one dimension
+        parts = key.split(self._delimiter)
+        return parts[0] if len(parts) == 1 else tuple(parts)
+
     def _items(self, *args):
         prefix = self._prefix_for_args(args)
         return self._driver.items(prefix=prefix)
 
     def clear(self, *args):
-        kvs = self._items(*args)
-        for k in kvs.keys():
-            self._driver.delete(k)
+        self._driver.delete_prefix(self._prefix_for_args(args))
 
     def __setitem__(self, key, value):
         # handle multiple hashes differently
@@ -113,6 +261,8 @@ class Hash(Datum):
 
 
 class ForeignVariable(Variable):
+    __slots__ = ()
+
     def __init__(self, contract, name, foreign_contract, foreign_name, driver: ContractDriver=driver):
         super().__init__(contract, name, driver=driver)
         self._key = self._driver.make_key(foreign_contract, foreign_name)
@@ -122,13 +272,22 @@ class ForeignVariable(Variable):
 
 
 class ForeignHash(Hash):
+    __slots__ = ()
+
     def __init__(self, contract, name, foreign_contract, foreign_name, driver: ContractDriver=driver):
         super().__init__(contract, name, driver=driver)
         self._key = self._driver.make_key(foreign_contract, foreign_name)
+        self._prefix = self._key + self._delimiter
 
     def _set(self, key, value):
         raise ReferenceError
 
+    def _set_key(self, value, key):
+        raise ReferenceError
+
+    def _set_parts(self, value, *key):
+        raise ReferenceError
+
     def __setitem__(self, key, value):
         raise ReferenceError
 
@@ -136,4 +295,119 @@ class ForeignHash(Hash):
         return super().__getitem__(item)
 
 
+class OrderedHash(Hash):
+    # A Hash of numbers that also keeps its keys in order of value, so the largest can be found without reading the
+    # whole hash. Each key has an index entry named by the order key of its value and the key itself, holding the
+    # value. Setting a key reads its old value to move its entry.
+    __slots__ = ('_order_prefix',)
 
+    def __init__(self, contract, name, driver: ContractDriver=driver, default_value=None):
+        super().__init__(contract, name, driver=driver, default_value=default_value)
+        self._order_prefix = self._key + config.INDEX_SEPARATOR + ORDER_INDEX + self._delimiter
+
+    def _entry(self, value, key):
+        return self._order_prefix + order_key(value) + self._delimiter + key
+
+    def _entry_key(self, entry):
+        # Order keys never contain the delimiter, so the key is everything after the first one
+        return self._unpack(entry[len(self._order_prefix):].split(self._delimiter, 1)[1])
+
+    def _set(self, key, value):
+        entry = self._entry(value, key) if value is not None else None
+
+        old = self._driver.get(self._prefix + key)
+        if old is not None:
+            self._driver.delete(self._entry(old, key))
+
+        self._driver.set(self._prefix + key, value)
+
+        if entry is not None:
+            self._driver.set(entry, value)
+
+    def top(self, n):
+        # The n (key, value) pairs with the largest values, largest first. Ties are in key order.
+        if n <= 0:
+            return []
+
+        return [(self._entry_key(k), v) for k, v in self._driver.iter_items(prefix=self._order_prefix, limit=n)]
+
+    def range(self, lo=None, hi=None):
+        # The (key, value) pairs with lo <= value <= hi, largest first. Only the entries returned are read, and the
+        # one past the end.
+        entries = []
+
+        start = None
+        if hi is not None:
+            # Entries for hi start just after this, except for the empty key, whose entry is exactly this
+            start = self._order_prefix + order_key(hi) + self._delimiter
+
+            value = self._driver.get(start)
+            if value is not None:
+                entries.append(('', value))
+
+        for k, v in self._driver.iter_items(prefix=self._order_prefix, start_after=start):
+            if lo is not None and v < lo:
+                break
+
+            entries.append((self._entry_key(k), v))
+
+        return entries
+
+    def rank(self, key):
+        # How many keys come before this one in top(), or None if it has no value. Reads every entry before it.
+        key = self._validate_key(key)
+
+        value = self._driver.get(self._prefix + key)
+        if value is None:
+            return None
+
+        entry = self._entry(value, key)
+        for rank, (k, _) in enumerate(self._driver.iter_items(prefix=self._order_prefix)):
+            if k == entry:
+                return rank
+
+    def clear(self, *args):
+        if args:
+            # The index is in order of value, so the entries for part of the hash have to be found one by one
+            skip = len(self._prefix)
+            for k, v in self._driver.iter_items(prefix=self._prefix_for_args(args)):
+                self._driver.delete(self._entry(v, k[skip:]))
+        else:
+            self._driver.delete_prefix(self._order_prefix)
+
+        super().clear(*args)
+
+
+class Counter(Hash):
+    # A Hash of numbers that can be added to without reading them. add() leaves a delta with the driver, summed into
+    # the stored number at commit, so transactions that only add to a key neither read it nor depend on each other.
+    # Reading a key sums what was added to it first. h[k] += v and h[k] -= v add; the other operators read and write.
+    __slots__ = ()
+
+    def __init__(self, contract, name, driver: ContractDriver=driver, default_value=0):
+        super().__init__(contract, name, driver=driver, default_value=default_value)
+
+    def add(self, key, delta):
+        self._add(self._validate_key(key), delta)
+
+    def _add(self, key, delta, subtract=False):
+        assert type(delta) in NUMBER_TYPES, 'Only numbers can be added to a Counter.'
+        self._driver.add(self._prefix + key, -delta if subtract else delta)
+
+    # The value isn't read until _update knows it is needed. An operand that sets the same key is then added to
+    # instead of overwritten, which only a contract doing both in one statement could tell.
+    def _read_key(self, key):
+        return self._validate_single(key), None
+
+    def _read_parts(self, *key):
+        return self._validate_parts(key), None
+
+    def _update(self, read, op, operand):
+        key, _ = read
+
+        if op == '+=':
+            self._add(key, operand)
+        elif op == '-=':
+            self._add(key, operand, subtract=True)
+        else:
+            self._set(key, UPDATE_OPERATORS[op](self._get(key), operand))
@@ -0,0 +1,183 @@
+import marshal
+import mmap
+import struct
+import sys
+
+from contracting.db.driver import ContractDriver, Driver, COMPILED_KEY, OWNER_KEY, TIME_KEY, ACCESS_KEY, CODE_KEY
+from contracting.db.encoder import encode, decode
+from contracting.execution.module import MODULE_CACHE, CONTRACT_METADATA
+
+# A bundle packs the compiled code and metadata of many contracts into one file, so a node can fill its module cache
+# at start-up instead of reading each contract from the database as it is first imported. The file is:
+#   header  magic, format version, the Python version that marshalled the code, length of the index
+#   index   one entry per contract, in the driver's encoding: its name, metadata and where its code is
+#   code    the marshalled code objects, back to back
+# Offsets in the index count from the start of the code section. The file is memory mapped when read, so a contract's
+# code is only paged in when it is loaded. Contracts are only ever stored whole, together with the time they were
+# submitted, so loading checks each contract's submission time against the database in one query. A bundle written
+# before a contract was deleted or submitted again cannot keep serving the old code.
+
+MAGIC = b'CTBUNDLE'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIBBI')
+
+# Metadata kept for each contract, by the key it is stored under
+METADATA = {
+    'owner': OWNER_KEY,
+    'submitted': TIME_KEY,
+    'access': ACCESS_KEY
+}
+
+
+class BundleError(Exception):
+    pass
+
+
+def contract_names(driver: ContractDriver):
+    # Keys are sorted and start with their contract's name, so this hops from one contract to the next with a query
+    # for the first key of each instead of reading every key in the database.
+    names = []
+    past = chr(ord(driver.delimiter) + 1)
+
+    found = driver.driver.iter('', length=1)
+    while found:
+        name = found[0].split(driver.delimiter, 1)[0]
+
+        code_key = driver.make_key(name, CODE_KEY)
+        if driver.driver.iter(code_key, length=1) == [code_key]:
+            names.append(name)
+
+        found = driver.driver.iter('', length=1, start_after=name + past)
+
+    return names
+
+
+def write_bundle(driver: ContractDriver, f, names=None):
+    """
+    Writes the committed contracts in the driver (or just those named) to a binary file. Returns how many were written.
+    """
+    names = contract_names(driver) if names is None else sorted(names)
+
+    index = []
+    blobs = []
+    offset = 0
+
+    for name in names:
+        code = driver.driver.get(driver.make_key(name, COMPILED_KEY))
+        if code is None:
+            raise BundleError('{} has no compiled code.'.format(name))
+
+        # Contracts stored before code was kept as bytes have it as hex
+        if type(code) != bytes:
+            code = bytes.fromhex(code)
+
+        entry = {'name': name, 'offset': offset, 'length': len(code)}
+        for field, key in METADATA.items():
+            entry[field] = driver.driver.get(driver.make_key(name, key))
+
+        index.append(entry)
+        blobs.append(code)
+        offset += len(code)
+
+    index = encode(index).encode()
+
+    f.write(HEADER.pack(MAGIC, FORMAT_VERSION, sys.version_info[0], sys.version_info[1], len(index)))
+    f.write(index)
+    for blob in blobs:
+        f.write(blob)
+
+    return len(names)
+
+
+class Bundle:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise BundleError('{} is empty.'.format(path))
+
+        try:
+            self.index = self.read_index(path)
+        except BaseException:
+            self.map.close()
+            raise
+
+    def read_index(self, path):
+        if len(self.map) < HEADER.size:
+            raise BundleError('{} is not a contract bundle.'.format(path))
+
+        magic, version, major, minor, length = HEADER.unpack_from(self.map)
+
+        if magic != MAGIC:
+            raise BundleError('{} is not a contract bundle.'.format(path))
+
+        if version != FORMAT_VERSION:
+            raise BundleError('{} is bundle format {}, expected {}.'.format(path, version, FORMAT_VERSION))
+
+        # Marshalled code is only readable by the Python version that wrote it
+        if (major, minor) != tuple(sys.version_info[:2]):
+            raise BundleError('{} was written by Python {}.{} and cannot be loaded by Python {}.{}.'.format(
+                path, major, minor, sys.version_info[0], sys.version_info[1]))
+
+        self.start = HEADER.size + length
+        entries = decode(self.map[HEADER.size:self.start].decode())
+
+        return {entry['name']: entry for entry in entries}
+
+    def names(self):
+        return list(self.index)
+
+    def code(self, name):
+        entry = self.index[name]
+        start = self.start + entry['offset']
+        return marshal.loads(self.map[start:start + entry['length']])
+
+    def metadata(self, name):
+        entry = self.index[name]
+        return {field: entry[field] for field in METADATA}
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_bundle(path, driver: ContractDriver, names=None):
+    """
+    Fills MODULE_CACHE with the code of every contract in the bundle (or just those named), and CONTRACT_METADATA with
+    their metadata. Contracts that were deleted or submitted again since the bundle was written, which the driver's
+    database shows as a different submission time, are left out. Returns the names loaded.
+    """
+    loaded = []
+
+    with Bundle(path) as bundle:
+        names = bundle.names() if names is None else names
+
+        missing = [name for name in names if name not in bundle.index]
+        if missing:
+            raise BundleError('{} does not hold {}.'.format(path, ', '.join(missing)))
+
+        keys = {name: driver.make_key(name, TIME_KEY) for name in names}
+        submitted = driver.driver.get_many(list(keys.values()))
+
+        for name in names:
+            if keys[name] not in submitted or submitted[keys[name]] != bundle.metadata(name)['submitted']:
+                continue
+
+            MODULE_CACHE[name] = bundle.code(name)
+            CONTRACT_METADATA[name] = bundle.metadata(name)
+            loaded.append(name)
+
+    return loaded
+
+
+def export_bundle(path, db='lamden', collection='state', names=None):
+    driver = ContractDriver(driver=Driver(db=db, collection=collection))
+
+    with open(path, 'wb') as f:
+        return write_bundle(driver, f, names=names)
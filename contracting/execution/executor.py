@@ -1,7 +1,8 @@
-import importlib
-from contracting.execution import runtime
+from contracting.execution.runtime import Runtime
 from contracting.db.driver import ContractDriver
-from contracting.execution.module import install_database_loader, uninstall_builtins, enable_restricted_imports, disable_restricted_imports
+from contracting.execution.module import install_database_loader, uninstall_builtins, enable_restricted_imports, \
+    disable_restricted_imports, import_contract
+from contracting.execution.metering import profiler
 from contracting.stdlib.bridge.decimal import ContractingDecimal, CONTEXT
 from contracting import config
 from copy import deepcopy
@@ -13,9 +14,14 @@ import traceback
 
 class Executor:
     def __init__(self, production=False, driver=None, metering=True,
-                 currency_contract='currency', balances_hash='balances', bypass_privates=False):
+                 currency_contract='currency', balances_hash='balances', bypass_privates=False,
+                 runtime=None, metering_mode=config.METERING_MODE, memory_limit=config.MEMORY_LIMIT):
 
         self.metering = metering
+        self.metering_mode = metering_mode
+
+        # Metered transactions can't hold more than this in large allocations
+        self.memory_limit = memory_limit
 
         self.driver = driver
 
@@ -28,7 +34,10 @@ class Executor:
 
         self.bypass_privates = bypass_privates
 
-        runtime.rt.env.update({'__Driver': self.driver})
+        # Each executor owns its runtime (tracer, environment, context and loaded modules) so several can run in
+        # one process at the same time.
+        self.runtime = runtime or Runtime()
+        self.runtime.env.update({'__Driver': self.driver})
 
     def wipe_modules(self):
         uninstall_builtins()
@@ -40,24 +49,43 @@ class Executor:
                 driver=None,
                 stamps=1000000,
                 stamp_cost=config.STAMPS_PER_TAU,
-                metering=None) -> dict:
+                metering=None,
+                profile=False) -> dict:
 
+        with self.runtime:
+            enable_restricted_imports()
+            try:
+                return self._execute(sender=sender, contract_name=contract_name, function_name=function_name,
+                                     kwargs=kwargs, environment=environment, auto_commit=auto_commit,
+                                     driver=driver, stamps=stamps, stamp_cost=stamp_cost, metering=metering,
+                                     profile=profile)
+            finally:
+                disable_restricted_imports()
+
+    def _execute(self, sender, contract_name, function_name, kwargs, environment, auto_commit, driver, stamps,
+                 stamp_cost, metering, profile):
         if not self.bypass_privates:
             assert not function_name.startswith(config.PRIVATE_METHOD_PREFIX), 'Private method not callable.'
 
         if metering is None:
             metering = self.metering
 
-        runtime.rt.env.update({'__Driver': self.driver})
+        self.runtime.env.update({'__Driver': self.driver})
 
         if driver:
-            runtime.rt.env.update({'__Driver': driver})
+            self.runtime.env.update({'__Driver': driver})
         else:
-            driver = runtime.rt.env.get('__Driver')
+            driver = self.runtime.env.get('__Driver')
 
         install_database_loader(driver=driver)
 
         balances_key = None
+
+        # Prefixes deleted whole, like cleared hashes, whose keys aren't listed in the writes, and amounts added to
+        # counters. The driver forgets both once they are committed, so with auto_commit they are kept for the output
+        # before that.
+        deletes, deltas = [], {}
+
         try:
             if metering:
                 balances_key = '{}{}{}{}{}'.format(self.currency_contract,
@@ -74,34 +102,34 @@ class Executor:
                                                                Balance at key {} is {}'.format(balances_key,
                                                                                                balance)
 
-            runtime.rt.env.update(environment)
+            self.runtime.env.update(environment)
             status_code = 0
-            runtime.rt.set_up(stmps=stamps * 1000, meter=metering) # Multiply stamps by 1000 because we divide by it later
+            self.runtime.set_up(stmps=stamps * 1000, meter=metering, mode=self.metering_mode, profile=profile,
+                                memory_limit=self.memory_limit) # Multiply stamps by 1000 because we divide by it later
 
-            runtime.rt.context._base_state = {
+            self.runtime.context._base_state = {
                 'signer': sender,
                 'caller': sender,
                 'this': contract_name,
                 'owner': driver.get_owner(contract_name)
             }
 
-            if runtime.rt.context.owner is not None and runtime.rt.context.owner != runtime.rt.context.caller:
-                raise Exception(f'Caller {runtime.rt.context.caller} is not the owner {runtime.rt.context.owner}!')
+            if self.runtime.context.owner is not None and self.runtime.context.owner != self.runtime.context.caller:
+                raise Exception(f'Caller {self.runtime.context.caller} is not the owner {self.runtime.context.owner}!')
 
             decimal.setcontext(CONTEXT)
 
-            module = importlib.import_module(contract_name)
+            module = import_contract(contract_name)
             func = getattr(module, function_name)
 
             for k, v in kwargs.items():
                 if type(v) == float:
                     kwargs[k] = ContractingDecimal(str(v))
 
-            enable_restricted_imports()
             result = func(**kwargs)
-            disable_restricted_imports()
 
             if auto_commit:
+                deletes, deltas = list(driver.pending_deletes), deepcopy(driver.pending_deltas)
                 driver.commit()
         except Exception as e:
             result = e
@@ -111,13 +139,17 @@ class Executor:
             status_code = 1
             if auto_commit:
                 driver.clear_pending_state()
+                deletes, deltas = [], {}
 
         ### EXECUTION END
 
-        runtime.rt.tracer.stop()
+        self.runtime.tracer.stop()
 
         # Deduct the stamps if that is enabled
-        stamps_used = runtime.rt.tracer.get_stamp_used()
+        stamps_used = self.runtime.tracer.get_stamp_used()
+
+        # Where the stamps went, by contract line, if asked for. Only metered executions are profiled.
+        costs = self.runtime.tracer.get_profile() if profile else None
 
         stamps_used = stamps_used // 1000
         stamps_used += 1
@@ -146,8 +178,8 @@ class Executor:
             if auto_commit:
                 driver.commit()
 
-        runtime.rt.clean_up()
-        runtime.rt.env.update({'__Driver': driver})
+        self.runtime.clean_up()
+        self.runtime.env.update({'__Driver': driver})
 
         output = {
             'status_code': status_code,
@@ -157,7 +189,15 @@ class Executor:
             'reads': driver.reads
         }
 
-        disable_restricted_imports()
+        if not auto_commit:
+            deletes, deltas = list(driver.pending_deletes), deepcopy(driver.pending_deltas)
+
+        # Once committed, what was added to a counter is also in the writes as its total
+        output['deletes'] = deletes
+        output['deltas'] = deltas
+
+        if costs is not None:
+            output['profile'] = profiler.entries(costs)
 
         return output
 
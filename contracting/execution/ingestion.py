@@ -0,0 +1,265 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ServiceClosed(Exception):
+    pass
+
+
+class Transaction:
+    def __init__(self, tx, future):
+        self.tx = tx
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class IngestionService:
+    """
+    Asyncio front end for one or more executors.
+
+    Transactions wait in a bounded queue and are grouped into micro-batches of up to batch_size, or whatever arrived
+    within batch_timeout seconds of the first one. Each batch runs on a worker thread against one executor, and every
+    transaction's future resolves to the dict Executor.execute returns. Executors are never shared between threads,
+    so pass at least one per worker. The only exception is a single executor marked thread_safe, such as
+    SubinterpreterExecutor, which every worker may use at once.
+
+    When the queue is full, submit waits for room and submit_nowait raises asyncio.QueueFull.
+    """
+    def __init__(self, executors, max_queue=1000, batch_size=64, batch_timeout=0.005, workers=None):
+        if not isinstance(executors, (list, tuple)):
+            executors = [executors]
+
+        assert len(executors) > 0, 'At least one executor is required.'
+        assert batch_size > 0, 'Batch size must be positive.'
+
+        self.workers = workers or len(executors)
+
+        if len(executors) == 1 and getattr(executors[0], 'thread_safe', False):
+            self.executors = executors * self.workers
+        else:
+            assert len(executors) >= self.workers, 'Each worker needs an executor of its own.'
+            self.executors = list(executors[:self.workers])
+
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.total_latency = 0
+
+        self._queue = None
+        self._idle = None
+        self._pool = None
+        self._batcher = None
+        self._running = set()
+        self._closing = False
+
+    @property
+    def started(self):
+        return self._batcher is not None
+
+    async def start(self):
+        assert not self.started, 'Service already started.'
+
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._idle = asyncio.Queue()
+        for executor in self.executors:
+            self._idle.put_nowait(executor)
+
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._closing = False
+        self._batcher = asyncio.ensure_future(self._batch_loop())
+
+    async def stop(self):
+        if not self.started:
+            return
+
+        # Stop taking new transactions, let everything already queued run, then shut the workers down.
+        self._closing = True
+        await self._queue.join()
+
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+
+        if self._running:
+            await asyncio.wait(self._running)
+
+        self._pool.shutdown(wait=True)
+        self._batcher = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    def _make(self, sender, contract_name, function_name, kwargs, options):
+        if not self.started or self._closing:
+            self.rejected += 1
+            raise ServiceClosed('Service is not accepting transactions.')
+
+        tx = {
+            'sender': sender,
+            'contract_name': contract_name,
+            'function_name': function_name,
+            'kwargs': kwargs,
+            **options
+        }
+
+        return Transaction(tx, asyncio.get_event_loop().create_future())
+
+    def _enqueued(self):
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    async def submit(self, sender, contract_name, function_name, kwargs, **options):
+        item = self._make(sender, contract_name, function_name, kwargs, options)
+
+        await self._queue.put(item)
+        self._enqueued()
+
+        return item.future
+
+    def submit_nowait(self, sender, contract_name, function_name, kwargs, **options):
+        item = self._make(sender, contract_name, function_name, kwargs, options)
+
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+
+        self._enqueued()
+
+        return item.future
+
+    async def execute(self, sender, contract_name, function_name, kwargs, **options) -> dict:
+        future = await self.submit(sender, contract_name, function_name, kwargs, **options)
+        return await future
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_timeout
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _batch_loop(self):
+        loop = asyncio.get_event_loop()
+
+        while True:
+            batch = await self._next_batch()
+            executor = await self._idle.get()
+
+            self.batches += 1
+
+            task = asyncio.ensure_future(self._dispatch(loop, executor, batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _dispatch(self, loop, executor, batch):
+        try:
+            work = self._pool.submit(_run_batch, executor, [item.tx for item in batch])
+        except Exception as e:
+            # The batch could not be run at all, so every transaction in it fails with the reason why
+            self._idle.put_nowait(executor)
+            self._resolve(batch, [(None, e)] * len(batch))
+            return
+
+        # The executor goes back to the idle pool when the worker thread is done with it, not when this task is, since
+        # cancelling the task doesn't stop a batch that is already running
+        work.add_done_callback(lambda _: self._release(loop, executor))
+
+        outcomes = []
+        try:
+            outcomes = await asyncio.wrap_future(work)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            outcomes = [(None, e)] * len(batch)
+        finally:
+            self._resolve(batch, outcomes)
+
+    def _release(self, loop, executor):
+        # Runs on the worker thread, so the executor is handed back through the loop
+        try:
+            loop.call_soon_threadsafe(self._idle.put_nowait, executor)
+        except RuntimeError:
+            # The loop is closed, so nothing is left to run on the executor
+            pass
+
+    def _resolve(self, batch, outcomes):
+        now = time.monotonic()
+
+        for i, item in enumerate(batch):
+            self.total_latency += now - item.enqueued
+
+            # Transactions left without an outcome were cancelled before the batch finished
+            if i >= len(outcomes):
+                self.failed += 1
+                item.future.cancel()
+            else:
+                output, error = outcomes[i]
+
+                if error is not None:
+                    self.failed += 1
+                    if not item.future.done():
+                        item.future.set_exception(error)
+                else:
+                    if output['status_code'] != 0:
+                        self.failed += 1
+                    if not item.future.done():
+                        item.future.set_result(output)
+
+            self.completed += 1
+            self._queue.task_done()
+
+    def metrics(self) -> dict:
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'max_queue_depth': self.max_depth,
+            'in_flight': len(self._running),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'average_batch_size': self.completed / self.batches if self.batches else 0,
+            'average_latency': self.total_latency / self.completed if self.completed else 0
+        }
+
+
+def _run_batch(executor, txs):
+    # Runs on a worker thread. Each transaction gets its own outcome so one bad transaction doesn't fail the batch.
+    outcomes = []
+    for tx in txs:
+        try:
+            outcomes.append((executor.execute(**tx), None))
+        except Exception as e:
+            outcomes.append((None, e))
+    return outcomes
@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import queue
+import builtins
+from concurrent.futures import ThreadPoolExecutor
+
+from contracting.db.encoder import encode, decode
+
+# Sub-interpreters with their own GIL, and the channels used to pass data between them, are only exposed through
+# private modules for now. 3.13 renamed the modules and made run_string report failures instead of raising them.
+try:
+    import _interpreters as _interp
+    import _interpchannels as _channels
+except ImportError:
+    try:
+        import _xxsubinterpreters as _interp
+        import _xxinterpchannels as _channels
+    except ImportError:
+        _interp = None
+        _channels = None
+
+SUPPORTED = _interp is not None and sys.version_info >= (3, 12)
+
+ERROR_KEY = '__error__'
+
+BOOTSTRAP = '''
+import json
+import sys
+sys.path[:0] = json.loads(paths)
+from contracting.execution.interpreters import _WorkerState
+_worker = _WorkerState(setup, results)
+'''
+
+RUN = '_worker.run(payload)'
+
+SHUTDOWN = '_worker.close()'
+
+# 3.13 channels are told what to do with items left behind by a destroyed interpreter, block senders until the item is
+# received unless asked not to, and hand back that setting with each item received. A worker sends its result before
+# the caller receives it, on the same thread, so sends must not block.
+UNBOUND_REMOVE = 1
+
+
+def _create_channel():
+    if sys.version_info >= (3, 13):
+        return _channels.create(UNBOUND_REMOVE)
+    return _channels.create()
+
+
+def _send(channel, data):
+    if sys.version_info >= (3, 13):
+        _channels.send(channel, data, blocking=False)
+    else:
+        _channels.send(channel, data)
+
+
+def _recv(channel):
+    if sys.version_info >= (3, 13):
+        return _channels.recv(channel)[0]
+    return _channels.recv(channel)
+
+
+class SubinterpreterError(Exception):
+    pass
+
+
+def _encode_result(output):
+    result = output['result']
+    if isinstance(result, Exception):
+        result = {ERROR_KEY: [type(result).__name__, str(result)]}
+
+    encoded = {
+        'status_code': output['status_code'],
+        'result': result,
+        'stamps_used': output['stamps_used'],
+        'writes': output['writes'],
+        'reads': sorted(output['reads'])
+    }
+
+    if 'deletes' in output:
+        encoded['deletes'] = output['deletes']
+
+    if 'deltas' in output:
+        encoded['deltas'] = output['deltas']
+
+    return encode(encoded)
+
+
+def _rebuild_exception(name, message):
+    # Only builtin exception types can be rebuilt by name. Anything raised by a contract or the executor itself comes
+    # back as a plain Exception carrying the original type name.
+    exc_type = getattr(builtins, name, None)
+    if isinstance(exc_type, type) and issubclass(exc_type, Exception):
+        return exc_type(message)
+    return Exception('{}: {}'.format(name, message))
+
+
+def _decode_result(data):
+    output = decode(data)
+
+    result = output['result']
+    if isinstance(result, dict) and ERROR_KEY in result:
+        output['result'] = _rebuild_exception(*result[ERROR_KEY])
+
+    output['reads'] = set(output['reads'])
+
+    return output
+
+
+class _WorkerState:
+    # Lives inside a sub-interpreter. Owns the executor, driver, tracer and module cache of that interpreter.
+    def __init__(self, setup, results):
+        from contracting.db.driver import Driver, ContractDriver
+        from contracting.execution.executor import Executor
+
+        setup = decode(setup)
+
+        self.driver = ContractDriver(driver=Driver(db=setup['db'], collection=setup['collection']))
+        self.executor = Executor(driver=self.driver, **setup['options'])
+        self.results = results
+
+    def run(self, payload):
+        tx = decode(payload)
+
+        try:
+            output = self.executor.execute(**tx)
+            data = _encode_result(output).encode()
+        finally:
+            # Workers only share the database. Dropping the cache keeps this interpreter from serving state that
+            # another worker has since committed.
+            self.driver.clear_pending_state()
+
+        _send(self.results, data)
+
+    def close(self):
+        # pymongo's monitor threads hold frames in this interpreter, which would stop it from being destroyed.
+        self.driver.driver.client.close()
+
+        from pymongo import periodic_executor
+        periodic_executor._shutdown_executors()
+
+
+class _Worker:
+    def __init__(self, paths, db, collection, options):
+        # Everything is sent over as JSON through the shared data of run_string rather than written into the script
+        self.results = _create_channel()
+        self.id = _interp.create()
+
+        try:
+            self._run(BOOTSTRAP, {
+                'paths': json.dumps(paths),
+                'setup': encode({'db': db, 'collection': collection, 'options': options}),
+                'results': self.results
+            })
+        except Exception:
+            _interp.destroy(self.id)
+            _channels.destroy(self.results)
+            raise
+
+    def _run(self, script, shared=None):
+        try:
+            failure = _interp.run_string(self.id, script, shared)
+        except Exception as e:
+            raise SubinterpreterError(str(e)) from None
+
+        if failure is not None:
+            raise SubinterpreterError('{}: {}'.format(failure.type.__name__, failure.msg))
+
+    def execute(self, payload):
+        self._run(RUN, {'payload': payload})
+        return _recv(self.results)
+
+    def close(self):
+        try:
+            self._run(SHUTDOWN)
+        finally:
+            _interp.destroy(self.id)
+            _channels.destroy(self.results)
+
+
+class SubinterpreterExecutor:
+    """
+    Runs transactions on a pool of sub-interpreters, each with its own GIL, tracer, import hooks and module cache.
+
+    Every worker opens its own connection to the same database and collection. Transactions are sent over as encoded
+    JSON, and results come back the same way over a channel, decoded into the shape Executor.execute returns.
+    Exceptions raised inside a worker are rebuilt from their type name and message. Workers do not see each other's
+    pending writes, so callers must not run conflicting transactions at the same time.
+    """
+    # Each transaction takes an idle worker, so any number of threads may call execute at once
+    thread_safe = True
+
+    def __init__(self, workers=None, db='lamden', collection='state', **options):
+        assert SUPPORTED, 'Sub-interpreters require Python 3.12 or newer.'
+
+        self.size = workers or os.cpu_count() or 1
+        self.closed = False
+
+        paths = list(sys.path)
+
+        self._idle = queue.Queue()
+        self._workers = []
+        try:
+            for _ in range(self.size):
+                worker = _Worker(paths, db, collection, options)
+                self._workers.append(worker)
+                self._idle.put(worker)
+        except Exception:
+            self.close()
+            raise
+
+        self._pool = ThreadPoolExecutor(max_workers=self.size)
+
+    def execute(self, sender, contract_name, function_name, kwargs, **options) -> dict:
+        assert not self.closed, 'Executor is closed.'
+
+        payload = encode({
+            'sender': sender,
+            'contract_name': contract_name,
+            'function_name': function_name,
+            'kwargs': kwargs,
+            **options
+        })
+
+        worker = self._idle.get()
+        try:
+            data = worker.execute(payload)
+        finally:
+            self._idle.put(worker)
+
+        return _decode_result(data)
+
+    def submit(self, sender, contract_name, function_name, kwargs, **options):
+        return self._pool.submit(self.execute, sender, contract_name, function_name, kwargs, **options)
+
+    def map(self, transactions):
+        futures = [self.submit(**tx) for tx in transactions]
+        return [f.result() for f in futures]
+
+    def close(self):
+        if self.closed:
+            return
+
+        self.closed = True
+
+        pool = getattr(self, '_pool', None)
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+        for worker in self._workers:
+            worker.close()
+
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
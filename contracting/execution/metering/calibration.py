@@ -0,0 +1,283 @@
+import dis
+import gc
+import math
+import platform
+import sys
+import time
+import textwrap
+
+from contracting.execution.metering import costs
+
+# Calibration prices opcodes by how long they really take on this host. Each workload is a statement run in a loop.
+# Its opcodes are counted with an opcode trace and its time is measured untraced; both are taken at two loop lengths
+# and differenced, so setup cancels out and only the per-iteration work is left. A non-negative least squares fit
+# then finds the time of each opcode, and those times are scaled so the workloads cost as much in total as they do
+# under the current table, keeping stamps per block the same on average.
+#
+# Contracts can only use plain Python, so the workloads do too. Dicts stand in for Hash storage.
+
+WORKLOADS = [
+    ('loop', '', 'pass'),
+    ('add', 'a = 1; b = 2', 'x = a + b'),
+    ('subtract', 'a = 1; b = 2', 'x = a - b'),
+    ('multiply', 'a = 12345; b = 678', 'x = a * b'),
+    ('floor divide', 'a = 12345; b = 678', 'x = a // b'),
+    ('modulo', 'a = 12345; b = 678', 'x = a % b'),
+    ('power', 'a = 12345', 'x = a ** 3'),
+    ('true divide', 'a = 12345; b = 678', 'x = a / b'),
+    ('bitwise', 'a = 12345; b = 678', 'x = a & b | a ^ b'),
+    ('shift', 'a = 12345', 'x = a << 3 >> 2'),
+    ('negate', 'a = 12345', 'x = -a'),
+    ('not', 'a = 12345', 'x = not a'),
+    ('compare', 'a = 1; b = 2', 'x = a < b'),
+    ('contains', 'l = list(range(10)); a = 5', 'x = a in l'),
+    ('identity', 'a = None', 'x = a is None'),
+    ('augmented', 'a = 0', 'a += 1'),
+    ('branch', 'a = 1; b = 2', 'if a < b:\n    x = 1\nelse:\n    x = 2'),
+    ('global', '', 'x = GLOBAL'),
+    ('constant', '', 'x = 5'),
+    ('list index', 'l = list(range(10))', 'x = l[3]'),
+    ('list store', 'l = list(range(10))', 'l[3] = 5'),
+    ('slice', 'l = list(range(10))', 'x = l[2:5]'),
+    ('dict get', "d = {'stu': 100}", "x = d['stu']"),
+    ('dict store', "d = {'stu': 100}", "d['stu'] = 5"),
+    ('dict delete', "d = {}", "d['stu'] = 5\ndel d['stu']"),
+    ('attribute', "s = 'stu'", 'x = s.upper'),
+    ('method', "s = 'stu'", 'x = s.upper()'),
+    ('builtin call', 'l = list(range(10))', 'x = len(l)'),
+    ('function call', 'def f(y):\n    return y', 'x = f(1)'),
+    ('keyword call', 'def f(y=0):\n    return y', 'x = f(y=1)'),
+    ('unpack', 't = (1, 2)', 'x, y = t'),
+    ('tuple', 'a = 1; b = 2', 'x = (a, b)'),
+    ('list', 'a = 1; b = 2', 'x = [a, b, a]'),
+    ('dict', 'a = 1; b = 2', "x = {'a': a, 'b': b}"),
+    ('set', 'a = 1; b = 2', 'x = {a, b}'),
+    ('string concat', "s = 'stu'", 'x = s + s'),
+    ('format', 'a = 12345', "x = '{}'.format(a)"),
+    ('f-string', 'a = 12345', "x = f'{a}:{a}'"),
+    ('list comprehension', 'l = list(range(10))', 'x = [i for i in l]'),
+    ('dict comprehension', 'l = list(range(10))', 'x = {i: i for i in l}'),
+    ('inner loop', 'l = list(range(10))', 'for i in l:\n    pass'),
+    ('while', '', 'i = 0\nwhile i < 5:\n    i += 1'),
+    ('lambda', 'f = lambda y: y', 'x = f(1)'),
+    ('sorted', 'l = list(range(10, 0, -1))', 'x = sorted(l)'),
+    ('transfer', "balances = {'stu': 10 ** 9}", (
+        "if balances['stu'] >= 1:\n"
+        "    balances['stu'] -= 1\n"
+        "    balances['colin'] = balances.get('colin', 0) + 1")),
+]
+
+SHORT_RUN = 200
+LONG_RUN = 2000
+
+# How strongly the fit is pulled towards the current table for opcodes the workloads can't tell apart
+PRIOR_WEIGHT = 1e-3
+
+
+def workload_source(setup, statement):
+    body = textwrap.indent(statement, ' ' * 8)
+    setup = textwrap.indent(setup.replace('; ', '\n'), ' ' * 4) if setup else ''
+
+    return 'GLOBAL = 1\n\ndef workload(n):\n{}\n    for _ in range(n):\n{}\n'.format(setup, body)
+
+
+def build(setup, statement):
+    scope = {}
+    exec(compile(workload_source(setup, statement), '<calibration>', 'exec'), scope)
+    return scope['workload']
+
+
+def count_opcodes(function, n):
+    # Counts every instruction executed by the function (and anything it calls that was compiled for calibration)
+    if sys.version_info < (3, 7):
+        raise NotImplementedError('Calibration counts opcodes with opcode tracing, which requires Python 3.7 or newer.')
+
+    counts = {}
+    code = function.__code__
+
+    def trace(frame, event, arg):
+        if frame.f_code.co_filename != code.co_filename:
+            return None
+
+        frame.f_trace_opcodes = True
+        if event == 'opcode':
+            name = dis.opname[frame.f_code.co_code[frame.f_lasti]]
+            counts[name] = counts.get(name, 0) + 1
+        return trace
+
+    previous = sys.gettrace()
+
+    # Opcode events need a frame to have asked for them before tracing starts on 3.12+
+    caller = sys._getframe()
+    caller.f_trace_opcodes = True
+
+    sys.settrace(trace)
+    try:
+        function(n)
+    finally:
+        sys.settrace(previous)
+        caller.f_trace_opcodes = False
+
+    return counts
+
+
+def time_run(function, n, repeat):
+    best = None
+
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(n)
+            elapsed = time.perf_counter() - start
+
+            if best is None or elapsed < best:
+                best = elapsed
+    finally:
+        if enabled:
+            gc.enable()
+
+    return best
+
+
+def measure(setup, statement, repeat=5):
+    # Opcodes and seconds per loop iteration
+    function = build(setup, statement)
+    runs = LONG_RUN - SHORT_RUN
+
+    short, long = count_opcodes(function, SHORT_RUN), count_opcodes(function, LONG_RUN)
+    counts = {name: (long.get(name, 0) - short.get(name, 0)) / runs for name in set(short) | set(long)}
+    counts = {name: count for name, count in counts.items() if count > 0}
+
+    seconds = (time_run(function, LONG_RUN, repeat) - time_run(function, SHORT_RUN, repeat)) / runs
+
+    return counts, max(seconds, 0)
+
+
+def nnls(rows, targets, prior=None, weight=0, iterations=2000, tolerance=1e-12):
+    """
+    Solves min |Ax - b|^2 + weight * |x - prior|^2 with x >= 0 by coordinate descent. Rows are dicts of column to
+    coefficient; the solution is a dict of column to value.
+    """
+    columns = sorted({c for row in rows for c in row})
+    prior = prior or {}
+
+    gram = {c: {} for c in columns}
+    rhs = {c: weight * prior.get(c, 0) for c in columns}
+
+    for row, target in zip(rows, targets):
+        for c, a in row.items():
+            rhs[c] += a * target
+            for d, b in row.items():
+                gram[c][d] = gram[c].get(d, 0) + a * b
+
+    for c in columns:
+        gram[c][c] = gram[c].get(c, 0) + weight
+
+    x = {c: prior.get(c, 0) for c in columns}
+
+    for _ in range(iterations):
+        largest = 0
+        for c in columns:
+            if gram[c][c] == 0:
+                continue
+
+            gradient = sum(g * x[d] for d, g in gram[c].items()) - rhs[c]
+            value = max(0, x[c] - gradient / gram[c][c])
+
+            largest = max(largest, abs(value - x[c]))
+            x[c] = value
+
+        if largest < tolerance:
+            break
+
+    return x
+
+
+def table_cost(counts, table):
+    return sum(count * table.get(name, costs.UNKNOWN_COST) for name, count in counts.items())
+
+
+class CalibrationReport:
+    def __init__(self, current, candidate, workloads, opcodes):
+        self.current = current
+        self.candidate = candidate
+        self.workloads = workloads
+        self.opcodes = opcodes
+
+    def mispriced(self, top=10):
+        # Opcodes the current table is furthest off on, in either direction
+        measured = [op for op in self.opcodes if op['candidate'] and op['current']]
+        measured.sort(key=lambda op: -abs(math.log(op['current'] / op['candidate'])))
+        return measured[:top]
+
+    def summary(self, top=10) -> dict:
+        return {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'workloads': self.workloads,
+            'mispriced': self.mispriced(top)
+        }
+
+
+def calibrate(workloads=None, current=None, repeat=5):
+    """
+    Measures the workloads and fits a candidate table. Opcodes no workload runs keep their current price.
+    """
+    workloads = WORKLOADS if workloads is None else workloads
+    current = costs.read_costs(costs.cost_file()) if current is None else current
+
+    rows, seconds, names = [], [], []
+    for name, setup, statement in workloads:
+        counts, elapsed = measure(setup, statement, repeat=repeat)
+        names.append(name)
+        rows.append(counts)
+        seconds.append(elapsed)
+
+    # Seconds per unit of cost under the current table, to scale the fit back into cost units
+    total_cost = sum(table_cost(row, current) for row in rows)
+    scale = sum(seconds) / total_cost if total_cost else 1
+
+    prior = {op: current.get(op, costs.UNKNOWN_COST) * scale for row in rows for op in row}
+    mean_diagonal = sum(sum(v * v for v in row.values()) for row in rows) / max(len(prior), 1)
+
+    fitted = nnls(rows, seconds, prior=prior, weight=PRIOR_WEIGHT * mean_diagonal)
+
+    candidate = dict(current)
+    for op, value in fitted.items():
+        candidate[op] = max(int(round(value / scale)), 1)
+
+    workload_rows = []
+    for name, row, elapsed in zip(names, rows, seconds):
+        workload_rows.append({
+            'name': name,
+            'microseconds': elapsed * 1e6,
+            'current': table_cost(row, current),
+            'candidate': table_cost(row, candidate)
+        })
+
+    totals = {}
+    for row in rows:
+        for op, count in row.items():
+            totals[op] = totals.get(op, 0) + count
+
+    opcodes = [{
+        'name': op,
+        'count': totals[op],
+        'current': current.get(op, costs.UNKNOWN_COST),
+        'candidate': candidate[op]
+    } for op in sorted(totals)]
+
+    return CalibrationReport(current, candidate, workload_rows, opcodes)
+
+
+def write_table(table, f, note=None):
+    v = sys.version_info
+    f.write('# Stamp cost of each opcode on CPython {}.{}, one NAME,cost pair per line.\n'.format(v[0], v[1]))
+    if note:
+        f.write('# {}\n'.format(note))
+
+    for name in sorted(table, key=lambda op: dis.opmap.get(op, costs.TABLE_SIZE)):
+        f.write('{},{}\n'.format(name, table[name]))
@@ -0,0 +1,111 @@
+import dis
+import os
+import sys
+
+# Opcode numbers change between CPython versions, so cost tables are keyed by opcode name and there is one per
+# version: cu_costs.<major>.<minor>.const, falling back to cu_costs.const. Setting CU_COST_FNAME overrides the choice.
+COSTS_PATH = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_COSTS_FILE = 'cu_costs.const'
+COSTS_FILE_ENV = 'CU_COST_FNAME'
+
+# Opcodes a table does not price (and anything past the end of the table) are charged this much.
+UNKNOWN_COST = 1000
+
+TABLE_SIZE = 256
+
+# Instructions an interpreter only ever rewrites its own code into. The tracer reads the original code, so tables
+# never need to price these.
+UNTRACED_PREFIXES = ('INSTRUMENTED_',)
+UNTRACED = frozenset(('CACHE', 'RESERVED', 'INTERPRETER_EXIT', 'ENTER_EXECUTOR'))
+
+
+class CostTableError(Exception):
+    pass
+
+
+def cost_file(version=None):
+    path = os.environ.get(COSTS_FILE_ENV)
+    if path:
+        return path
+
+    version = version or sys.version_info
+    versioned = os.path.join(COSTS_PATH, 'cu_costs.{}.{}.const'.format(version[0], version[1]))
+    if os.path.exists(versioned):
+        return versioned
+
+    return os.path.join(COSTS_PATH, DEFAULT_COSTS_FILE)
+
+
+def read_costs(path):
+    costs = {}
+
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+
+            try:
+                name, cost = (part.strip() for part in line.split(','))
+                cost = int(cost)
+            except ValueError:
+                raise CostTableError('{}:{}: expected NAME,cost but got {!r}'.format(path, number, line))
+
+            if cost < 0:
+                raise CostTableError('{}:{}: {} has a negative cost'.format(path, number, name))
+
+            if name in costs:
+                raise CostTableError('{}:{}: {} is priced twice'.format(path, number, name))
+
+            costs[name] = cost
+
+    return costs
+
+
+def unpriced(costs, opmap=None):
+    # Opcodes this interpreter can run that the table leaves at the unknown cost
+    opmap = dis.opmap if opmap is None else opmap
+
+    return sorted(
+        name for name, opcode in opmap.items()
+        if opcode < TABLE_SIZE and name not in costs and name not in UNTRACED and not name.startswith(UNTRACED_PREFIXES)
+    )
+
+
+def build_table(costs, opmap=None):
+    # Turns a table keyed by name into a list indexed by this interpreter's opcode numbers. A name the interpreter
+    # doesn't know means the table was written for a different version, so it is rejected rather than guessed at.
+    opmap = dis.opmap if opmap is None else opmap
+
+    unknown = sorted(name for name in costs if name not in opmap)
+    if unknown:
+        raise CostTableError('Not opcodes on Python {}.{}: {}'.format(
+            sys.version_info[0], sys.version_info[1], ', '.join(unknown)))
+
+    table = [UNKNOWN_COST] * TABLE_SIZE
+    for name, cost in costs.items():
+        if opmap[name] < TABLE_SIZE:
+            table[opmap[name]] = cost
+
+    return table
+
+
+_tables = {}
+
+
+def load_costs(path=None):
+    path = path or cost_file()
+
+    if path not in _tables:
+        try:
+            _tables[path] = build_table(read_costs(path))
+        except CostTableError as e:
+            raise CostTableError('{} does not fit this interpreter. {}'.format(path, e))
+
+    return list(_tables[path])
+
+
+def cost_table(costs):
+    # The other way around, for inspecting what a tracer charges: {opcode name: cost} for every opcode there is
+    return {dis.opname[opcode]: cost for opcode, cost in enumerate(costs)
+            if opcode < len(dis.opname) and not dis.opname[opcode].startswith('<')}
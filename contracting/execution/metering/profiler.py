@@ -0,0 +1,62 @@
+from collections import defaultdict
+
+# What a profiled cost was spent on. Bytecode is charged as execution, state access by the bytes read or written.
+EXECUTION = 'execution'
+READ = 'read'
+WRITE = 'write'
+
+# Costs charged outside any contract frame, like reading a contract's code to import it, have no contract
+RUNTIME_FRAME = '<runtime>'
+
+
+def entries(profile):
+    # Turns a tracer profile, {(contract, function, line, kind): cost}, into rows sorted from the most expensive.
+    # Costs are in the tracer's units, which are a thousandth of a stamp.
+    rows = [{
+        'contract': contract,
+        'function': function,
+        'line': line,
+        'kind': kind,
+        'cost': cost
+    } for (contract, function, line, kind), cost in profile.items()]
+
+    rows.sort(key=lambda row: (-row['cost'], str(row['contract']), str(row['function']), row['line'], row['kind']))
+    return rows
+
+
+def merge(rows, into=None):
+    # Sums rows from several executions back into a single profile
+    profile = defaultdict(int) if into is None else into
+
+    for row in rows:
+        profile[(row['contract'], row['function'], row['line'], row['kind'])] += row['cost']
+
+    return profile
+
+
+def by_function(rows):
+    totals = defaultdict(int)
+
+    for row in rows:
+        totals[(row['contract'], row['function'])] += row['cost']
+
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def collapsed(rows):
+    # Folded stacks (contract;function;line;kind cost), the input format of flamegraph.pl and speedscope
+    lines = []
+
+    for row in rows:
+        if row['contract'] is None:
+            frames = [RUNTIME_FRAME, row['kind']]
+        else:
+            frames = [str(row['contract']), str(row['function']), 'line {}'.format(row['line']), row['kind']]
+        lines.append('{} {}'.format(';'.join(frames), row['cost']))
+
+    return lines
+
+
+def write_collapsed(rows, f):
+    for line in collapsed(rows):
+        f.write(line + '\n')
@@ -2,42 +2,80 @@
 
 #include "Python.h"
 #include "compile.h"        /* in 2.3, this wasn't part of Python.h */
-#include "eval.h"           /* or this. */
+#if PY_VERSION_HEX < 0x030B0000
+#include "eval.h"           /* or this. Folded into ceval.h in 3.11 */
+#endif
 #include "structmember.h"
 #include "frameobject.h"
 
-#include <stdio.h>          /* For reading CU cu_costs */
 #include <stdlib.h>
+#include <limits.h>
 #include <string.h>
 
-/* Py 2.x and 3.x compatibility */
-
 #ifndef Py_TYPE
 #define Py_TYPE(o)    (((PyObject*)(o))->ob_type)
 #endif
 
-#if PY_MAJOR_VERSION >= 3
+/* The values returned to indicate ok or error. */
+#define RET_OK      0
+#define RET_ERROR   -1
 
-#define MyType_HEAD_INIT    PyVarObject_HEAD_INIT(NULL, 0)
+/*
+ * Metering modes. Line mode charges the opcode a line starts on, opcode mode charges every instruction executed.
+ * Instrumented mode installs no trace function at all: the contract code was compiled with calls that add their
+ * own cost, so the tracer only keeps the count and enforces the stamp limit.
+ */
+#define MODE_LINE           0
+#define MODE_OPCODE         1
+#define MODE_INSTRUMENTED   2
 
-#else
+/* Opcode trace events need f_trace_opcodes, which was added in 3.7. */
+#if PY_VERSION_HEX >= 0x03070000
+#define HAS_OPCODE_TRACE 1
+#endif
 
-#define MyType_HEAD_INIT    PyObject_HEAD_INIT(NULL)  0,
+/*
+ * Costs are indexed by opcode. Tracers start with every opcode at the unknown cost, and are given the table for the
+ * running interpreter with set_costs (see costs.py), so a missing or stale table overcharges rather than undercharges.
+ */
+#define NUM_CU_COSTS 256
+#define UNKNOWN_CU_COST 1000
 
-#endif /* Py3k */
+/* The Tracer type. */
 
-/* The values returned to indicate ok or error. */
-#define RET_OK      0
-#define RET_ERROR   -1
+/*
+ * Whether a frame belongs to a contract is decided once per code object (and globals) and remembered in a small open
+ * addressing table keyed by pointer. Entries hold strong references so a freed object's address can't be reused for
+ * a different one while it is remembered. The table is emptied on start and reset, or when it fills up.
+ */
+#define MEMO_SIZE   512
+#define MEMO_MASK   (MEMO_SIZE - 1)
+#define MEMO_LIMIT  (MEMO_SIZE * 3 / 4)
 
-unsigned long long cu_costs[] = {2, 4, 5, 2, 4, 1000, 1000, 1000, 2, 2, 3, 2, 1000, 1000, 4, 1000, 1000, 1000, 30, 3,
-                                1000, 4, 3, 3, 3, 4, 4, 4, 5, 1000, 1000, 1000, 1000, 6, 30, 7, 12, 1000, 1610, 4, 7,
-                                1000, 6, 6, 6, 6, 6, 2, 15, 15, 2, 126, 1000, 4, 4, 4, 4, 2, 2, 8, 8, 2, 6, 6, 4, 4,
-                                1000, 2, 2, 2, 5, 8, 7, 4, 4, 38, 126, 4, 4, 4, 4, 4, 4, 3, 1000, 1000, 2, 4, 2, 3,
-                                1000, 2, 2, 2, 1000, 1000, 1000, 5, 9, 7, 12, 1000, 7, 2, 2, 2, 1000, 1000, 12, 12, 15,
-                                2, 8, 8, 5, 2, 5, 7, 9, 2, 8, 15, 30, 7, 8, 4};
+typedef struct {
+    PyObject *code;
+    PyObject *globals;
+    int is_contract;
+} MemoEntry;
 
-/* The Tracer type. */
+/*
+ * Memory metering wraps the MEM and OBJ allocator domains. Only large blocks (those pymalloc hands straight to the
+ * system allocator) are counted: smaller objects each take bytecode to create and are priced by that. Live large
+ * blocks are remembered in a table of pointers so frees are subtracted and the limit applies to what is actually
+ * held. The table lives in plain malloc'd memory so it never allocates through the hooks it serves.
+ */
+#define LARGE_BLOCK     512
+
+typedef struct {
+    void *ptr;
+    size_t size;
+} Block;
+
+typedef struct {
+    Block *slots;
+    size_t capacity;    /* A power of two, or 0 before the first large block */
+    size_t used;
+} BlockTable;
 
 typedef struct {
     PyObject_HEAD
@@ -46,19 +84,397 @@ typedef struct {
     unsigned long long cost;
     unsigned long long stamp_supplied;
     int started;
-    char *cu_cost_fname;
+    int mode;
+    unsigned long long costs[NUM_CU_COSTS];
+
+    /* Interned "__contract__" key looked up in frame globals */
+    PyObject *contract_key;
+
+    MemoEntry memo[MEMO_SIZE];
+    int memo_used;
+
+    /*
+     * Profiling attributes every charge to the contract frame it was made in. Costs are summed in a dict keyed by
+     * (contract, function, line, kind), where kind is "execution" for bytecode and whatever add_cost is given for
+     * anything else. The contract is the frame's __name__ global, or its code's file name without one.
+     */
+    int profiling;
+    PyObject *profile;
+    PyObject *name_key;
+    PyObject *execution_kind;
+
+    /* Memory metering, see below. A limit of 0 turns it off. */
+    unsigned long long memory_limit;
+    unsigned long long memory_live;
+    unsigned long long memory_peak;
+    unsigned long long memory_allocated;
+    int memory_exceeded;
+    BlockTable blocks;
 
 } Tracer;
 
+static unsigned long long
+opcode_cost(Tracer *self, int opcode)
+{
+    if (opcode >= NUM_CU_COSTS) {
+        return UNKNOWN_CU_COST;
+    }
+    return self->costs[opcode];
+}
+
+static void
+memo_clear(Tracer *self)
+{
+    int i;
+
+    if (self->memo_used == 0) {
+        return;
+    }
+
+    for (i = 0; i < MEMO_SIZE; i++) {
+        Py_CLEAR(self->memo[i].code);
+        Py_CLEAR(self->memo[i].globals);
+    }
+    self->memo_used = 0;
+}
+
+/*
+ * Memory metering
+ */
+
+#if defined(_MSC_VER)
+#define THREAD_LOCAL __declspec(thread)
+#else
+#define THREAD_LOCAL __thread
+#endif
+
+/* The tracer allocations on this thread are counted against, while it runs with a memory limit */
+static THREAD_LOCAL Tracer *memory_tracer = NULL;
+
+static PyMemAllocatorEx original_mem, original_obj;
+static int hooks_installed = 0;
+
+static size_t
+block_slot(BlockTable *table, void *ptr)
+{
+    size_t i = ((size_t)ptr >> 4) & (table->capacity - 1);
+
+    while (table->slots[i].ptr != NULL && table->slots[i].ptr != ptr) {
+        i = (i + 1) & (table->capacity - 1);
+    }
+    return i;
+}
+
+static int
+block_grow(BlockTable *table)
+{
+    BlockTable bigger;
+    size_t i;
+
+    bigger.capacity = table->capacity ? table->capacity * 2 : 64;
+    bigger.used = table->used;
+    bigger.slots = calloc(bigger.capacity, sizeof(Block));
+    if (bigger.slots == NULL) {
+        return RET_ERROR;
+    }
+
+    for (i = 0; i < table->capacity; i++) {
+        if (table->slots[i].ptr != NULL) {
+            bigger.slots[block_slot(&bigger, table->slots[i].ptr)] = table->slots[i];
+        }
+    }
+
+    free(table->slots);
+    *table = bigger;
+    return RET_OK;
+}
+
+static int
+block_add(BlockTable *table, void *ptr, size_t size)
+{
+    size_t i;
+
+    if (table->used * 2 >= table->capacity && block_grow(table) < 0) {
+        return RET_ERROR;
+    }
+
+    i = block_slot(table, ptr);
+    if (table->slots[i].ptr == NULL) {
+        table->used++;
+    }
+    table->slots[i].ptr = ptr;
+    table->slots[i].size = size;
+    return RET_OK;
+}
+
+/* Forgets a block and returns its size, or 0 if it was never counted */
+static size_t
+block_remove(BlockTable *table, void *ptr)
+{
+    size_t i, j, home, size;
+
+    if (table->used == 0) {
+        return 0;
+    }
+
+    i = block_slot(table, ptr);
+    if (table->slots[i].ptr == NULL) {
+        return 0;
+    }
+    size = table->slots[i].size;
+    table->used--;
+
+    /* Shift the rest of the run back so lookups never stop early */
+    j = i;
+    for (;;) {
+        table->slots[i].ptr = NULL;
+        for (;;) {
+            j = (j + 1) & (table->capacity - 1);
+            if (table->slots[j].ptr == NULL) {
+                return size;
+            }
+            home = ((size_t)table->slots[j].ptr >> 4) & (table->capacity - 1);
+            if ((j > i && (home <= i || home > j)) || (j < i && (home <= i && home > j))) {
+                break;
+            }
+        }
+        table->slots[i] = table->slots[j];
+        i = j;
+    }
+}
+
+static void
+block_clear(BlockTable *table)
+{
+    if (table->used) {
+        memset(table->slots, 0, table->capacity * sizeof(Block));
+        table->used = 0;
+    }
+}
+
+/*
+ * Whether the tracer lets the thread take `size` more bytes. Allocations made by the driver, caches and the interpreter
+ * on the contract's behalf are counted too, and those depend on what the process did before, so where a transaction
+ * hits the limit can differ between nodes. That is why memory is only capped and never charged for in stamps.
+ */
+static int
+memory_admit(Tracer *self, size_t size)
+{
+    if (self->memory_live + size > self->memory_limit) {
+        self->memory_exceeded = 1;
+        return 0;
+    }
+
+    self->memory_allocated += size;
+    return 1;
+}
+
+static void
+memory_track(Tracer *self, void *ptr, size_t size)
+{
+    if (block_add(&self->blocks, ptr, size) < 0) {
+        return;     /* Out of memory for the table itself. The block just goes uncounted when freed. */
+    }
+
+    self->memory_live += size;
+    if (self->memory_live > self->memory_peak) {
+        self->memory_peak = self->memory_live;
+    }
+}
+
+static void
+memory_untrack(Tracer *self, void *ptr)
+{
+    self->memory_live -= block_remove(&self->blocks, ptr);
+}
+
+static void *
+hook_malloc(void *ctx, size_t size)
+{
+    PyMemAllocatorEx *alloc = (PyMemAllocatorEx *)ctx;
+    Tracer *self = memory_tracer;
+    void *ptr;
+
+    if (self == NULL || size < LARGE_BLOCK) {
+        return alloc->malloc(alloc->ctx, size);
+    }
+
+    if (!memory_admit(self, size)) {
+        return NULL;
+    }
+
+    ptr = alloc->malloc(alloc->ctx, size);
+    if (ptr != NULL) {
+        memory_track(self, ptr, size);
+    }
+    return ptr;
+}
+
+static void *
+hook_calloc(void *ctx, size_t nelem, size_t elsize)
+{
+    PyMemAllocatorEx *alloc = (PyMemAllocatorEx *)ctx;
+    Tracer *self = memory_tracer;
+    size_t size;
+    void *ptr;
+
+    if (self == NULL || (elsize != 0 && nelem > (size_t)PY_SSIZE_T_MAX / elsize)) {
+        return alloc->calloc(alloc->ctx, nelem, elsize);
+    }
+
+    size = nelem * elsize;
+    if (size < LARGE_BLOCK) {
+        return alloc->calloc(alloc->ctx, nelem, elsize);
+    }
+
+    if (!memory_admit(self, size)) {
+        return NULL;
+    }
+
+    ptr = alloc->calloc(alloc->ctx, nelem, elsize);
+    if (ptr != NULL) {
+        memory_track(self, ptr, size);
+    }
+    return ptr;
+}
+
+static void *
+hook_realloc(void *ctx, void *ptr, size_t new_size)
+{
+    PyMemAllocatorEx *alloc = (PyMemAllocatorEx *)ctx;
+    Tracer *self = memory_tracer;
+    size_t old_size = 0;
+    void *new_ptr;
+
+    if (self == NULL) {
+        return alloc->realloc(alloc->ctx, ptr, new_size);
+    }
+
+    if (ptr != NULL) {
+        old_size = block_remove(&self->blocks, ptr);
+        self->memory_live -= old_size;
+    }
+
+    /* Only growth is checked against the limit, since the old block is given back */
+    if (new_size >= LARGE_BLOCK && new_size > old_size && !memory_admit(self, new_size - old_size)) {
+        if (old_size) {
+            memory_track(self, ptr, old_size);
+        }
+        return NULL;
+    }
+
+    new_ptr = alloc->realloc(alloc->ctx, ptr, new_size);
+
+    if (new_ptr == NULL) {
+        if (old_size) {
+            memory_track(self, ptr, old_size);
+        }
+    }
+    else if (new_size >= LARGE_BLOCK) {
+        memory_track(self, new_ptr, new_size);
+    }
+    return new_ptr;
+}
+
+static void
+hook_free(void *ctx, void *ptr)
+{
+    PyMemAllocatorEx *alloc = (PyMemAllocatorEx *)ctx;
+    Tracer *self = memory_tracer;
+
+    if (self != NULL && ptr != NULL) {
+        memory_untrack(self, ptr);
+    }
+    alloc->free(alloc->ctx, ptr);
+}
+
+/*
+ * The hooks are installed once, when the main interpreter imports this module, so they are in place before any
+ * subinterpreter (which may run under a GIL of its own) could race to install them. With no tracer active on a
+ * thread they cost a thread local read per allocation. They wrap whatever allocators were set before, so blocks
+ * allocated earlier are freed by the allocator that made them.
+ */
+static void
+install_hooks(void)
+{
+    PyMemAllocatorEx hook;
+
+    if (hooks_installed) {
+        return;
+    }
+
+    PyMem_GetAllocator(PYMEM_DOMAIN_MEM, &original_mem);
+    PyMem_GetAllocator(PYMEM_DOMAIN_OBJ, &original_obj);
+
+    hook.malloc = hook_malloc;
+    hook.calloc = hook_calloc;
+    hook.realloc = hook_realloc;
+    hook.free = hook_free;
+
+    hook.ctx = &original_mem;
+    PyMem_SetAllocator(PYMEM_DOMAIN_MEM, &hook);
+
+    hook.ctx = &original_obj;
+    PyMem_SetAllocator(PYMEM_DOMAIN_OBJ, &hook);
+
+    hooks_installed = 1;
+}
+
+static void
+memory_activate(Tracer *self)
+{
+    block_clear(&self->blocks);
+    self->memory_live = 0;
+    self->memory_peak = 0;
+    self->memory_allocated = 0;
+    self->memory_exceeded = 0;
+
+    if (self->memory_limit) {
+        memory_tracer = self;
+    }
+}
+
+static void
+memory_deactivate(Tracer *self)
+{
+    if (memory_tracer == self) {
+        memory_tracer = NULL;
+    }
+}
+
 static int
 Tracer_init(Tracer *self, PyObject *args, PyObject *kwds)
 {
-    //char *fname = getenv("CU_COST_FNAME");
+    int i;
 
-    //read_cu_costs(fname, self->cu_costs); // Read cu cu_costs from ones interpreted in Python
+    for (i = 0; i < NUM_CU_COSTS; i++) {
+        self->costs[i] = UNKNOWN_CU_COST;
+    }
 
     self->started = 0;
     self->cost = 0;
+    self->mode = MODE_LINE;
+
+    if (self->contract_key == NULL) {
+        self->contract_key = PyUnicode_InternFromString("__contract__");
+        if (self->contract_key == NULL) {
+            return RET_ERROR;
+        }
+    }
+
+    if (self->name_key == NULL) {
+        self->name_key = PyUnicode_InternFromString("__name__");
+        if (self->name_key == NULL) {
+            return RET_ERROR;
+        }
+    }
+
+    if (self->execution_kind == NULL) {
+        self->execution_kind = PyUnicode_InternFromString("execution");
+        if (self->execution_kind == NULL) {
+            return RET_ERROR;
+        }
+    }
 
     return RET_OK;
 }
@@ -66,72 +482,302 @@ Tracer_init(Tracer *self, PyObject *args, PyObject *kwds)
 static void
 Tracer_dealloc(Tracer *self)
 {
-    if (self->started) {
+    PyTypeObject *tp = Py_TYPE(self);
+
+    if (self->started && self->mode != MODE_INSTRUMENTED) {
         PyEval_SetTrace(NULL, NULL);
     }
 
-    Py_TYPE(self)->tp_free((PyObject*)self);
+    memory_deactivate(self);
+    free(self->blocks.slots);
+
+    memo_clear(self);
+    Py_CLEAR(self->contract_key);
+    Py_CLEAR(self->profile);
+    Py_CLEAR(self->name_key);
+    Py_CLEAR(self->execution_kind);
+
+    tp->tp_free((PyObject*)self);
+    Py_DECREF(tp);  /* Instances of heap types hold a reference to their type */
 }
 
-//static void reprint(PyObject *obj) {
-//    PyObject * repr = PyObject_Repr(obj);
-//    PyObject * str = PyUnicode_AsEncodedString(repr, "utf-8", "~E~");
-//    const char *bytes = PyBytes_AS_STRING(str);
-//
-//    printf("REPR: %s\n", bytes);
-//
-//    Py_XDECREF(repr);
-//    Py_XDECREF(str);
-//}
+/*
+ * Frame accessors. Frames became opaque in 3.11, and f_lasti counts code units rather than bytes from 3.10.
+ */
 
+static PyObject *
+frame_globals(PyFrameObject *frame)
+{
+#if PY_VERSION_HEX >= 0x030B0000
+    PyObject *globals = PyFrame_GetGlobals(frame);
+    Py_DECREF(globals);     /* Kept alive by the executing frame */
+    return globals;
+#else
+    return frame->f_globals;
+#endif
+}
+
+static PyObject *
+frame_code(PyFrameObject *frame)
+{
+#if PY_VERSION_HEX >= 0x03090000
+    PyCodeObject *code = PyFrame_GetCode(frame);
+    Py_DECREF(code);        /* Kept alive by the executing frame */
+    return (PyObject *)code;
+#else
+    return (PyObject *)frame->f_code;
+#endif
+}
+
+/* Returns a new reference to the calling frame, or NULL at the bottom of the stack */
+static PyFrameObject *
+frame_back(PyFrameObject *frame)
+{
+#if PY_VERSION_HEX >= 0x03090000
+    return PyFrame_GetBack(frame);
+#else
+    Py_XINCREF(frame->f_back);
+    return frame->f_back;
+#endif
+}
+
+static int
+frame_opcode(PyFrameObject *frame)
+{
+    const unsigned char *str;
+    int opcode;
+#if PY_VERSION_HEX >= 0x030B0000
+    PyCodeObject *code = PyFrame_GetCode(frame);
+    PyObject *co_code = PyCode_GetCode(code);
+
+    str = (const unsigned char *)PyBytes_AS_STRING(co_code);
+    opcode = str[PyFrame_GetLasti(frame)];
+
+    Py_DECREF(co_code);
+    Py_DECREF(code);
+#elif PY_VERSION_HEX >= 0x030A0000
+    str = (const unsigned char *)PyBytes_AS_STRING(frame->f_code->co_code);
+    opcode = str[frame->f_lasti * sizeof(_Py_CODEUNIT)];
+#else
+    str = (const unsigned char *)PyBytes_AS_STRING(frame->f_code->co_code);
+    opcode = str[frame->f_lasti];
+#endif
+    return opcode;
+}
+
+#ifdef HAS_OPCODE_TRACE
+static int
+frame_trace_opcodes(PyFrameObject *frame, PyObject *tracer)
+{
+#if PY_VERSION_HEX >= 0x030D0000
+    // 3.13 only instruments the code object for opcode events once the frame has a trace function as well. Setting
+    // one and clearing it again does that without leaving a Python level trace function on the frame.
+    if (PyObject_SetAttrString((PyObject *)frame, "f_trace_opcodes", Py_True) < 0 ||
+        PyObject_SetAttrString((PyObject *)frame, "f_trace", tracer) < 0) {
+        return RET_ERROR;
+    }
+    return PyObject_SetAttrString((PyObject *)frame, "f_trace", Py_None);
+#elif PY_VERSION_HEX >= 0x030B0000
+    return PyObject_SetAttrString((PyObject *)frame, "f_trace_opcodes", Py_True);
+#else
+    frame->f_trace_opcodes = 1;
+    return RET_OK;
+#endif
+}
+#endif
+
+static int
+is_contract_frame(Tracer *self, PyFrameObject *frame)
+{
+    PyObject *code = frame_code(frame);
+    PyObject *globals = frame_globals(frame);
+    size_t i = ((size_t)code >> 4) & MEMO_MASK;
+    MemoEntry *entry;
+    int is_contract;
+
+    while (self->memo[i].code != NULL) {
+        entry = &self->memo[i];
+        if (entry->code == code && entry->globals == globals) {
+            return entry->is_contract;
+        }
+        i = (i + 1) & MEMO_MASK;
+    }
+
+    // IF, Frame object globals contains __contract__, the frame is metered
+    is_contract = PyDict_Contains(globals, self->contract_key);
+    if (is_contract < 0) {
+        return RET_ERROR;
+    }
+
+    if (self->memo_used >= MEMO_LIMIT) {
+        memo_clear(self);
+        i = ((size_t)code >> 4) & MEMO_MASK;
+    }
+
+    entry = &self->memo[i];
+    Py_INCREF(code);
+    Py_INCREF(globals);
+    entry->code = code;
+    entry->globals = globals;
+    entry->is_contract = is_contract;
+    self->memo_used++;
+
+    return is_contract;
+}
+
+/*
+ * Profiling
+ */
+
+static int
+profile_cost(Tracer *self, PyFrameObject *frame, PyObject *kind, unsigned long long cost)
+{
+    PyObject *contract = Py_None, *function = Py_None, *key, *total;
+    unsigned long long previous = 0;
+    int line = 0, result;
+
+    if (frame != NULL) {
+        PyCodeObject *code = (PyCodeObject *)frame_code(frame);
+
+        contract = PyDict_GetItem(frame_globals(frame), self->name_key);
+        if (contract == NULL) {
+            contract = code->co_filename;
+        }
+        function = code->co_name;
+        line = PyFrame_GetLineNumber(frame);
+    }
+
+    key = Py_BuildValue("(OOiO)", contract, function, line, kind);
+    if (key == NULL) {
+        return RET_ERROR;
+    }
+
+    total = PyDict_GetItem(self->profile, key);
+    if (total != NULL) {
+        previous = PyLong_AsUnsignedLongLong(total);
+    }
+
+    total = PyLong_FromUnsignedLongLong(previous + cost);
+    if (total == NULL) {
+        Py_DECREF(key);
+        return RET_ERROR;
+    }
+
+    result = PyDict_SetItem(self->profile, key, total);
+    Py_DECREF(key);
+    Py_DECREF(total);
+    return result;
+}
+
+/* Returns a new reference to the innermost contract frame being executed, or NULL (without an error) if none is */
+static PyFrameObject *
+current_contract_frame(Tracer *self)
+{
+    PyFrameObject *frame = PyEval_GetFrame(), *back;
+    int t;
+
+    Py_XINCREF(frame);
+    while (frame != NULL) {
+        t = is_contract_frame(self, frame);
+        if (t != 0) {
+            if (t < 0) {
+                Py_CLEAR(frame);
+            }
+            return frame;
+        }
+        back = frame_back(frame);
+        Py_DECREF(frame);
+        frame = back;
+    }
+    return NULL;
+}
+
+static int
+charge(Tracer *self, PyFrameObject *frame, int opcode)
+{
+    unsigned long long cost;
+
+    if (self->cost > self->stamp_supplied) {
+        PyErr_SetString(PyExc_AssertionError, "The cost has exceeded the stamp supplied!\n");
+        PyEval_SetTrace(NULL, NULL);
+        self->started = 0;
+        memory_deactivate(self);
+        return RET_ERROR;
+    }
+    cost = opcode_cost(self, opcode);
+    self->cost += cost;
+
+    if (self->profiling) {
+        return profile_cost(self, frame, self->execution_kind, cost);
+    }
+    return RET_OK;
+}
 
 /*
  * The Trace Function
  */
 
- static int
- Tracer_trace(Tracer *self, PyFrameObject *frame, int what, PyObject *arg)
- {
-    unsigned long long estimate = 0;
-    unsigned long long factor = 1000;
-    const char *str;
-     // IF, Frame object globals contains __contract__ and it is true, continue
-     PyObject *kv = PyUnicode_FromString("__contract__");
-     int t = PyDict_Contains(frame->f_globals, kv);
-     Py_DECREF(kv);
-     if (t != 1) {
-        return RET_OK;
-     }
-     int opcode;
-     switch (what) {
-         case PyTrace_LINE:      /* 2 */
-             // printf("LINE\n");
-             str = PyBytes_AS_STRING(frame->f_code->co_code);
-             opcode = str[frame->f_lasti];
-             if (opcode < 0) opcode = -opcode;
-             estimate = (self->cost + cu_costs[opcode]) / factor;
-             estimate = estimate + 1;
-             //estimate = estimate * factor;
-             if (self->cost > self->stamp_supplied) {
-                 PyErr_SetString(PyExc_AssertionError, "The cost has exceeded the stamp supplied!\n");
-                 PyEval_SetTrace(NULL, NULL);
-                 self->started = 0;
-                 return RET_ERROR;
-             }
-             self->cost += cu_costs[opcode];
-             break;
-         default:
-             break;
-     }
-     return RET_OK;
- }
+static int
+Tracer_trace(Tracer *self, PyFrameObject *frame, int what, PyObject *arg)
+{
+    int t = is_contract_frame(self, frame);
+    if (t != 1) {
+        return t;
+    }
+    switch (what) {
+        case PyTrace_LINE:      /* 2 */
+            if (self->mode == MODE_LINE) {
+                return charge(self, frame, frame_opcode(frame));
+            }
+            break;
+#ifdef HAS_OPCODE_TRACE
+        case PyTrace_CALL:      /* 0 */
+            // Ask for an event per instruction for every contract frame entered
+            if (self->mode == MODE_OPCODE) {
+                return frame_trace_opcodes(frame, (PyObject *)self);
+            }
+            break;
+        case PyTrace_OPCODE:    /* 7 */
+            if (self->mode == MODE_OPCODE) {
+                return charge(self, frame, frame_opcode(frame));
+            }
+            break;
+#endif
+        default:
+            break;
+    }
+    return RET_OK;
+}
 
 static PyObject *
 Tracer_start(Tracer *self, PyObject *args)
 {
-    PyEval_SetTrace((Py_tracefunc)Tracer_trace, (PyObject*)self);
+#if PY_VERSION_HEX >= 0x030C0000
+    if (self->mode == MODE_OPCODE) {
+        // 3.12+ only emits opcode events if a frame has asked for them before tracing was switched on. Asking
+        // once on the calling frame (and then turning it back off there) arms that for the contract frames.
+        PyObject *frame = (PyObject *)PyEval_GetFrame();
+        if (frame != NULL) {
+            if (PyObject_SetAttrString(frame, "f_trace_opcodes", Py_True) < 0 ||
+                PyObject_SetAttrString(frame, "f_trace_opcodes", Py_False) < 0) {
+                return NULL;
+            }
+        }
+    }
+#endif
+    memo_clear(self);
+    if (self->profiling) {
+        Py_XSETREF(self->profile, PyDict_New());
+        if (self->profile == NULL) {
+            return NULL;
+        }
+    }
+    if (self->mode != MODE_INSTRUMENTED) {
+        PyEval_SetTrace((Py_tracefunc)Tracer_trace, (PyObject*)self);
+    }
     self->cost = 0;
     self->started = 1;
+    memory_activate(self);
     return Py_BuildValue("");
 }
 
@@ -139,26 +785,63 @@ static PyObject *
 Tracer_stop(Tracer *self, PyObject *args)
 {
     if (self->started) {
-        PyEval_SetTrace(NULL, NULL);
+        if (self->mode != MODE_INSTRUMENTED) {
+            PyEval_SetTrace(NULL, NULL);
+        }
         self->started = 0;
+        memory_deactivate(self);
     }
 
     return Py_BuildValue("");
 }
 
+static PyObject *
+Tracer_set_mode(Tracer *self, PyObject *args)
+{
+    int mode;
+    if (!PyArg_ParseTuple(args, "i", &mode)) {
+        return NULL;
+    }
+
+    if (mode != MODE_LINE && mode != MODE_OPCODE && mode != MODE_INSTRUMENTED) {
+        PyErr_SetString(PyExc_ValueError, "Unknown metering mode.");
+        return NULL;
+    }
+
+#ifndef HAS_OPCODE_TRACE
+    if (mode == MODE_OPCODE) {
+        PyErr_SetString(PyExc_NotImplementedError, "Opcode metering requires Python 3.7 or newer.");
+        return NULL;
+    }
+#endif
+
+    if (self->started) {
+        PyErr_SetString(PyExc_RuntimeError, "The metering mode cannot change while the tracer is running.");
+        return NULL;
+    }
+
+    self->mode = mode;
+    return Py_BuildValue("");
+}
+
 static PyObject *
 Tracer_set_stamp(Tracer *self, PyObject *args, PyObject *kwds)
 {
-    PyArg_ParseTuple(args, "L", &self->stamp_supplied);
+    if (!PyArg_ParseTuple(args, "L", &self->stamp_supplied)) {
+        return NULL;
+    }
     return Py_BuildValue("");
 }
 
 static PyObject *
 Tracer_reset(Tracer *self)
 {
+    memo_clear(self);
+    Py_CLEAR(self->profile);
     self->cost = 0;
     self->stamp_supplied = 0;
     self->started = 0;
+    memory_deactivate(self);
     return Py_BuildValue("");
 }
 
@@ -167,14 +850,33 @@ Tracer_add_cost(Tracer *self, PyObject *args, PyObject *kwds)
 {
     // This allows you to arbitrarily add to the cost variable from Python
     // Implemented for adding costs to database read / write operations
+    // The optional kind says what the cost is for when profiling, and defaults to execution.
     unsigned long long new_cost;
-    PyArg_ParseTuple(args, "L", &new_cost);
+    PyObject *kind = NULL;
+    if (!PyArg_ParseTuple(args, "L|O", &new_cost, &kind)) {
+        return NULL;
+    }
     self->cost += new_cost;
 
+    if (self->profiling && self->profile != NULL) {
+        PyFrameObject *frame = current_contract_frame(self);
+        if (frame == NULL && PyErr_Occurred()) {
+            return NULL;
+        }
+        if (profile_cost(self, frame, kind != NULL ? kind : self->execution_kind, new_cost) < 0) {
+            Py_XDECREF(frame);
+            return NULL;
+        }
+        Py_XDECREF(frame);
+    }
+
     if (self->cost > self->stamp_supplied) {
          PyErr_SetString(PyExc_AssertionError, "The cost has exceeded the stamp supplied!\n");
-         PyEval_SetTrace(NULL, NULL);
+         if (self->mode != MODE_INSTRUMENTED) {
+             PyEval_SetTrace(NULL, NULL);
+         }
          self->started = 0;
+         memory_deactivate(self);
          return NULL;
      }
 
@@ -187,6 +889,128 @@ Tracer_get_stamp_used(Tracer *self, PyObject *args, PyObject *kwds)
     return Py_BuildValue("L", self->cost);
 }
 
+static PyObject *
+Tracer_get_costs(Tracer *self)
+{
+    // The cost table indexed by opcode, for pricing code ahead of time
+    PyObject *costs = PyList_New(NUM_CU_COSTS);
+    size_t i;
+
+    if (costs == NULL) {
+        return NULL;
+    }
+
+    for (i = 0; i < NUM_CU_COSTS; i++) {
+        PyObject *cost = PyLong_FromUnsignedLongLong(self->costs[i]);
+        if (cost == NULL) {
+            Py_DECREF(costs);
+            return NULL;
+        }
+        PyList_SET_ITEM(costs, i, cost);
+    }
+
+    return costs;
+}
+
+static PyObject *
+Tracer_set_profile(Tracer *self, PyObject *args)
+{
+    int profiling;
+    if (!PyArg_ParseTuple(args, "p", &profiling)) {
+        return NULL;
+    }
+
+    if (self->started) {
+        PyErr_SetString(PyExc_RuntimeError, "Profiling cannot be switched while the tracer is running.");
+        return NULL;
+    }
+
+    self->profiling = profiling;
+    return Py_BuildValue("");
+}
+
+static PyObject *
+Tracer_get_profile(Tracer *self)
+{
+    if (self->profile == NULL) {
+        return PyDict_New();
+    }
+    return PyDict_Copy(self->profile);
+}
+
+static PyObject *
+Tracer_set_memory_limit(Tracer *self, PyObject *args)
+{
+    unsigned long long limit;
+    if (!PyArg_ParseTuple(args, "K", &limit)) {
+        return NULL;
+    }
+
+    if (self->started) {
+        PyErr_SetString(PyExc_RuntimeError, "The memory limit cannot change while the tracer is running.");
+        return NULL;
+    }
+
+    self->memory_limit = limit;
+    return Py_BuildValue("");
+}
+
+static PyObject *
+Tracer_get_memory(Tracer *self)
+{
+    return Py_BuildValue("{s:K,s:K,s:K,s:O}",
+                         "allocated", self->memory_allocated,
+                         "peak", self->memory_peak,
+                         "live", self->memory_live,
+                         "exceeded", self->memory_exceeded ? Py_True : Py_False);
+}
+
+static PyObject *
+Tracer_set_costs(Tracer *self, PyObject *args)
+{
+    // Replaces the cost table. Opcodes past the end of the given list cost the unknown cost.
+    unsigned long long costs[NUM_CU_COSTS];
+    PyObject *list, *seq;
+    Py_ssize_t i, n;
+
+    if (!PyArg_ParseTuple(args, "O", &list)) {
+        return NULL;
+    }
+
+    if (self->started) {
+        PyErr_SetString(PyExc_RuntimeError, "The costs cannot change while the tracer is running.");
+        return NULL;
+    }
+
+    seq = PySequence_Fast(list, "Costs must be a sequence of integers indexed by opcode.");
+    if (seq == NULL) {
+        return NULL;
+    }
+
+    n = PySequence_Fast_GET_SIZE(seq);
+    if (n > NUM_CU_COSTS) {
+        Py_DECREF(seq);
+        PyErr_Format(PyExc_ValueError, "At most %d costs can be set.", NUM_CU_COSTS);
+        return NULL;
+    }
+
+    for (i = 0; i < NUM_CU_COSTS; i++) {
+        costs[i] = UNKNOWN_CU_COST;
+    }
+
+    for (i = 0; i < n; i++) {
+        costs[i] = PyLong_AsUnsignedLongLong(PySequence_Fast_GET_ITEM(seq, i));
+        if (costs[i] == (unsigned long long)-1 && PyErr_Occurred()) {
+            Py_DECREF(seq);
+            return NULL;
+        }
+    }
+
+    Py_DECREF(seq);
+    memcpy(self->costs, costs, sizeof(costs));
+    return Py_BuildValue("");
+}
+
 static PyObject *
 Tracer_is_started(Tracer *self)
 {
@@ -195,8 +1019,16 @@ Tracer_is_started(Tracer *self)
 
 static PyMemberDef
 Tracer_members[] = {
-    { "started",       T_OBJECT, offsetof(Tracer, started), 0,
+    { "started",       T_INT, offsetof(Tracer, started), READONLY,
             PyDoc_STR("Whether or not the tracer has been enabled") },
+
+    { "profiling",     T_INT, offsetof(Tracer, profiling), READONLY,
+            PyDoc_STR("Whether charges are attributed to the contract lines that made them") },
+
+    { "mode",          T_INT, offsetof(Tracer, mode), READONLY,
+            PyDoc_STR("The metering mode. 0 charges per line, 1 per opcode, 2 only through add_cost.") },
+
+    { NULL }
 };
 
 static PyMethodDef
@@ -213,126 +1045,127 @@ Tracer_methods[] = {
     { "add_cost",       (PyCFunction) Tracer_add_cost,          METH_VARARGS,
             PyDoc_STR("Add to the cost. Throws AssertionError if cost exceeds stamps supplied.") },
 
+    { "set_mode",   (PyCFunction) Tracer_set_mode,      METH_VARARGS,
+            PyDoc_STR("Set the metering mode before starting the tracer. 0 is per line, 1 per opcode, 2 instrumented.") },
+
     { "set_stamp",  (PyCFunction) Tracer_set_stamp,     METH_VARARGS,
             PyDoc_STR("Set the stamp before starting the tracer") },
 
     { "get_stamp_used",  (PyCFunction) Tracer_get_stamp_used,     METH_VARARGS,
             PyDoc_STR("Get the stamp usage after it's been completed") },
 
+    { "get_costs",  (PyCFunction) Tracer_get_costs,     METH_NOARGS,
+            PyDoc_STR("Returns the cost of each opcode as a list indexed by opcode.") },
+
+    { "set_profile",  (PyCFunction) Tracer_set_profile,     METH_VARARGS,
+            PyDoc_STR("Turn profiling on or off before starting the tracer.") },
+
+    { "get_profile",  (PyCFunction) Tracer_get_profile,     METH_NOARGS,
+            PyDoc_STR("Returns the costs of the last run as {(contract, function, line, kind): cost}.") },
+
+    { "set_memory_limit",  (PyCFunction) Tracer_set_memory_limit,     METH_VARARGS,
+            PyDoc_STR("Set the most bytes a run may hold in large blocks, or 0 for no limit.") },
+
+    { "get_memory",  (PyCFunction) Tracer_get_memory,     METH_NOARGS,
+            PyDoc_STR("Returns the large block bytes allocated, the peak and still live, and whether an allocation was refused.") },
+
+    { "set_costs",  (PyCFunction) Tracer_set_costs,     METH_VARARGS,
+            PyDoc_STR("Set the cost of each opcode from a list indexed by opcode.") },
+
     { "is_started",  (PyCFunction) Tracer_is_started,     METH_VARARGS,
             PyDoc_STR("Returns 1 if tracer is started, 0 if not.") },
 
     { NULL }
 };
 
-static PyTypeObject
-TracerType = {
-    MyType_HEAD_INIT
-    "contracting.execution.metering.tracer",         /*tp_name*/
-    sizeof(Tracer),            /*tp_basicsize*/
-    0,                         /*tp_itemsize*/
-    (destructor)Tracer_dealloc, /*tp_dealloc*/
-    0,                         /*tp_print*/
-    0,                         /*tp_getattr*/
-    0,                         /*tp_setattr*/
-    0,                         /*tp_compare*/
-    0,                         /*tp_repr*/
-    0,                         /*tp_as_number*/
-    0,                         /*tp_as_sequence*/
-    0,                         /*tp_as_mapping*/
-    0,                         /*tp_hash */
-    0,                         /*tp_call*/
-    0,                         /*tp_str*/
-    0,                         /*tp_getattro*/
-    0,                         /*tp_setattro*/
-    0,                         /*tp_as_buffer*/
-    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, /*tp_flags*/
-    "Tracer objects",          /* tp_doc */
-    0,                         /* tp_traverse */
-    0,                         /* tp_clear */
-    0,                         /* tp_richcompare */
-    0,                         /* tp_weaklistoffset */
-    0,                         /* tp_iter */
-    0,                         /* tp_iternext */
-    Tracer_methods,            /* tp_methods */
-    Tracer_members,            /* tp_members */
-    0,                         /* tp_getset */
-    0,                         /* tp_base */
-    0,                         /* tp_dict */
-    0,                         /* tp_descr_get */
-    0,                         /* tp_descr_set */
-    0,                         /* tp_dictoffset */
-    (initproc)Tracer_init,     /* tp_init */
-    0,                         /* tp_alloc */
-    0,                         /* tp_new */
+static PyType_Slot
+Tracer_slots[] = {
+    { Py_tp_dealloc,    Tracer_dealloc },
+    { Py_tp_init,       Tracer_init },
+    { Py_tp_new,        PyType_GenericNew },
+    { Py_tp_methods,    Tracer_methods },
+    { Py_tp_members,    Tracer_members },
+    { Py_tp_doc,        "Tracer objects" },
+    { 0, NULL }
+};
+
+/* A heap type rather than a static one, so that each (sub)interpreter importing the module gets its own. */
+static PyType_Spec
+Tracer_spec = {
+    "contracting.execution.metering.tracer.Tracer",
+    sizeof(Tracer),
+    0,
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,
+    Tracer_slots
 };
 
 /* Module definition */
 
 #define MODULE_DOC PyDoc_STR("Fast tracer for Smart Contract metering.")
 
-#if PY_MAJOR_VERSION >= 3
+static int
+tracer_exec(PyObject *mod)
+{
+    PyObject *tracer_type;
+
+    if (PyModule_AddIntConstant(mod, "MODE_LINE", MODE_LINE) < 0 ||
+        PyModule_AddIntConstant(mod, "MODE_OPCODE", MODE_OPCODE) < 0 ||
+        PyModule_AddIntConstant(mod, "MODE_INSTRUMENTED", MODE_INSTRUMENTED) < 0) {
+        return RET_ERROR;
+    }
+
+    tracer_type = PyType_FromSpec(&Tracer_spec);
+    if (tracer_type == NULL) {
+        return RET_ERROR;
+    }
+
+    if (PyModule_AddObject(mod, "Tracer", tracer_type) < 0) {
+        Py_DECREF(tracer_type);
+        return RET_ERROR;
+    }
+
+#if PY_VERSION_HEX >= 0x03090000
+    if (PyInterpreterState_Get() == PyInterpreterState_Main()) {
+        install_hooks();
+    }
+#else
+    install_hooks();
+#endif
+
+    return RET_OK;
+}
+
+static PyModuleDef_Slot
+tracer_slots[] = {
+    { Py_mod_exec, tracer_exec },
+#ifdef Py_mod_multiple_interpreters
+    /*
+     * Supported in interpreters with their own GIL (3.12+). The only process-wide state is the allocator hooks: they,
+     * original_mem/original_obj and hooks_installed are only written by the main interpreter's import, before any
+     * subinterpreter can run, and read-only after. memory_tracer is per thread, and a thread runs one interpreter at a
+     * time. Everything else lives on Tracer objects.
+     */
+    { Py_mod_multiple_interpreters, Py_MOD_PER_INTERPRETER_GIL_SUPPORTED },
+#endif
+    { 0, NULL }
+};
 
 static PyModuleDef
 moduledef = {
     PyModuleDef_HEAD_INIT,
     "contracting.execution.metering.tracer",
     MODULE_DOC,
-    -1,
+    0,
     NULL,       /* methods */
-    NULL,
+    tracer_slots,
     NULL,       /* traverse */
     NULL,       /* clear */
     NULL
 };
 
 
-PyObject *
+PyMODINIT_FUNC
 PyInit_tracer(void)
 {
-    Py_Initialize();
-    PyObject * mod = PyModule_Create(&moduledef);
-
-    if (mod == NULL) {
-        Py_DECREF(mod);
-        return NULL;
-    }
-
-    TracerType.tp_new = PyType_GenericNew;
-
-    if (PyType_Ready(&TracerType) < 0) {
-        Py_DECREF(mod);
-        Py_DECREF(&TracerType);
-        printf("Not ready");
-        return NULL;
-    }
-
-    PyModule_AddObject(mod, "Tracer", (PyObject *)&TracerType);
-    return mod;
-}
-
-#else
-
-void
-inittracer(void)
-{
-    PyObject * mod;
-    mod = Py_InitModule3("contracting.execution.metering.tracer", NULL, MODULE_DOC);
-
-    if (mod == NULL) {
-        Py_DECREF(mod);
-        return;
-    }
-
-    TracerType.tp_new = PyType_GenericNew;
-    if (PyType_Ready(&TracerType) < 0) {
-        Py_DECREF(mod);
-        Py_DECREF(&TracerType);
-        return;
-    }
-
-
-    PyModule_AddObject(mod, "Tracer", (PyObject *)&TracerType);
+    return PyModuleDef_Init(&moduledef);
 }
-
-#endif /* Py3k */
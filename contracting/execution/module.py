@@ -2,14 +2,16 @@ import sys
 
 import importlib.util
 from importlib.abc import Loader, MetaPathFinder, PathEntryFinder
-from importlib import invalidate_caches, __import__
+from importlib import invalidate_caches
 from importlib.machinery import ModuleSpec
 from contracting.db.driver import ContractDriver
 from contracting.stdlib import env
 from contracting.execution.runtime import rt
+from contracting.compilation.instrumenter import compile_instrumented, METER_NAME
 from types import ModuleType
 import marshal
 import builtins
+import threading
 
 # This function overrides the __import__ function, which is the builtin function that is called whenever Python runs
 # an 'import' statement. If the globals dictionary contains {'__contract__': True}, then this function will make sure
@@ -20,28 +22,68 @@ import builtins
 # Note: anything installed with pip or in site-packages will also not work, so contract package names *must* be unique.
 #
 
+_builtin_import = builtins.__import__
+
+
 def is_valid_import(name):
     spec = importlib.util.find_spec(name)
     if not isinstance(spec.loader, DatabaseLoader):
         raise ImportError("module {} cannot be imported in a smart contract.".format(name))
 
 
+def import_contract(name):
+    # Contract modules are kept on the active runtime rather than in sys.modules so that executors running in other
+    # threads never see each other's modules, drivers or environment.
+    module = rt.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None or not isinstance(spec.loader, DatabaseLoader):
+        raise ImportError("module {} cannot be imported in a smart contract.".format(name))
+
+    module = importlib.util.module_from_spec(spec)
+    rt.modules[name] = module
+
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del rt.modules[name]
+        raise
+
+    return module
+
+
 def restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
     if globals is not None and globals.get('__contract__') is True:
-        spec = importlib.util.find_spec(name)
-        if spec is None or not isinstance(spec.loader, DatabaseLoader):
-            raise ImportError("module {} cannot be imported in a smart contract.".format(name))
+        return import_contract(name)
 
-    return __import__(name, globals, locals, fromlist, level)
+    return _builtin_import(name, globals, locals, fromlist, level)
+
+
+# The hook is installed for each execution and removed after it. Executors on other threads may still be running when
+# one finishes, so installs are counted and the builtin import is only put back when the last execution is done. Only
+# frames with {'__contract__': True} in their globals are restricted while it is in place.
+_import_lock = threading.Lock()
+_import_users = 0
 
 
 def enable_restricted_imports():
-    builtins.__import__ = restricted_import
+    global _import_users
+
+    with _import_lock:
+        _import_users += 1
+        builtins.__import__ = restricted_import
 #    builtins.float = ContractingDecimal
 
 
 def disable_restricted_imports():
-    builtins.__import__ = __import__
+    global _import_users
+
+    with _import_lock:
+        _import_users = max(_import_users - 1, 0)
+        if _import_users == 0:
+            builtins.__import__ = _builtin_import
 
 
 def uninstall_builtins():
@@ -78,14 +120,26 @@ class DatabaseFinder:
     driver = ContractDriver()
 
     def find_spec(self, fullname, path=None, target=None):
+        driver = rt.env.get('__Driver') or DatabaseFinder.driver
+
         if MODULE_CACHE.get(self) is None:
-            if DatabaseFinder.driver.get_contract(self) is None:
+            if driver.get_contract(self) is None:
                 return None
-        return ModuleSpec(self, DatabaseLoader(DatabaseFinder.driver))
+        return ModuleSpec(self, DatabaseLoader(driver))
 
 
+# Compiled contract code by name. Unlike the modules made from it, which live on each runtime, this is shared by every
+# executor in the process (and filled from bundles at start-up), so executors in one process must see the same code
+# under a contract's name. Executors over databases that disagree on a contract belong in separate processes.
 MODULE_CACHE = {}
 
+# Owner, submission time and access summary of contracts loaded from a bundle (see bundle.py), for tools that need them
+# without reading the database. Contract execution still reads these through the driver, so it meters them.
+CONTRACT_METADATA = {}
+
+# Instrumented code is cached next to the plain code under its own key
+INSTRUMENTED_CACHE_KEY = 'instrumented'
+
 
 class DatabaseLoader(Loader):
     def __init__(self, d=ContractDriver()):
@@ -94,12 +148,29 @@ class DatabaseLoader(Loader):
     def create_module(self, spec):
         return None
 
+    def instrumented_code(self, name):
+        key = (name, INSTRUMENTED_CACHE_KEY)
+        code = MODULE_CACHE.get(key)
+
+        if code is None:
+            source = self.d.get_contract(name)
+            if source is None:
+                raise ImportError("Module {} not found".format(name))
+
+            code = compile_instrumented(source)
+            MODULE_CACHE[key] = code
+
+        return code
+
     def exec_module(self, module):
 
         # fetch the individual contract
-        code = MODULE_CACHE.get(module.__name__)
+        if rt.instrumented:
+            code = self.instrumented_code(module.__name__)
+        else:
+            code = MODULE_CACHE.get(module.__name__)
 
-        if MODULE_CACHE.get(module.__name__) is None:
+        if code is None:
             code = self.d.get_compiled(module.__name__)
             if code is None:
                 raise ImportError("Module {} not found".format(module.__name__))
@@ -118,6 +189,12 @@ class DatabaseLoader(Loader):
 
         scope.update({'__contract__': True})
 
+        # Lets the profiler tell which contract a frame belongs to
+        scope['__name__'] = module.__name__
+
+        if rt.instrumented:
+            scope[METER_NAME] = rt.tracer.add_cost
+
         # execute the module with the std env and update the module to pass forward
         exec(code, scope)
 
@@ -0,0 +1,299 @@
+import json
+import time
+import random
+from collections import defaultdict
+
+from contracting.db.encoder import Encoder, decode
+from contracting.db.driver import Driver, ContractDriver
+from contracting.execution.executor import Executor
+from contracting.execution.metering import profiler
+
+# Latencies are kept in a fixed size reservoir so replaying long logs doesn't grow memory with the log.
+LATENCY_SAMPLES = 100000
+MAX_MISMATCHES = 100
+
+# What a log may record of each transaction's effects, to check with verify
+RECORDED_KEYS = ('writes', 'deletes', 'deltas')
+
+
+def read_log(f):
+    # One transaction per line. Values go through the state decoder so times and fixed point numbers in kwargs and the
+    # environment come back as the same types the network would have passed in.
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        tx = decode(line)
+        assert tx is not None, 'Line {} is not valid JSON.'.format(number)
+
+        yield tx
+
+
+def canonical(writes):
+    return json.dumps(writes, cls=Encoder, sort_keys=True, separators=(',', ':'))
+
+
+def diff_writes(recorded, replayed):
+    recorded = json.loads(canonical(recorded))
+    replayed = json.loads(canonical(replayed))
+
+    return {
+        'missing': sorted(k for k in recorded if k not in replayed),
+        'extra': sorted(k for k in replayed if k not in recorded),
+        'changed': sorted(k for k in recorded if k in replayed and recorded[k] != replayed[k])
+    }
+
+
+def deletes_any_under(writes, prefix):
+    return any(k.startswith(prefix) and v is None for k, v in writes.items())
+
+
+def diff_output(recorded, replayed):
+    # Compares what a transaction wrote, deleted and added to with what the log recorded. Deletes and deltas are only
+    # compared when the log has them, since logs from before they existed don't. Those logs list a cleared hash as a
+    # None write of each of its keys, so None writes under a prefix deleted on the other side count as that delete.
+    # Keys added to are compared by the amount added, as their totals depend on when they were committed.
+    recorded_writes = json.loads(canonical(recorded.get('writes', {})))
+    replayed_writes = json.loads(canonical(replayed.get('writes', {})))
+
+    recorded_deletes = set(recorded.get('deletes', []))
+    replayed_deletes = set(replayed.get('deletes', []))
+
+    added = set(recorded.get('deltas', {})).union(replayed.get('deltas', {}))
+
+    def compared(writes, deletes):
+        return {k: v for k, v in writes.items()
+                if k not in added and not (v is None and any(k.startswith(p) for p in deletes))}
+
+    diff = diff_writes(compared(recorded_writes, replayed_deletes), compared(replayed_writes, recorded_deletes))
+
+    diff['missing_deletes'] = []
+    diff['extra_deletes'] = []
+    if 'deletes' in recorded:
+        diff['missing_deletes'] = sorted(p for p in recorded_deletes - replayed_deletes
+                                         if not deletes_any_under(replayed_writes, p))
+        diff['extra_deletes'] = sorted(p for p in replayed_deletes - recorded_deletes
+                                       if not deletes_any_under(recorded_writes, p))
+
+    deltas = {'missing': [], 'extra': [], 'changed': []}
+    if 'deltas' in recorded:
+        deltas = diff_writes(recorded['deltas'], replayed.get('deltas', {}))
+
+    for kind, keys in deltas.items():
+        diff['{}_deltas'.format(kind)] = keys
+
+    return diff
+
+
+class OverlayDriver:
+    # Holds replayed writes in memory on top of a snapshot so the snapshot itself is never modified.
+    def __init__(self, driver):
+        self.driver = driver
+        self.writes = {}
+        self.deleted = []  # Prefixes deleted whole
+
+    def get(self, key):
+        if key in self.writes:
+            return self.writes[key]
+        if self.is_deleted(key):
+            return None
+        return self.driver.get(key)
+
+    def set(self, key, value):
+        self.writes[key] = value
+
+    def delete(self, key):
+        self.writes[key] = None
+
+    def delete_prefix(self, prefix):
+        for k in [k for k in self.writes if k.startswith(prefix)]:
+            del self.writes[k]
+
+        # Prefixes covered by another are dropped, so clearing the same hash again doesn't grow the list
+        if not self.is_deleted(prefix):
+            self.deleted = [p for p in self.deleted if not p.startswith(prefix)]
+            self.deleted.append(prefix)
+
+    def is_deleted(self, key):
+        return any(key.startswith(prefix) for prefix in self.deleted)
+
+    def iter(self, prefix, length=0, start_after=None):
+        keys = set() if self.is_deleted(prefix) else \
+            {k for k in self.driver.iter(prefix, start_after=start_after) if not self.is_deleted(k)}
+        for k, v in self.writes.items():
+            if not k.startswith(prefix) or (start_after is not None and k <= start_after):
+                continue
+            if v is None:
+                keys.discard(k)
+            else:
+                keys.add(k)
+
+        keys = sorted(keys)
+        if length > 0:
+            keys = keys[:length]
+
+        return keys
+
+    def get_many(self, keys):
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+
+        return values
+
+    def keys(self):
+        return self.iter('')
+
+    def flush(self):
+        raise AssertionError('Replays do not flush their snapshot.')
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+
+class ReplayReport:
+    def __init__(self, seed=0):
+        self.transactions = 0
+        self.failed = 0
+        self.stamps_used = 0
+        self.elapsed = 0
+        self.checked = 0
+        self.mismatched = 0
+        self.mismatches = []
+
+        # Costs summed over every profiled transaction, {(contract, function, line, kind): cost}
+        self.profile = defaultdict(int)
+
+        self._latencies = []
+        self._random = random.Random(seed)
+
+    def record(self, latency, output):
+        self.transactions += 1
+        self.elapsed += latency
+        self.stamps_used += output['stamps_used']
+
+        if output['status_code'] != 0:
+            self.failed += 1
+
+        if 'profile' in output:
+            profiler.merge(output['profile'], into=self.profile)
+
+        if len(self._latencies) < LATENCY_SAMPLES:
+            self._latencies.append(latency)
+        else:
+            i = self._random.randrange(self.transactions)
+            if i < LATENCY_SAMPLES:
+                self._latencies[i] = latency
+
+    def mismatch(self, number, tx, diff):
+        self.mismatched += 1
+        if len(self.mismatches) < MAX_MISMATCHES:
+            self.mismatches.append({
+                'transaction': number,
+                'contract': tx['contract_name'],
+                'function': tx['function_name'],
+                **diff
+            })
+
+    def percentile(self, p):
+        if not self._latencies:
+            return 0
+
+        latencies = sorted(self._latencies)
+        i = max(int(round(p / 100 * len(latencies))) - 1, 0)
+        return latencies[min(i, len(latencies) - 1)]
+
+    def summary(self) -> dict:
+        return {
+            'transactions': self.transactions,
+            'failed': self.failed,
+            'seconds': self.elapsed,
+            'transactions_per_second': self.transactions / self.elapsed if self.elapsed else 0,
+            'stamps_used': self.stamps_used,
+            'stamps_per_second': self.stamps_used / self.elapsed if self.elapsed else 0,
+            'latency': {
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'max': max(self._latencies) if self._latencies else 0
+            },
+            'checked': self.checked,
+            'mismatched': self.mismatched,
+            'mismatches': self.mismatches
+        }
+
+
+def transaction_kwargs(tx):
+    kwargs = {
+        'sender': tx['sender'],
+        'contract_name': tx.get('contract_name', tx.get('contract')),
+        'function_name': tx.get('function_name', tx.get('function')),
+        'kwargs': tx.get('kwargs', {}),
+        'environment': tx.get('environment', {})
+    }
+
+    if 'stamps' in tx:
+        kwargs['stamps'] = tx['stamps']
+
+    return kwargs
+
+
+def replay(transactions, executor, commit=False, verify=False, limit=None, profile=False) -> ReplayReport:
+    """
+    Runs each transaction through the executor in order and measures it.
+
+    Without commit, writes land in an in-memory overlay on top of the executor's driver, so the snapshot is left as it
+    was. The overlay holds the latest value of every key written, so its memory grows with the state the log touches;
+    replay with commit against a copy of the snapshot to keep memory flat over very long logs. With verify, any
+    transaction carrying recorded writes, deletes or deltas is checked against what it produced. With profile, the
+    report also sums where the stamps of every transaction went.
+    """
+    driver = executor.driver
+    base = driver.driver
+
+    if not commit:
+        driver.driver = OverlayDriver(base)
+
+    report = ReplayReport()
+
+    try:
+        for number, tx in enumerate(transactions, 1):
+            if limit is not None and number > limit:
+                break
+
+            kwargs = transaction_kwargs(tx)
+
+            start = time.perf_counter()
+            output = executor.execute(**kwargs, auto_commit=True, profile=profile)
+            report.record(time.perf_counter() - start, output)
+
+            if verify and any(k in tx for k in RECORDED_KEYS):
+                report.checked += 1
+
+                diff = diff_output(tx, output)
+                if any(diff.values()):
+                    report.mismatch(number, kwargs, diff)
+
+            # Start every transaction from committed state, so the driver's caches don't grow over long logs
+            driver.clear_pending_state()
+    finally:
+        driver.driver = base
+
+    return report
+
+
+def replay_file(path, db='lamden', collection='state', commit=False, verify=False, metering=True, limit=None,
+                profile=False):
+    executor = Executor(metering=metering, driver=ContractDriver(driver=Driver(db=db, collection=collection)))
+
+    with open(path) as f:
+        return replay(read_log(f), executor, commit=commit, verify=verify, limit=limit, profile=profile)
@@ -1,8 +1,14 @@
 import sys
+import threading
 from contracting import config
-import contracting
-import os
-from contracting.execution.metering.tracer import Tracer
+from contracting.execution.metering import costs, profiler
+from contracting.execution.metering.tracer import Tracer, MODE_LINE, MODE_OPCODE, MODE_INSTRUMENTED
+
+METERING_MODES = {
+    config.METERING_LINE: MODE_LINE,
+    config.METERING_OPCODE: MODE_OPCODE,
+    config.METERING_INSTRUMENTED: MODE_INSTRUMENTED
+}
 
 
 class Context:
@@ -49,67 +55,113 @@ class Context:
         return self._get_state()['owner']
 
 
-_context = Context({
-        'this': None,
-        'caller': None,
-        'owner': None,
-        'signer': None
-    })
-
-
 class Runtime:
-    cu_path = contracting.__path__[0]
-    cu_path = os.path.join(cu_path, 'execution', 'metering', 'cu_costs.const')
+    def __init__(self):
+        self.loaded_modules = []
+        self.modules = {}
 
-    os.environ['CU_COST_FNAME'] = cu_path
+        self.env = {}
+        self.stamps = 0
 
-    loaded_modules = []
+        self.tracer = Tracer()
+        self.tracer.set_costs(costs.load_costs())
 
-    env = {}
-    stamps = 0
+        # Whether contracts should be loaded with their metering compiled in
+        self.instrumented = False
 
-    tracer = Tracer()
+        self.signer = None
 
-    signer = None
+        self.context = Context({
+            'this': None,
+            'caller': None,
+            'owner': None,
+            'signer': None
+        })
 
-    context = _context
+    # Runtimes are activated per thread. Anything resolving through `rt` (the ORM, drivers, the stdlib bridge) will
+    # use the innermost active runtime, or the process default if none is active.
+    def __enter__(self):
+        _runtime_stack().append(self)
+        return self
 
-    @classmethod
-    def set_up(cls, stmps, meter):
+    def __exit__(self, *args, **kwargs):
+        _runtime_stack().pop()
+
+    def set_up(self, stmps, meter, mode=config.METERING_MODE, profile=False, memory_limit=config.MEMORY_LIMIT):
         if meter:
-            cls.stamps = stmps
-            cls.tracer.set_stamp(stmps)
-            cls.tracer.start()
+            self.stamps = stmps
+            self.tracer.set_mode(METERING_MODES[mode])
+            self.tracer.set_profile(profile)
+            self.tracer.set_memory_limit(memory_limit)
+            self.tracer.set_stamp(stmps)
+            self.tracer.start()
+
+        self.instrumented = meter and mode == config.METERING_INSTRUMENTED
 
-        cls.context._reset()
+        self.context._reset()
 
-    @classmethod
-    def clean_up(cls):
-        cls.tracer.stop()
-        cls.tracer.reset()
-        cls.stamps = 0
+    def clean_up(self):
+        self.tracer.stop()
+        self.tracer.reset()
+        self.stamps = 0
+        self.instrumented = False
 
-        cls.signer = None
+        self.signer = None
 
-        for mod in cls.loaded_modules:
+        for mod in self.loaded_modules:
             if sys.modules.get(mod) is not None:
                 del sys.modules[mod]
 
-        cls.loaded_modules = []
-        cls.env = {}
+        self.loaded_modules = []
+        self.modules = {}
+        self.env = {}
 
-    @classmethod
-    def deduct_read(cls, key, value):
-        if cls.tracer.is_started():
+    def deduct_read(self, key, value):
+        if self.tracer.is_started():
             cost = len(key) + len(value)
             cost *= config.READ_COST_PER_BYTE
-            cls.tracer.add_cost(cost)
+            self.tracer.add_cost(cost, profiler.READ)
 
-    @classmethod
-    def deduct_write(cls, key, value):
-        if key is not None and rt.tracer.is_started():
+    def deduct_write(self, key, value):
+        if key is not None and self.tracer.is_started():
             cost = len(key) + len(value)
             cost *= config.WRITE_COST_PER_BYTE
-            rt.tracer.add_cost(cost)
+            self.tracer.add_cost(cost, profiler.WRITE)
+
+
+_local = threading.local()
+
+
+def _runtime_stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = []
+        _local.stack = stack
+    return stack
+
+
+default_runtime = Runtime()
+
+
+def get_runtime():
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
+    return default_runtime
+
+
+class RuntimeProxy:
+    def __getattr__(self, item):
+        return getattr(get_runtime(), item)
+
+    def __setattr__(self, key, value):
+        setattr(get_runtime(), key, value)
+
+
+class ContextProxy:
+    def __getattr__(self, item):
+        return getattr(get_runtime().context, item)
+
 
-rt = Runtime()
+rt = RuntimeProxy()
+ctx = ContextProxy()
@@ -1,11 +1,9 @@
-import importlib
 from types import FunctionType, ModuleType
 from contracting.config import PRIVATE_METHOD_PREFIX
 from contracting.db.orm import Datum
 from contracting.db.driver import ContractDriver, OWNER_KEY
 from contracting.execution.runtime import rt
-from stdlib_list import stdlib_list
-import sys
+from contracting.compilation.whitelists import is_stdlib_module
 
 def extract_closure(fn):
     closure = fn.__closure__[0]
@@ -47,7 +45,7 @@ class Var:
 
 def import_module(name):
     _driver = rt.env.get('__Driver') or ContractDriver()
-    if name in set(stdlib_list(f'{sys.version_info.major}.{sys.version_info.minor}')):
+    if is_stdlib_module(name):
         raise ImportError
 
     if name.startswith('_'):
@@ -56,7 +54,9 @@ def import_module(name):
     if _driver.get_contract(name) is None:
         raise ImportError
 
-    m = importlib.import_module(name, package=None)
+    # Imported lazily because the module loader depends on the stdlib environment this module is a part of
+    from contracting.execution.module import import_contract
+    m = import_contract(name)
 
     return m
 
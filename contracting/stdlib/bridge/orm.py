@@ -1,9 +1,13 @@
-from contracting.db.orm import Variable, Hash, ForeignVariable, ForeignHash
+from contracting.db.orm import Variable, Hash, ForeignVariable, ForeignHash, OrderedHash, Counter
 from contracting.db.contract import Contract
 from contracting.execution.runtime import rt
 
 
+# Slotted like the classes they wrap, so contract ORM objects get no instance dict. Setting an attribute the ORM doesn't
+# use (like the old key attribute) raises AttributeError instead of being ignored.
 class V(Variable):
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         if rt.env.get('__Driver') is not None:
             kwargs['driver'] = rt.env.get('__Driver')
@@ -11,6 +15,8 @@ class V(Variable):
 
 
 class H(Hash):
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         if rt.env.get('__Driver') is not None:
             kwargs['driver'] = rt.env.get('__Driver')
@@ -18,6 +24,8 @@ class H(Hash):
 
 
 class FV(ForeignVariable):
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         if rt.env.get('__Driver') is not None:
             kwargs['driver'] = rt.env.get('__Driver')
@@ -25,6 +33,26 @@ class FV(ForeignVariable):
 
 
 class FH(ForeignHash):
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        if rt.env.get('__Driver') is not None:
+            kwargs['driver'] = rt.env.get('__Driver')
+        super().__init__(*args, **kwargs)
+
+
+class OH(OrderedHash):
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        if rt.env.get('__Driver') is not None:
+            kwargs['driver'] = rt.env.get('__Driver')
+        super().__init__(*args, **kwargs)
+
+
+class CO(Counter):
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         if rt.env.get('__Driver') is not None:
             kwargs['driver'] = rt.env.get('__Driver')
@@ -44,5 +72,7 @@ exports = {
     'Hash': H,
     'ForeignVariable': FV,
     'ForeignHash': FH,
+    'OrderedHash': OH,
+    'Counter': CO,
     '__Contract': C
 }
\ No newline at end of file
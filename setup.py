@@ -8,7 +8,7 @@ major = 0
 
 __version__ = '1.0.4.4'
 
-requirements = ['astor', 'pymongo', 'autopep8', 'stdlib_list']
+requirements = ['astor', 'pymongo', 'autopep8']
 
 ext_errors = (CCompilerError, DistutilsExecError, DistutilsPlatformError)
 
@@ -56,6 +56,14 @@ setup(
     ],
     zip_safe=True,
     include_package_data=True,
+    package_data={
+        'contracting.execution.metering': ['*.const'],
+    },
+    entry_points={
+        'console_scripts': [
+            'contracting=contracting.cli:main',
+        ],
+    },
     ext_modules=[
         Extension('contracting.execution.metering.tracer', sources=['contracting/execution/metering/tracer.c']),
     ],
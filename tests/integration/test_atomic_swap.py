@@ -56,6 +56,27 @@ class TestAtomicSwapContract(TestCase):
 
         self.d.flush()
 
+    def test_access_summaries_follow_calls_into_the_token(self):
+        redeem = self.e.driver.get_access('atomic_swaps')['redeem']
+
+        self.assertEqual(redeem['calls'], ['erc20_clone.transfer'])
+        self.assertEqual(redeem['reads'], ['atomic_swaps.swaps', 'erc20_clone.balances'])
+        self.assertEqual(redeem['writes'], ['atomic_swaps.swaps', 'erc20_clone.balances'])
+        self.assertFalse(redeem['dynamic'])
+
+    def test_following_calls_does_not_read_other_summaries(self):
+        kwargs = submission_kwargs_for_file('./test_contracts/atomic_swaps.s.py')
+        kwargs['name'] = 'other_swaps'
+
+        # Make the token's summary come from the database
+        self.e.driver.cache.clear()
+
+        output = self.e.execute(**TEST_SUBMISSION_KWARGS, kwargs=kwargs)
+
+        self.assertEqual(output['status_code'], 0)
+        self.assertNotIn('erc20_clone.__access__', output['reads'])
+        self.assertEqual(self.e.driver.get_access('other_swaps')['redeem']['calls'], ['erc20_clone.transfer'])
+
     def test_initiate_not_enough_approved(self):
         self.e.execute('stu', 'erc20_clone', 'approve', kwargs={'amount': 1000000, 'to': 'atomic_swaps'})
         output = self.e.execute('stu', 'atomic_swaps', 'initiate', kwargs={
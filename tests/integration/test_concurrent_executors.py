@@ -0,0 +1,131 @@
+from unittest import TestCase
+from contracting.db.driver import ContractDriver, Driver
+from contracting.execution.executor import Executor
+from contracting.execution.module import enable_restricted_imports, disable_restricted_imports, restricted_import, \
+    _builtin_import
+import builtins
+import threading
+
+
+def submission_kwargs_for_file(f):
+    # Get the file name only by splitting off directories
+    split = f.split('/')
+    split = split[-1]
+
+    # Now split off the .s
+    split = split.split('.')
+    contract_name = split[0]
+
+    with open(f) as file:
+        contract_code = file.read()
+
+    return {
+        'name': contract_name,
+        'code': contract_code,
+    }
+
+
+TEST_SUBMISSION_KWARGS = {
+    'sender': 'stu',
+    'contract_name': 'submission',
+    'function_name': 'submit_contract'
+}
+
+
+class TestConcurrentExecutors(TestCase):
+    def setUp(self):
+        self.drivers = [
+            ContractDriver(driver=Driver(collection='concurrent_a')),
+            ContractDriver(driver=Driver(collection='concurrent_b'))
+        ]
+
+        with open('../../contracting/contracts/submission.s.py') as f:
+            contract = f.read()
+
+        for d in self.drivers:
+            d.flush()
+            d.set_contract(name='submission', code=contract)
+            d.commit()
+
+    def tearDown(self):
+        for d in self.drivers:
+            d.flush()
+
+    def test_executors_in_threads_do_not_share_state(self):
+        executors = [Executor(metering=False, driver=d) for d in self.drivers]
+
+        for e in executors:
+            e.execute(**TEST_SUBMISSION_KWARGS,
+                      kwargs=submission_kwargs_for_file('./test_contracts/erc20_clone.s.py'),
+                      auto_commit=True)
+
+        errors = []
+
+        def transfer(e, to, n):
+            for _ in range(n):
+                output = e.execute('stu', 'erc20_clone', 'transfer', kwargs={'amount': 1, 'to': to},
+                                   auto_commit=True)
+                if output['status_code'] != 0:
+                    errors.append(output['result'])
+
+        threads = [
+            threading.Thread(target=transfer, args=(executors[0], 'a', 50)),
+            threading.Thread(target=transfer, args=(executors[1], 'b', 30))
+        ]
+
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+
+        self.assertEqual(self.drivers[0].get('erc20_clone.balances:a'), 50)
+        self.assertIsNone(self.drivers[0].get('erc20_clone.balances:b'))
+
+        self.assertEqual(self.drivers[1].get('erc20_clone.balances:b'), 30)
+        self.assertIsNone(self.drivers[1].get('erc20_clone.balances:a'))
+
+    def test_executors_have_their_own_runtime(self):
+        a = Executor(metering=False, driver=self.drivers[0])
+        b = Executor(metering=False, driver=self.drivers[1])
+
+        self.assertIsNot(a.runtime, b.runtime)
+        self.assertIs(a.runtime.env['__Driver'], self.drivers[0])
+        self.assertIs(b.runtime.env['__Driver'], self.drivers[1])
+
+    def test_restricted_imports_are_removed_after_execution(self):
+        e = Executor(metering=False, driver=self.drivers[0])
+        e.execute(**TEST_SUBMISSION_KWARGS,
+                  kwargs=submission_kwargs_for_file('./test_contracts/erc20_clone.s.py'),
+                  auto_commit=True)
+
+        self.assertIs(builtins.__import__, _builtin_import)
+
+    def test_restricted_imports_stay_while_another_thread_executes(self):
+        started = threading.Event()
+        release = threading.Event()
+        seen = []
+
+        def hold():
+            enable_restricted_imports()
+            started.set()
+            release.wait()
+            seen.append(builtins.__import__)
+            disable_restricted_imports()
+
+        t = threading.Thread(target=hold)
+        t.start()
+        started.wait()
+
+        e = Executor(metering=False, driver=self.drivers[0])
+        e.execute(**TEST_SUBMISSION_KWARGS,
+                  kwargs=submission_kwargs_for_file('./test_contracts/erc20_clone.s.py'),
+                  auto_commit=True)
+
+        release.set()
+        t.join()
+
+        self.assertIs(seen[0], restricted_import)
+        self.assertIs(builtins.__import__, _builtin_import)
@@ -0,0 +1,21 @@
+votes = OrderedHash(default_value=0)
+
+@export
+def vote(candidate: str, weight: int):
+    votes[candidate] += weight
+
+@export
+def leaders(n: int):
+    return votes.top(n)
+
+@export
+def between(lo: int, hi: int):
+    return votes.range(lo, hi)
+
+@export
+def position(candidate: str):
+    return votes.rank(candidate)
+
+@export
+def reset():
+    votes.clear()
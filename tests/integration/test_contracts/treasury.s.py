@@ -0,0 +1,9 @@
+balances = Counter()
+
+@export
+def deposit(amount: int):
+    balances['treasury'] += amount
+
+@export
+def balance():
+    return balances['treasury']
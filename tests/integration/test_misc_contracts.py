@@ -1,6 +1,7 @@
 from unittest import TestCase
 from contracting.stdlib.bridge.time import Datetime
 from contracting.client import ContractingClient
+from contracting.execution.executor import Executor
 
 
 class TestMiscContracts(TestCase):
@@ -84,3 +85,82 @@ class TestPassHash(TestCase):
         output = self.test_pass_hash.get(k='thing')
 
         self.assertEqual(output, 'value')
+
+
+class TestOrderedHashContract(TestCase):
+    def setUp(self):
+        self.c = ContractingClient(signer='stu')
+        self.c.raw_driver.flush()
+
+        with open('../../contracting/contracts/submission.s.py') as f:
+            contract = f.read()
+
+        self.c.raw_driver.set_contract(name='submission', code=contract,)
+
+        self.c.raw_driver.commit()
+
+        with open('./test_contracts/ranked_votes.s.py') as f:
+            code = f.read()
+            self.c.submit(code, name='ranked_votes')
+
+        self.ranked_votes = self.c.get_contract('ranked_votes')
+
+        for candidate, weight in [('a', 5), ('b', 10), ('c', 1), ('a', 7), ('d', 10)]:
+            self.ranked_votes.vote(candidate=candidate, weight=weight)
+
+    def test_leaders_follow_votes(self):
+        self.assertEqual(self.ranked_votes.leaders(n=2), [('a', 12), ('b', 10)])
+        self.assertEqual(self.ranked_votes.between(lo=2, hi=10), [('b', 10), ('d', 10)])
+        self.assertEqual(self.ranked_votes.position(candidate='c'), 3)
+        self.assertEqual(self.ranked_votes.votes['a'], 12)
+
+    def test_reset_empties_the_index(self):
+        self.ranked_votes.reset()
+
+        self.assertEqual(self.ranked_votes.leaders(n=10), [])
+        self.assertIsNone(self.ranked_votes.position(candidate='a'))
+
+
+class TestCounterContract(TestCase):
+    def setUp(self):
+        self.c = ContractingClient(signer='stu')
+        self.c.raw_driver.flush()
+
+        with open('../../contracting/contracts/submission.s.py') as f:
+            contract = f.read()
+
+        self.c.raw_driver.set_contract(name='submission', code=contract,)
+
+        self.c.raw_driver.commit()
+
+        with open('./test_contracts/treasury.s.py') as f:
+            code = f.read()
+            self.c.submit(code, name='treasury')
+
+        self.c.raw_driver.commit()
+        self.c.raw_driver.clear_pending_state()
+
+    def test_deposits_do_not_read_the_balance(self):
+        e = Executor(metering=False, driver=self.c.raw_driver)
+
+        output = e.execute('stu', 'treasury', 'deposit', kwargs={'amount': 5}, auto_commit=False)
+
+        self.assertNotIn('treasury.balances:treasury', output['reads'])
+        self.assertEqual(output['deltas'], {'treasury.balances:treasury': 5})
+
+        e.execute('stu', 'treasury', 'deposit', kwargs={'amount': 7}, auto_commit=False)
+        self.c.raw_driver.commit()
+        self.c.raw_driver.clear_pending_state()
+
+        self.assertEqual(self.c.get_contract('treasury').balance(), 12)
+
+    def test_committed_deposits_are_still_listed(self):
+        e = Executor(metering=False, driver=self.c.raw_driver)
+
+        e.execute('stu', 'treasury', 'deposit', kwargs={'amount': 5}, auto_commit=True)
+        self.c.raw_driver.clear_pending_state()
+
+        output = e.execute('stu', 'treasury', 'deposit', kwargs={'amount': 7}, auto_commit=True)
+
+        self.assertEqual(output['deltas'], {'treasury.balances:treasury': 7})
+        self.assertEqual(output['writes']['treasury.balances:treasury'], 12)
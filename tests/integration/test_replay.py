@@ -0,0 +1,234 @@
+from unittest import TestCase
+from contracting.db.driver import ContractDriver, Driver
+from contracting.db.encoder import encode
+from contracting.execution.executor import Executor
+from contracting.execution import replay
+from contracting import cli
+import tempfile
+import json
+import io
+import os
+
+
+def submission_kwargs_for_file(f):
+    # Get the file name only by splitting off directories
+    split = f.split('/')
+    split = split[-1]
+
+    # Now split off the .s
+    split = split.split('.')
+    contract_name = split[0]
+
+    with open(f) as file:
+        contract_code = file.read()
+
+    return {
+        'name': contract_name,
+        'code': contract_code,
+    }
+
+
+TEST_SUBMISSION_KWARGS = {
+    'sender': 'stu',
+    'contract_name': 'submission',
+    'function_name': 'submit_contract'
+}
+
+
+def transfer(to, amount, writes=None):
+    tx = {
+        'sender': 'stu',
+        'contract': 'erc20_clone',
+        'function': 'transfer',
+        'kwargs': {'amount': amount, 'to': to}
+    }
+
+    if writes is not None:
+        tx['writes'] = writes
+
+    return tx
+
+
+class TestReplay(TestCase):
+    def setUp(self):
+        self.d = ContractDriver(driver=Driver(collection='replay'))
+        self.d.flush()
+
+        with open('../../contracting/contracts/submission.s.py') as f:
+            contract = f.read()
+
+        self.d.set_contract(name='submission', code=contract)
+        self.d.commit()
+
+        Executor(metering=False, driver=self.d).execute(
+            **TEST_SUBMISSION_KWARGS,
+            kwargs=submission_kwargs_for_file('./test_contracts/erc20_clone.s.py'),
+            auto_commit=True)
+
+        self.d.clear_pending_state()
+
+        fd, self.log = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+
+    def tearDown(self):
+        self.d.flush()
+        os.remove(self.log)
+
+    def write_log(self, txs):
+        with open(self.log, 'w') as f:
+            for tx in txs:
+                f.write(encode(tx) + '\n')
+
+    def test_replay_without_commit_leaves_snapshot_alone(self):
+        self.write_log([transfer('colin', 1), transfer('colin', 2), transfer('raghu', 3)])
+
+        report = replay.replay_file(self.log, collection='replay', metering=False)
+        summary = report.summary()
+
+        self.assertEqual(summary['transactions'], 3)
+        self.assertEqual(summary['failed'], 0)
+        self.assertGreater(summary['transactions_per_second'], 0)
+        self.assertLessEqual(summary['latency']['p50'], summary['latency']['max'])
+
+        self.assertEqual(self.d.get('erc20_clone.balances:colin'), 100)
+        self.assertIsNone(self.d.get('erc20_clone.balances:raghu'))
+
+    def test_later_transactions_see_earlier_writes(self):
+        self.write_log([
+            transfer('colin', 1, writes={'erc20_clone.balances:stu': 999999, 'erc20_clone.balances:colin': 101}),
+            transfer('colin', 1, writes={'erc20_clone.balances:stu': 999998, 'erc20_clone.balances:colin': 102})
+        ])
+
+        report = replay.replay_file(self.log, collection='replay', verify=True, metering=False)
+        summary = report.summary()
+
+        self.assertEqual(summary['checked'], 2)
+        self.assertEqual(summary['mismatched'], 0)
+
+    def test_verify_reports_mismatched_write_sets(self):
+        self.write_log([
+            transfer('colin', 1, writes={'erc20_clone.balances:stu': 5, 'erc20_clone.balances:raghu': 101})
+        ])
+
+        report = replay.replay_file(self.log, collection='replay', verify=True, metering=False)
+        mismatch = report.summary()['mismatches'][0]
+
+        self.assertEqual(mismatch['transaction'], 1)
+        self.assertEqual(mismatch['missing'], ['erc20_clone.balances:raghu'])
+        self.assertEqual(mismatch['extra'], ['erc20_clone.balances:colin'])
+        self.assertEqual(mismatch['changed'], ['erc20_clone.balances:stu'])
+
+    def test_commit_writes_to_snapshot(self):
+        self.write_log([transfer('colin', 1), transfer('raghu', 3)])
+
+        replay.replay_file(self.log, collection='replay', commit=True, metering=False)
+
+        self.assertEqual(self.d.get('erc20_clone.balances:colin'), 101)
+        self.assertEqual(self.d.get('erc20_clone.balances:raghu'), 3)
+
+    def test_overlay_pages_over_writes(self):
+        overlay = replay.OverlayDriver(self.d.driver)
+        overlay.set('erc20_clone.balances:raghu', 5)
+        overlay.delete('erc20_clone.balances:stu')
+
+        self.assertEqual(overlay.iter('erc20_clone.balances:', length=1, start_after='erc20_clone.balances:colin'),
+                         ['erc20_clone.balances:raghu'])
+        self.assertEqual(overlay.get_many(['erc20_clone.balances:raghu', 'erc20_clone.balances:stu']),
+                         {'erc20_clone.balances:raghu': 5})
+
+    def test_overlay_deletes_prefixes_without_touching_the_snapshot(self):
+        overlay = replay.OverlayDriver(self.d.driver)
+        overlay.delete_prefix('erc20_clone.balances:')
+        overlay.set('erc20_clone.balances:raghu', 5)
+
+        self.assertIsNone(overlay.get('erc20_clone.balances:stu'))
+        self.assertEqual(overlay.iter('erc20_clone.balances:'), ['erc20_clone.balances:raghu'])
+        self.assertIsNotNone(self.d.driver.get('erc20_clone.balances:stu'))
+
+    def test_limit_stops_early(self):
+        self.write_log([transfer('colin', 1)] * 5)
+
+        report = replay.replay_file(self.log, collection='replay', limit=2, metering=False)
+
+        self.assertEqual(report.summary()['transactions'], 2)
+
+    def test_cli_prints_json_and_fails_on_mismatch(self):
+        self.write_log([transfer('colin', 1, writes={})])
+
+        out = io.StringIO()
+        args = cli.build_parser().parse_args([
+            'replay', self.log, '--collection', 'replay', '--verify', '--no-metering', '--json'
+        ])
+
+        code = cli.run_replay(args, out=out)
+        summary = json.loads(out.getvalue())
+
+        self.assertEqual(code, 1)
+        self.assertEqual(summary['transactions'], 1)
+        self.assertEqual(summary['mismatched'], 1)
+
+    def test_cli_writes_folded_profile(self):
+        # Profiles come from the metering, which needs stamps to spend
+        self.d.set('currency.balances:stu', 10 ** 6)
+        self.d.commit()
+
+        self.write_log([transfer('colin', 1), transfer('raghu', 2)])
+
+        fd, path = tempfile.mkstemp(suffix='.folded')
+        os.close(fd)
+
+        try:
+            args = cli.build_parser().parse_args([
+                'replay', self.log, '--collection', 'replay', '--json', '--profile', path
+            ])
+            cli.run_replay(args, out=io.StringIO())
+
+            with open(path) as f:
+                stacks = [line.rsplit(' ', 1) for line in f.read().splitlines()]
+        finally:
+            os.remove(path)
+
+        self.assertTrue(any(stack.startswith('erc20_clone;transfer;') for stack, _ in stacks))
+        self.assertTrue(all(int(cost) > 0 for _, cost in stacks))
+
+    def test_overlay_keeps_one_prefix_per_range(self):
+        overlay = replay.OverlayDriver(self.d.driver)
+        overlay.delete_prefix('erc20_clone.balances:s')
+        overlay.delete_prefix('erc20_clone.balances:')
+        overlay.delete_prefix('erc20_clone.balances:')
+
+        self.assertEqual(overlay.deleted, ['erc20_clone.balances:'])
+
+
+class TestDiffOutput(TestCase):
+    def test_deletes_and_deltas_are_compared(self):
+        recorded = {'writes': {}, 'deletes': ['a.b:'], 'deltas': {'a.c:x': 1, 'a.c:y': 2}}
+        replayed = {'writes': {}, 'deletes': ['a.d:'], 'deltas': {'a.c:x': 3, 'a.c:z': 1}}
+
+        diff = replay.diff_output(recorded, replayed)
+
+        self.assertEqual(diff['missing_deletes'], ['a.b:'])
+        self.assertEqual(diff['extra_deletes'], ['a.d:'])
+        self.assertEqual(diff['missing_deltas'], ['a.c:y'])
+        self.assertEqual(diff['extra_deltas'], ['a.c:z'])
+        self.assertEqual(diff['changed_deltas'], ['a.c:x'])
+
+    def test_missing_keys_are_tolerated(self):
+        recorded = {'writes': {'a.b:x': 1}}
+        replayed = {'writes': {'a.b:x': 1}, 'deletes': ['a.c:'], 'deltas': {}}
+
+        self.assertFalse(any(replay.diff_output(recorded, replayed).values()))
+
+    def test_cleared_hash_matches_per_key_deletes(self):
+        # Logs from before prefix deletes recorded a None write for every key of a cleared hash
+        recorded = {'writes': {'a.b:x': None, 'a.b:y': None, 'a.b:z': 5}, 'deletes': []}
+        replayed = {'writes': {'a.b:z': 5}, 'deletes': ['a.b:']}
+
+        self.assertFalse(any(replay.diff_output(recorded, replayed).values()))
+
+    def test_totals_of_keys_added_to_are_not_compared(self):
+        # Committed deltas also show up in the writes as totals
+        recorded = {'writes': {}, 'deltas': {'a.c:x': 1}}
+        replayed = {'writes': {'a.c:x': 11}, 'deltas': {'a.c:x': 1}}
+
+        self.assertFalse(any(replay.diff_output(recorded, replayed).values()))
@@ -176,4 +176,114 @@ def test():
         c = ContractingCompiler()
         comp = c.parse(code, lint=False)
         code_str = astor.to_source(comp)
-        print(code_str)
\ No newline at end of file
+        print(code_str)
+
+    def test_hash_subscripts_call_fast_accessors(self):
+        code = '''
+h = Hash(default_value=0)
+
+def move(a: str, b: str):
+    h[a, b] = h[a] + 1
+    h[b] = h[a, b] * 2
+'''
+        c = ContractingCompiler()
+        comp = c.parse(code, lint=False)
+        code_str = astor.to_source(comp)
+
+        self.assertIn('__h._set_parts(__h._get_key(a) + 1, a, b)', code_str)
+        self.assertIn('__h._set_key(__h._get_parts(a, b) * 2, b)', code_str)
+
+        scope = env.gather()
+        exec(code_str, scope)
+
+        scope['__move']('stu', 'raghu')
+
+        self.assertEqual(scope['__h']['stu', 'raghu'], 1)
+        self.assertEqual(scope['__h']['raghu'], 2)
+
+    def test_hash_assignment_evaluates_value_before_key(self):
+        code = '''
+h = Hash()
+calls = []
+
+def key():
+    calls.append('key')
+    return 'k'
+
+def value():
+    calls.append('value')
+    return 1
+
+def store():
+    h[key()] = value()
+'''
+        c = ContractingCompiler()
+        code_str = astor.to_source(c.parse(code, lint=False))
+
+        scope = env.gather()
+        exec(code_str, scope)
+        scope['__store']()
+
+        self.assertEqual(scope['calls'], ['value', 'key'])
+
+    def test_subscripts_left_alone(self):
+        code = '''
+h = Hash()
+fh = ForeignHash(foreign_contract='scoob', foreign_name='kumbucha')
+rebound = Hash()
+
+def f(a: str):
+    x = h[1:2]
+    h[a], h[a, a] = 1, 2
+    fh[a] = 1
+    rebound = {}
+    rebound[a] = 1
+    return h[(*a,)]
+'''
+        c = ContractingCompiler()
+        code_str = astor.to_source(c.parse(code, lint=False))
+
+        self.assertIn('__h[1:2]', code_str)
+        self.assertIn('__h[a], __h[a, a] = 1, 2', code_str)
+        self.assertIn('__h[*a,]', code_str.replace('(', '').replace(')', ''))
+        self.assertIn('__rebound[a] = 1', code_str)
+
+        # A foreign hash still refuses to be written to, through its own accessor
+        self.assertIn('__fh._set_key(1, a)', code_str)
+
+    def test_augmented_hash_assignments_update_in_one_call(self):
+        code = '''
+h = Hash(default_value=0)
+
+def move(a: str, b: str, amount: int):
+    h[a] -= amount
+    h[a, b] += amount * 2
+    h[1:2] += 1
+'''
+        c = ContractingCompiler()
+        code_str = astor.to_source(c.parse(code, lint=False))
+
+        self.assertIn("__h._update(__h._read_key(a), '-=', amount)", code_str)
+        self.assertIn("__h._update(__h._read_parts(a, b), '+=', amount * 2)", code_str)
+        self.assertIn('__h[1:2] += 1', code_str)
+
+    def test_augmented_hash_assignment_reads_before_evaluating_operand(self):
+        code = '''
+h = Hash(default_value=0)
+
+def bump():
+    h['k'] = 100
+    return 1
+
+def f():
+    h['k'] += bump()
+'''
+        c = ContractingCompiler()
+        code_str = astor.to_source(c.parse(code, lint=False))
+
+        scope = env.gather()
+        exec(code_str, scope)
+        scope['__f']()
+
+        # The read of h['k'] comes first, so the write made while working out the operand is overwritten
+        self.assertEqual(scope['__h']['k'], 1)
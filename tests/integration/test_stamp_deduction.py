@@ -1,7 +1,8 @@
 from unittest import TestCase
 from contracting.db.driver import ContractDriver
 from contracting.execution.executor import Executor
-from contracting.config import STAMPS_PER_TAU
+from contracting.db.encoder import encode
+from contracting.config import STAMPS_PER_TAU, WRITE_COST_PER_BYTE, METERING_INSTRUMENTED
 from contracting.execution import runtime
 import contracting
 
@@ -29,6 +30,24 @@ TEST_SUBMISSION_KWARGS = {
     'function_name': 'submit_contract'
 }
 
+HOG_CONTRACT = '''
+@export
+def allocate(size: int):
+    return len('a' * size)
+'''
+
+MEMBERS_CONTRACT = '''
+names = Hash()
+
+@export
+def page(start: str, limit: int):
+    return [k for k, v in names.iter(start_after=start or None, limit=limit)]
+
+@export
+def reset():
+    names.clear()
+'''
+
 
 class TestMetering(TestCase):
     def setUp(self):
@@ -63,15 +82,11 @@ class TestMetering(TestCase):
     def test_too_few_stamps_fails_and_deducts_properly(self):
         prior_balance = self.d.get('currency.balances:stu')
 
-        print(prior_balance)
-
         small_amount_of_stamps = 1 * STAMPS_PER_TAU
 
         output = self.e.execute('stu', 'currency', 'transfer', kwargs={'amount': 100, 'to': 'colin'},
                                                 stamps=small_amount_of_stamps, auto_commit=True)
 
-        print(output)
-
         new_balance = self.d.get('currency.balances:stu')
 
         self.assertEqual(float(prior_balance - new_balance), output['stamps_used'] / STAMPS_PER_TAU)
@@ -108,17 +123,12 @@ class TestMetering(TestCase):
     def test_submitting_contract_succeeds_with_enough_stamps(self):
         prior_balance = self.d.get('currency.balances:stu')
 
-        print(prior_balance)
-
         output = self.e.execute(**TEST_SUBMISSION_KWARGS,
                                                 kwargs=submission_kwargs_for_file('./test_contracts/erc20_clone.s.py'), auto_commit=True
                                                 )
-        print(output)
 
         new_balance = self.d.get('currency.balances:stu')
 
-        print(new_balance)
-
         self.assertEqual(float(prior_balance - new_balance), output['stamps_used'] / STAMPS_PER_TAU)
 
     def test_pending_writes_has_deducted_stamp_amount_prior_to_auto_commit(self):
@@ -128,3 +138,123 @@ class TestMetering(TestCase):
                                 kwargs=submission_kwargs_for_file('./test_contracts/erc20_clone.s.py'), auto_commit=False
                                 )
         self.assertNotEquals(self.e.driver.pending_writes['currency.balances:stu'], prior_balance)
+
+
+    def test_profile_shows_where_stamps_went(self):
+        output = self.e.execute('stu', 'currency', 'transfer', kwargs={'amount': 100, 'to': 'colin'}, profile=True)
+
+        rows = output['profile']
+        self.assertEqual(sum(row['cost'] for row in rows) // 1000 + 1, output['stamps_used'])
+
+        transfer = {row['kind'] for row in rows if row['contract'] == 'currency' and row['function'] == 'transfer'}
+        self.assertTrue({'read', 'write'} <= transfer)
+
+    def test_profile_is_only_returned_when_asked_for(self):
+        output = self.e.execute('stu', 'currency', 'transfer', kwargs={'amount': 100, 'to': 'colin'})
+
+        self.assertNotIn('profile', output)
+
+
+    def test_memory_is_not_limited_by_default(self):
+        self.e.execute(**TEST_SUBMISSION_KWARGS, kwargs={'name': 'hog', 'code': HOG_CONTRACT}, metering=False,
+                       auto_commit=True)
+
+        output = self.e.execute('stu', 'hog', 'allocate', kwargs={'size': 20 * 1024 * 1024})
+
+        self.assertEqual(self.e.memory_limit, 0)
+        self.assertEqual(output['status_code'], 0)
+
+    def test_transactions_cannot_allocate_past_memory_limit(self):
+        self.e.execute(**TEST_SUBMISSION_KWARGS, kwargs={'name': 'hog', 'code': HOG_CONTRACT}, metering=False,
+                       auto_commit=True)
+
+        self.e.memory_limit = 10 * 1024 * 1024
+
+        output = self.e.execute('stu', 'hog', 'allocate', kwargs={'size': 1024 * 1024})
+        self.assertEqual(output['status_code'], 0)
+
+        output = self.e.execute('stu', 'hog', 'allocate', kwargs={'size': 100 * 1024 * 1024})
+        self.assertEqual(output['status_code'], 1)
+        self.assertIsInstance(output['result'], MemoryError)
+
+    def test_iterating_a_page_only_pays_for_the_page(self):
+        self.e.execute(**TEST_SUBMISSION_KWARGS, kwargs={'name': 'members', 'code': MEMBERS_CONTRACT}, metering=False,
+                       auto_commit=True)
+
+        for i in range(100):
+            self.d.set('members.names:{:03}'.format(i), 'x' * 100)
+        self.d.commit()
+
+        small = self.e.execute('stu', 'members', 'page', kwargs={'start': '004', 'limit': 5})
+        large = self.e.execute('stu', 'members', 'page', kwargs={'start': '', 'limit': 100})
+
+        self.assertEqual(small['result'], ['005', '006', '007', '008', '009'])
+        self.assertEqual(len(large['result']), 100)
+        self.assertGreater(large['stamps_used'], small['stamps_used'] * 5)
+
+    def test_clearing_costs_a_write_per_key(self):
+        self.e.execute(**TEST_SUBMISSION_KWARGS, kwargs={'name': 'members', 'code': MEMBERS_CONTRACT}, metering=False,
+                       auto_commit=True)
+
+        sizes = []
+        for count in 1, 1, 100:
+            for i in range(count):
+                self.d.set('members.names:{:03}'.format(i), 'x' * 100)
+            self.d.commit()
+            self.d.clear_pending_state()
+
+            sizes.append(self.e.execute('stu', 'members', 'reset', kwargs={}, auto_commit=True))
+
+        # The first run also pays for loading the contract
+        _, small, large = sizes
+
+        # What deleting the other 99 keys one at a time would have cost
+        per_key = (len('members.names:000') + len(encode(None))) * WRITE_COST_PER_BYTE / 1000
+
+        self.assertAlmostEqual(large['stamps_used'] - small['stamps_used'], 99 * per_key, delta=1)
+        self.assertEqual(large['deletes'], ['members.names:'])
+        self.assertEqual(self.d.driver.iter('members.names:'), [])
+
+
+class TestInstrumentedMetering(TestMetering):
+    # Runs every metering test again with the costs compiled into the contracts instead of traced
+    def setUp(self):
+        super().setUp()
+        self.e = Executor(driver=self.d, metering_mode=METERING_INSTRUMENTED)
+
+    def test_too_few_stamps_fails_and_deducts_properly(self):
+        # The traced version supplies enough stamps for the transfer to go through, so it never runs out
+        prior_balance = self.d.get('currency.balances:stu')
+
+        output = self.e.execute('stu', 'currency', 'transfer', kwargs={'amount': 100, 'to': 'colin'}, stamps=1,
+                                auto_commit=True)
+
+        new_balance = self.d.get('currency.balances:stu')
+
+        self.assertEqual(output['status_code'], 1)
+        self.assertEqual(self.d.get('currency.balances:colin'), 100)
+        self.assertEqual(float(prior_balance - new_balance), output['stamps_used'] / STAMPS_PER_TAU)
+
+    def test_unbounded_loop_runs_out_of_stamps(self):
+        self.d.set('currency.balances:stu', 500)
+        self.d.commit()
+
+        output = self.e.execute(
+            **TEST_SUBMISSION_KWARGS,
+            kwargs=submission_kwargs_for_file('./test_contracts/inf_loop.s.py'),
+            stamps=500 * STAMPS_PER_TAU,
+            auto_commit=True
+        )
+
+        self.assertEqual(output['status_code'], 1)
+        self.assertIsInstance(output['result'], AssertionError)
+        self.assertTrue(self.d.get('currency.balances:stu') < 0.01)
+
+    def test_transfer_works(self):
+        prior_balance = self.d.get('currency.balances:colin')
+
+        output = self.e.execute('stu', 'currency', 'transfer', kwargs={'amount': 100, 'to': 'colin'}, auto_commit=True)
+
+        self.assertEqual(output['status_code'], 0)
+        self.assertEqual(self.d.get('currency.balances:colin'), prior_balance + 100)
+        self.assertGreater(output['stamps_used'], 1)
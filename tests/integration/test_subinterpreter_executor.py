@@ -0,0 +1,146 @@
+from unittest import TestCase, skipUnless
+from contracting.db.driver import ContractDriver, Driver
+from contracting.execution import interpreters
+
+
+def submission_kwargs_for_file(f):
+    # Get the file name only by splitting off directories
+    split = f.split('/')
+    split = split[-1]
+
+    # Now split off the .s
+    split = split.split('.')
+    contract_name = split[0]
+
+    with open(f) as file:
+        contract_code = file.read()
+
+    return {
+        'name': contract_name,
+        'code': contract_code,
+    }
+
+
+TEST_SUBMISSION_KWARGS = {
+    'sender': 'stu',
+    'contract_name': 'submission',
+    'function_name': 'submit_contract'
+}
+
+
+class TestResultMarshalling(TestCase):
+    def test_exceptions_are_rebuilt_by_name(self):
+        output = {
+            'status_code': 1,
+            'result': AssertionError('Not enough coins!'),
+            'stamps_used': 5,
+            'writes': {},
+            'reads': set()
+        }
+
+        decoded = interpreters._decode_result(interpreters._encode_result(output))
+
+        self.assertIsInstance(decoded['result'], AssertionError)
+        self.assertEqual(str(decoded['result']), 'Not enough coins!')
+
+    def test_unknown_exception_types_keep_their_name(self):
+        class ContractError(Exception):
+            pass
+
+        output = {
+            'status_code': 1,
+            'result': ContractError('bad'),
+            'stamps_used': 5,
+            'writes': {},
+            'reads': set()
+        }
+
+        decoded = interpreters._decode_result(interpreters._encode_result(output))
+
+        self.assertEqual(str(decoded['result']), 'ContractError: bad')
+
+    def test_reads_come_back_as_a_set(self):
+        output = {
+            'status_code': 0,
+            'result': None,
+            'stamps_used': 5,
+            'writes': {'a.b:c': 100},
+            'reads': {'a.b:c', 'a.b:d'}
+        }
+
+        decoded = interpreters._decode_result(interpreters._encode_result(output))
+
+        self.assertEqual(decoded['reads'], {'a.b:c', 'a.b:d'})
+        self.assertEqual(decoded['writes'], {'a.b:c': 100})
+
+
+@skipUnless(interpreters.SUPPORTED, 'Sub-interpreters require Python 3.12 or newer.')
+class TestSubinterpreterExecutor(TestCase):
+    def setUp(self):
+        self.d = ContractDriver(driver=Driver(collection='subinterpreters'))
+        self.d.flush()
+
+        with open('../../contracting/contracts/submission.s.py') as f:
+            contract = f.read()
+
+        self.d.set_contract(name='submission', code=contract)
+        self.d.commit()
+
+        self.e = interpreters.SubinterpreterExecutor(workers=2, collection='subinterpreters', metering=False)
+
+        self.e.execute(**TEST_SUBMISSION_KWARGS,
+                       kwargs=submission_kwargs_for_file('./test_contracts/erc20_clone.s.py'),
+                       auto_commit=True)
+
+    def tearDown(self):
+        self.e.close()
+        self.d.flush()
+
+    def test_execute_returns_executor_output(self):
+        output = self.e.execute('stu', 'erc20_clone', 'transfer', kwargs={'amount': 10, 'to': 'colin'})
+
+        self.assertEqual(output['status_code'], 0)
+        self.assertEqual(output['writes']['erc20_clone.balances:colin'], 110)
+        self.assertIn('erc20_clone.balances:stu', output['reads'])
+
+    def test_failed_transaction_returns_exception(self):
+        output = self.e.execute('colin', 'erc20_clone', 'transfer', kwargs={'amount': 1000, 'to': 'stu'})
+
+        self.assertEqual(output['status_code'], 1)
+        self.assertIsInstance(output['result'], AssertionError)
+
+    def test_map_commits_on_all_workers(self):
+        txs = [{
+            'sender': 'stu',
+            'contract_name': 'erc20_clone',
+            'function_name': 'transfer',
+            'kwargs': {'amount': 1, 'to': 'worker_{}'.format(i)},
+            'auto_commit': True
+        } for i in range(10)]
+
+        outputs = self.e.map(txs)
+
+        self.assertTrue(all(o['status_code'] == 0 for o in outputs))
+
+        for i in range(10):
+            self.assertEqual(self.d.get('erc20_clone.balances:worker_{}'.format(i)), 1)
+
+    def test_close_is_idempotent(self):
+        self.e.close()
+        self.e.close()
+
+        with self.assertRaises(AssertionError):
+            self.e.execute('stu', 'erc20_clone', 'transfer', kwargs={'amount': 10, 'to': 'colin'})
+
+    def test_worker_is_usable_after_a_failed_run(self):
+        with self.assertRaises(interpreters.SubinterpreterError):
+            self.e.execute('stu', 'erc20_clone', 'transfer', kwargs={'amount': 10, 'to': 'colin'}, unknown=True)
+
+        outputs = self.e.map([{
+            'sender': 'stu',
+            'contract_name': 'erc20_clone',
+            'function_name': 'transfer',
+            'kwargs': {'amount': 10, 'to': 'colin'}
+        }] * 2)
+
+        self.assertTrue(all(o['writes']['erc20_clone.balances:colin'] == 110 for o in outputs))
@@ -0,0 +1,102 @@
+import sys
+import time
+from contracting import config
+from contracting.db.driver import ContractDriver, InMemDriver
+from contracting.execution.executor import Executor
+
+# Compares execution time without metering and with each metering mode, and the stamps each mode charges.
+# Run from this directory: python bench_metering_modes.py [iterations]
+
+LOOPS_CONTRACT = '''
+totals = Hash(default_value=0)
+
+@export
+def crunch(n: int):
+    x = [i * i for i in range(n) if i % 3]
+    totals[ctx.caller] += sum(x)
+'''
+
+
+def submission_kwargs_for_file(f):
+    # Get the file name only by splitting off directories
+    split = f.split('/')
+    split = split[-1]
+
+    # Now split off the .s
+    split = split.split('.')
+    contract_name = split[0]
+
+    with open(f) as file:
+        contract_code = file.read()
+
+    return {
+        'name': contract_name,
+        'code': contract_code,
+    }
+
+
+def set_up():
+    d = ContractDriver(driver=InMemDriver())
+
+    with open('../../contracting/contracts/submission.s.py') as f:
+        contract = f.read()
+
+    d.set_contract(name='submission', code=contract)
+    d.set_contract(name='currency', code='balances = Hash()')
+    d.set_var('currency', 'balances', ['stu'], 10 ** 12)
+    d.commit()
+
+    e = Executor(metering=False, driver=d)
+    e.execute('stu', 'submission', 'submit_contract',
+              kwargs=submission_kwargs_for_file('../integration/test_contracts/erc20_clone.s.py'), auto_commit=True)
+    e.execute('stu', 'submission', 'submit_contract', kwargs={'name': 'loops', 'code': LOOPS_CONTRACT},
+              auto_commit=True)
+
+    return d
+
+
+def bench(d, metering, mode, contract_name, function_name, kwargs, iterations):
+    e = Executor(metering=metering, metering_mode=mode, driver=d)
+
+    stamps = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        output = e.execute('stu', contract_name, function_name, kwargs=dict(kwargs), stamps=10 ** 9)
+        assert output['status_code'] == 0, output['result']
+        stamps = output['stamps_used']
+        d.clear_pending_state()
+    elapsed = time.perf_counter() - start
+
+    return elapsed / iterations, stamps
+
+
+def main(iterations=1000):
+    d = set_up()
+
+    modes = [
+        ('off', False, config.METERING_LINE),
+        ('line', True, config.METERING_LINE),
+        ('instr', True, config.METERING_INSTRUMENTED)
+    ]
+    if sys.version_info >= (3, 7):
+        modes.append(('opcode', True, config.METERING_OPCODE))
+
+    workloads = [
+        ('transfer', 'erc20_clone', 'transfer', {'amount': 1, 'to': 'colin'}),
+        ('crunch(100)', 'loops', 'crunch', {'n': 100}),
+        ('crunch(1000)', 'loops', 'crunch', {'n': 1000}),
+    ]
+
+    for label, contract_name, function_name, kwargs in workloads:
+        baseline = None
+        for name, metering, mode in modes:
+            per_tx, stamps = bench(d, metering, mode, contract_name, function_name, kwargs, iterations)
+            if baseline is None:
+                baseline = per_tx
+
+            print('{:<14} {:<7} {:>9.1f} us/tx {:>6.2f}x {:>10} stamps'.format(
+                label, name, per_tx * 1e6, per_tx / baseline, stamps if metering else '-'))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
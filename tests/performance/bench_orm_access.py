@@ -0,0 +1,95 @@
+import sys
+import time
+import timeit
+from contracting.db.driver import ContractDriver, InMemDriver
+from contracting.db.orm import Hash
+from contracting.execution.executor import Executor
+
+# Measures what a Hash access costs, on its own and inside erc20_clone and currency transactions.
+# Run from this directory: python bench_orm_access.py [iterations]
+
+
+def submission_kwargs_for_file(f):
+    # Get the file name only by splitting off directories
+    split = f.split('/')
+    split = split[-1]
+
+    # Now split off the .s
+    split = split.split('.')
+    contract_name = split[0]
+
+    with open(f) as file:
+        contract_code = file.read()
+
+    return {
+        'name': contract_name,
+        'code': contract_code,
+    }
+
+
+def set_up():
+    d = ContractDriver(driver=InMemDriver())
+
+    with open('../../contracting/contracts/submission.s.py') as f:
+        contract = f.read()
+
+    d.set_contract(name='submission', code=contract)
+    d.commit()
+
+    e = Executor(metering=False, driver=d)
+    for name in 'erc20_clone', 'currency':
+        e.execute('stu', 'submission', 'submit_contract',
+                  kwargs=submission_kwargs_for_file('../integration/test_contracts/{}.s.py'.format(name)),
+                  auto_commit=True)
+
+    e.execute('stu', 'erc20_clone', 'approve', kwargs={'amount': 10 ** 9, 'to': 'stu'}, auto_commit=True)
+
+    return d
+
+
+def bench_accesses(iterations):
+    h = Hash('bench', 'balances', driver=ContractDriver(driver=InMemDriver()), default_value=0)
+    h._set_key(100, 'stu')
+    h._set_parts(100, 'stu', 'colin')
+
+    accesses = [
+        ('h[k]', lambda: h._get_key('stu')),
+        ('h[k] = v', lambda: h._set_key(1, 'stu')),
+        ('h[a, b]', lambda: h._get_parts('stu', 'colin')),
+        ('h[a, b] = v', lambda: h._set_parts(1, 'stu', 'colin')),
+        ('h[a, b] += v', lambda: h._update(h._read_parts('stu', 'colin'), '+=', 1)),
+        ('h.all(a)', lambda: h.all('stu')),
+    ]
+
+    for label, access in accesses:
+        per_access = min(timeit.repeat(access, number=iterations, repeat=5)) / iterations
+        print('{:<14} {:>9.3f} us'.format(label, per_access * 1e6))
+
+
+def bench_transactions(d, iterations):
+    e = Executor(metering=False, driver=d)
+
+    workloads = [
+        ('erc20 transfer', 'erc20_clone', 'transfer', {'amount': 1, 'to': 'colin'}),
+        ('erc20 from', 'erc20_clone', 'transfer_from', {'amount': 1, 'to': 'colin', 'main_account': 'stu'}),
+        ('currency', 'currency', 'transfer', {'amount': 1, 'to': 'colin'}),
+    ]
+
+    for label, contract_name, function_name, kwargs in workloads:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            output = e.execute('stu', contract_name, function_name, kwargs=dict(kwargs))
+            assert output['status_code'] == 0, output['result']
+            d.clear_pending_state()
+        elapsed = time.perf_counter() - start
+
+        print('{:<14} {:>9.1f} us/tx'.format(label, elapsed / iterations * 1e6))
+
+
+def main(iterations=1000):
+    bench_accesses(iterations * 100)
+    bench_transactions(set_up(), iterations)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
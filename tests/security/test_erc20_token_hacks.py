@@ -35,14 +35,16 @@ class TestTokenHacks(TestCase):
 
         pre_hack_balance = token.balances['stu']
 
-        with open('./contracts/hack_tokens.s.py') as f:
-            code = f.read()
-            self.c.submit(code, name='token_hack')
+        # ORM objects have no instance dict, so the constructor can't even set the attribute
+        with self.assertRaises(AttributeError):
+            with open('./contracts/hack_tokens.s.py') as f:
+                code = f.read()
+                self.c.submit(code, name='token_hack')
 
         post_hack_balance = token.balances['stu']
 
-        # Assert greater because some of the balance is lost to stamps
-        self.assertGreater(pre_hack_balance, post_hack_balance)
+        # Some of the balance may be lost to stamps, but none can be gained
+        self.assertGreaterEqual(pre_hack_balance, post_hack_balance)
 
     def test_orm_setattr_hack(self):
         # This hack uses setattr instead of direct property access to do the same thing as above
@@ -0,0 +1,227 @@
+from unittest import TestCase
+from contracting.compilation import access
+from contracting.compilation.compiler import ContractingCompiler
+import contracting
+import ast
+import os
+
+
+def analyze(code, name='con'):
+    return access.analyze(ast.parse(code), name)
+
+
+class TestAccessAnalyzer(TestCase):
+    def test_hash_reads_and_writes(self):
+        summary = analyze('''
+balances = Hash(default_value=0)
+supply = Variable()
+
+@export
+def transfer(amount: int, to: str):
+    assert balances[ctx.caller] >= amount
+    balances[to] += amount
+    supply.set(supply.get() + 1)
+
+@export
+def balance_of(account: str):
+    return balances[account]
+
+@export
+def mint(account: str):
+    balances[account] = 1
+
+@export
+def holders(start: str):
+    return list(balances.iter(start_after=start, limit=10))
+''')
+
+        self.assertEqual(summary['transfer'], {
+            'reads': ['con.balances', 'con.supply'],
+            'writes': ['con.balances', 'con.supply'],
+            'calls': [],
+            'dynamic': False
+        })
+        self.assertEqual(summary['balance_of']['writes'], [])
+        self.assertEqual(summary['mint']['reads'], [])
+        self.assertEqual(summary['holders']['writes'], [])
+
+    def test_only_exported_functions_are_summarized(self):
+        summary = analyze('''
+@construct
+def seed():
+    pass
+
+def helper():
+    pass
+
+@export
+def f():
+    pass
+''')
+        self.assertEqual(list(summary), ['f'])
+
+    def test_private_functions_are_followed(self):
+        summary = analyze('''
+owner = Variable()
+log = Hash()
+
+def record(x):
+    log[x] = owner.get()
+
+def check():
+    record(1)
+
+@export
+def f():
+    check()
+''')
+        self.assertEqual(summary['f']['reads'], ['con.owner'])
+        self.assertEqual(summary['f']['writes'], ['con.log'])
+
+    def test_ordered_hash_writes_read_the_old_value(self):
+        summary = analyze('''
+votes = OrderedHash()
+
+@export
+def vote(x: str):
+    votes[x] = 1
+
+@export
+def leaders():
+    return votes.top(3)
+''')
+        self.assertEqual(summary['vote']['reads'], ['con.votes'])
+        self.assertEqual(summary['leaders']['writes'], [])
+
+    def test_counters_are_added_to_without_reading(self):
+        summary = analyze('''
+balances = Counter()
+
+@export
+def credit(x: str):
+    balances[x] += 1
+    balances.add(x, 1)
+
+@export
+def double(x: str):
+    balances[x] *= 2
+''')
+        self.assertEqual(summary['credit']['reads'], [])
+        self.assertEqual(summary['credit']['writes'], ['con.balances'])
+        self.assertEqual(summary['double']['reads'], ['con.balances'])
+
+    def test_unknown_uses_are_reads_and_writes(self):
+        summary = analyze('''
+h = Hash()
+
+@export
+def f():
+    h.clear()
+
+@export
+def g():
+    x = h
+''')
+        for name in ('f', 'g'):
+            self.assertEqual(summary[name]['reads'], ['con.h'])
+            self.assertEqual(summary[name]['writes'], ['con.h'])
+
+    def test_foreign_variables_name_the_other_contract(self):
+        summary = analyze('''
+balances = ForeignHash(foreign_contract='currency', foreign_name='balances')
+
+@export
+def f(account: str):
+    return balances[account]
+''')
+        self.assertEqual(summary['f']['reads'], ['currency.balances'])
+
+    def test_foreign_variable_named_at_runtime_is_dynamic(self):
+        summary = analyze('''
+name = 'currency'
+balances = ForeignHash(foreign_contract=name, foreign_name='balances')
+
+@export
+def f(account: str):
+    return balances[account]
+''')
+        self.assertTrue(summary['f']['dynamic'])
+
+    def test_importlib_is_dynamic(self):
+        summary = analyze('''
+@export
+def f(token: str):
+    t = importlib.import_module(token)
+    t.transfer(amount=1, to='stu')
+
+@export
+def g():
+    pass
+''')
+        self.assertTrue(summary['f']['dynamic'])
+        self.assertFalse(summary['g']['dynamic'])
+
+    def test_submitting_contracts_is_dynamic(self):
+        with open(os.path.join(contracting.__path__[0], 'contracts', 'submission.s.py')) as f:
+            summary = analyze(f.read(), 'submission')
+
+        self.assertTrue(summary['submit_contract']['dynamic'])
+
+    def test_calls_into_imported_contracts(self):
+        summary = analyze('''
+import currency as c
+
+@export
+def f():
+    c.transfer(amount=1, to='stu')
+''')
+        self.assertEqual(summary['f']['calls'], ['currency.transfer'])
+        self.assertFalse(summary['f']['dynamic'])
+
+    def test_module_code_counts_for_every_function(self):
+        summary = analyze('''
+v = Variable()
+start = v.get()
+
+@export
+def f():
+    pass
+''')
+        self.assertEqual(summary['f']['reads'], ['con.v'])
+
+    def test_compiler_returns_summaries(self):
+        code, blob, summary = ContractingCompiler(module_name='con').parse_to_compiled('''
+v = Variable()
+
+@export
+def f():
+    v.set(1)
+''')
+        self.assertEqual(summary['f']['writes'], ['con.v'])
+
+
+class TestResolve(TestCase):
+    def test_callee_summaries_are_folded_in(self):
+        stored = {
+            'currency': {'transfer': {'reads': ['currency.balances'], 'writes': ['currency.balances'],
+                                      'calls': ['other.f'], 'dynamic': False}}
+        }
+        resolved = access.resolve({'f': {'reads': ['con.v'], 'writes': [], 'calls': ['currency.transfer'],
+                                         'dynamic': False}}, stored.get)
+
+        self.assertEqual(resolved['f'], {
+            'reads': ['con.v', 'currency.balances'],
+            'writes': ['currency.balances'],
+            'calls': ['currency.transfer', 'other.f'],
+            'dynamic': False
+        })
+
+    def test_calls_that_cannot_be_followed_are_dynamic(self):
+        stored = {'currency': {}}
+        summary = {'f': {'reads': [], 'writes': [], 'calls': ['currency.transfer'], 'dynamic': False},
+                   'g': {'reads': [], 'writes': [], 'calls': ['missing.transfer'], 'dynamic': False}}
+
+        resolved = access.resolve(summary, stored.get)
+
+        self.assertTrue(resolved['f']['dynamic'])
+        self.assertTrue(resolved['g']['dynamic'])
@@ -0,0 +1,93 @@
+from unittest import TestCase
+from contracting.compilation import batch
+from contracting import cli
+import tempfile
+import shutil
+import json
+import io
+import os
+
+GOOD = '''
+balances = Hash()
+
+@export
+def transfer(amount: int, to: str):
+    balances[to] += amount
+'''
+
+BAD = '''
+@export
+def steal(amount: int):
+    _hidden = amount
+'''
+
+BROKEN = '''
+@export
+def f(
+'''
+
+
+class TestBatchCompile(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+        os.makedirs(os.path.join(self.root, 'nested'))
+        self.write('good.s.py', GOOD)
+        self.write(os.path.join('nested', 'bad.s.py'), BAD)
+        self.write('broken.s.py', BROKEN)
+        self.write('notes.txt', 'not a contract')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, source):
+        with open(os.path.join(self.root, name), 'w') as f:
+            f.write(source)
+
+    def by_name(self, results):
+        return {result['name']: result for result in results}
+
+    def test_contracts_are_found_in_directories(self):
+        names = [batch.contract_name(path) for path in batch.find_contracts([self.root])]
+
+        self.assertEqual(names, ['broken', 'good', 'bad'])
+
+    def test_violations_are_parsed(self):
+        self.assertEqual(batch.parse_violation("Line 4 : S2- Illicit use of '_' before variable : _hidden"),
+                         {'line': 4, 'code': 'S2', 'message': "Illicit use of '_' before variable : _hidden"})
+        self.assertEqual(batch.parse_violation('Line 0: S13- No valid contracting decorator found'),
+                         {'line': 0, 'code': 'S13', 'message': 'No valid contracting decorator found'})
+
+    def test_lint(self):
+        results = self.by_name(batch.process([self.root], jobs=1))
+
+        self.assertEqual(results['good']['violations'], [])
+        self.assertEqual([v['code'] for v in results['bad']['violations']], ['S2'])
+        self.assertEqual(results['broken']['violations'][0]['code'], 'SyntaxError')
+
+    def test_pool_gives_the_same_results(self):
+        self.assertEqual(batch.process([self.root], jobs=2), batch.process([self.root], jobs=1))
+
+    def test_compile_writes_contracts_that_pass(self):
+        output = os.path.join(self.root, 'out')
+        results = self.by_name(batch.process([self.root], mode=batch.COMPILE, jobs=2, output=output))
+
+        self.assertEqual([v['code'] for v in results['bad']['violations']], ['S2'])
+        self.assertEqual(os.listdir(output), ['good.py'])
+
+        with open(os.path.join(output, 'good.py')) as f:
+            self.assertIn('__balances', f.read())
+
+    def test_cli_prints_json_and_fails_on_violations(self):
+        out = io.StringIO()
+        args = cli.build_parser().parse_args(['lint', self.root, '--json', '-j', '1'])
+
+        self.assertEqual(cli.run_batch(args, out=out), 1)
+        self.assertEqual(len(json.loads(out.getvalue())), 3)
+
+    def test_cli_passes_clean_contracts(self):
+        out = io.StringIO()
+        args = cli.build_parser().parse_args(['compile', os.path.join(self.root, 'good.s.py')])
+
+        self.assertEqual(cli.run_batch(args, out=out), 0)
+        self.assertIn('1 contracts, 0 with violations', out.getvalue())
@@ -0,0 +1,177 @@
+from unittest import TestCase
+from contracting.db.driver import ContractDriver, Driver, InMemDriver, COMPILED_KEY
+from contracting.compilation.compiler import ContractingCompiler
+from contracting.execution import bundle
+from contracting.execution.executor import Executor
+from contracting.execution.module import MODULE_CACHE, CONTRACT_METADATA
+from contracting import cli
+import tempfile
+import struct
+import io
+import os
+
+TOKEN = '''
+balances = Hash(default_value=0)
+
+@construct
+def seed():
+    balances['stu'] = 100
+
+@export
+def balance_of(account: str):
+    return balances[account]
+'''
+
+
+class TestBundle(TestCase):
+    def setUp(self):
+        self.d = ContractDriver(driver=InMemDriver())
+        code = ContractingCompiler(module_name='coin').parse_to_code(TOKEN)
+        self.d.set_contract(name='coin', code=code, owner='stu')
+        self.d.set_contract(name='other', code='x = 1')
+        self.d.commit()
+
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+        MODULE_CACHE.clear()
+        CONTRACT_METADATA.clear()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+        MODULE_CACHE.clear()
+        CONTRACT_METADATA.clear()
+
+    def write(self, names=None):
+        with open(self.path, 'wb') as f:
+            return bundle.write_bundle(self.d, f, names=names)
+
+    def test_contracts_are_found(self):
+        self.assertEqual(bundle.contract_names(self.d), ['coin', 'other'])
+
+    def test_finding_contracts_does_not_read_every_key(self):
+        self.d.set_var('coin', 'balances', arguments=['stu'], value=100)
+        self.d.set_var('coins', 'x', value=1)
+        self.d.commit()
+
+        def keys():
+            raise AssertionError('Every key was read.')
+
+        self.d.driver.keys = keys
+
+        self.assertEqual(bundle.contract_names(self.d), ['coin', 'other'])
+
+    def test_round_trip(self):
+        self.assertEqual(self.write(), 2)
+
+        with bundle.Bundle(self.path) as b:
+            self.assertEqual(b.names(), ['coin', 'other'])
+            self.assertEqual(b.metadata('coin')['owner'], 'stu')
+
+            scope = {}
+            exec(b.code('other'), scope)
+            self.assertEqual(scope['x'], 1)
+
+    def test_only_named_contracts_are_written(self):
+        self.write(names=['coin'])
+
+        with bundle.Bundle(self.path) as b:
+            self.assertEqual(b.names(), ['coin'])
+
+    def test_load_fills_caches(self):
+        self.write()
+
+        self.assertEqual(bundle.load_bundle(self.path, self.d), ['coin', 'other'])
+        self.assertEqual(set(MODULE_CACHE), {'other', 'coin'})
+        self.assertEqual(CONTRACT_METADATA['coin']['owner'], 'stu')
+
+    def test_contracts_run_from_the_bundle(self):
+        self.write()
+        bundle.load_bundle(self.path, self.d, names=['coin'])
+
+        self.d.set_var('coin', 'balances', arguments=['stu'], value=100)
+        self.d.commit()
+
+        e = Executor(metering=False, driver=self.d)
+        output = e.execute('stu', 'coin', 'balance_of', kwargs={'account': 'stu'})
+
+        self.assertEqual(output['result'], 100)
+
+    def test_changed_contracts_are_not_loaded(self):
+        self.write()
+
+        self.d.delete_contract('other')
+        self.d.set_contract(name='other', code='x = 2')
+        self.d.commit()
+
+        self.assertEqual(bundle.load_bundle(self.path, self.d), ['coin'])
+        self.assertNotIn('other', MODULE_CACHE)
+        self.assertNotIn('other', CONTRACT_METADATA)
+
+    def test_deleted_contracts_are_not_loaded(self):
+        self.write()
+
+        self.d.delete_contract('coin')
+        self.d.commit()
+
+        self.assertEqual(bundle.load_bundle(self.path, self.d), ['other'])
+        self.assertNotIn('coin', MODULE_CACHE)
+
+    def test_loading_does_not_read_compiled_code(self):
+        self.write()
+
+        get = self.d.driver.get
+
+        def no_compiled_code(key):
+            if key.endswith(COMPILED_KEY):
+                raise AssertionError('{} was read.'.format(key))
+            return get(key)
+
+        self.d.driver.get = no_compiled_code
+
+        self.assertEqual(bundle.load_bundle(self.path, self.d), ['coin', 'other'])
+
+    def test_contracts_not_in_the_bundle_are_refused(self):
+        self.write(names=['coin'])
+
+        with self.assertRaises(bundle.BundleError):
+            bundle.load_bundle(self.path, self.d, names=['coin', 'other'])
+
+        self.assertEqual(MODULE_CACHE, {})
+
+    def test_other_files_are_refused(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a bundle at all')
+
+        with self.assertRaises(bundle.BundleError):
+            bundle.Bundle(self.path)
+
+    def test_bundles_from_other_pythons_are_refused(self):
+        self.write()
+
+        with open(self.path, 'r+b') as f:
+            f.seek(struct.calcsize('<8sI'))
+            f.write(bytes([2, 7]))
+
+        with self.assertRaises(bundle.BundleError):
+            bundle.load_bundle(self.path, self.d)
+
+        self.assertEqual(MODULE_CACHE, {})
+
+    def test_cli_exports_a_database(self):
+        d = ContractDriver(driver=Driver(collection='bundle_test'))
+        d.flush()
+        d.set_contract(name='coin', code=TOKEN)
+        d.commit()
+
+        try:
+            out = io.StringIO()
+            args = cli.build_parser().parse_args(['bundle', self.path, '--collection', 'bundle_test'])
+
+            self.assertEqual(cli.run_bundle(args, out=out), 0)
+
+            with bundle.Bundle(self.path) as b:
+                self.assertEqual(b.names(), ['coin'])
+        finally:
+            d.flush()
@@ -0,0 +1,99 @@
+from unittest import TestCase, skipIf
+from contracting.execution.metering import calibration, costs
+from contracting import cli
+import tempfile
+import json
+import sys
+import io
+import os
+
+TINY = [
+    ('loop', '', 'pass'),
+    ('add', 'a = 1; b = 2', 'x = a + b'),
+    ('dict store', "d = {}", "d['stu'] = 5"),
+]
+
+
+class TestNNLS(TestCase):
+    def test_exact_system_is_solved(self):
+        rows = [{'a': 1}, {'b': 1}, {'a': 1, 'b': 2}]
+        x = calibration.nnls(rows, [3, 4, 11])
+
+        self.assertAlmostEqual(x['a'], 3, places=6)
+        self.assertAlmostEqual(x['b'], 4, places=6)
+
+    def test_solution_is_never_negative(self):
+        rows = [{'a': 1, 'b': 1}, {'a': 1}]
+        x = calibration.nnls(rows, [1, 5])
+
+        self.assertGreaterEqual(x['b'], 0)
+
+    def test_prior_decides_columns_the_rows_cannot_separate(self):
+        rows = [{'a': 1, 'b': 1}]
+        x = calibration.nnls(rows, [10], prior={'a': 8, 'b': 2}, weight=1e-6)
+
+        self.assertAlmostEqual(x['a'], 8, places=3)
+        self.assertAlmostEqual(x['b'], 2, places=3)
+
+
+@skipIf(sys.version_info < (3, 7), 'opcode tracing needs Python 3.7')
+class TestCalibration(TestCase):
+    def test_opcodes_are_counted_per_iteration(self):
+        counts, seconds = calibration.measure('a = 1; b = 2', 'x = a + b', repeat=1)
+        add = 'BINARY_OP' if 'BINARY_OP' in counts else 'BINARY_ADD'
+
+        self.assertEqual(counts[add], 1)
+        self.assertGreaterEqual(seconds, 0)
+
+    def test_counting_restores_previous_trace(self):
+        previous = sys.gettrace()
+        calibration.count_opcodes(calibration.build('', 'pass'), 10)
+
+        self.assertIs(sys.gettrace(), previous)
+
+    def test_candidate_fits_this_interpreter(self):
+        report = calibration.calibrate(workloads=TINY, repeat=1)
+
+        costs.build_table(report.candidate)
+        self.assertEqual(set(report.candidate), set(report.current))
+        self.assertTrue(all(op['candidate'] >= 1 for op in report.opcodes))
+        self.assertEqual([w['name'] for w in report.workloads], ['loop', 'add', 'dict store'])
+
+    def test_written_table_reads_back(self):
+        report = calibration.calibrate(workloads=TINY, repeat=1)
+
+        fd, path = tempfile.mkstemp(suffix='.const')
+        os.close(fd)
+        try:
+            with open(path, 'w') as f:
+                calibration.write_table(report.candidate, f, note='test')
+
+            self.assertEqual(costs.read_costs(path), report.candidate)
+        finally:
+            os.remove(path)
+
+    def test_mispriced_are_sorted_by_how_far_off(self):
+        report = calibration.CalibrationReport({}, {}, [], [
+            {'name': 'A', 'count': 1, 'current': 4, 'candidate': 5},
+            {'name': 'B', 'count': 1, 'current': 40, 'candidate': 5},
+            {'name': 'C', 'count': 1, 'current': 1, 'candidate': 5},
+        ])
+
+        self.assertEqual([op['name'] for op in report.mispriced(2)], ['B', 'C'])
+
+    def test_cli_prints_json_and_writes_table(self):
+        original = calibration.WORKLOADS
+        calibration.WORKLOADS = TINY
+
+        fd, path = tempfile.mkstemp(suffix='.const')
+        os.close(fd)
+        try:
+            out = io.StringIO()
+            args = cli.build_parser().parse_args(['calibrate', '--repeat', '1', '--json', '--output', path])
+
+            self.assertEqual(cli.run_calibrate(args, out=out), 0)
+            self.assertEqual(len(json.loads(out.getvalue())['workloads']), len(TINY))
+            costs.build_table(costs.read_costs(path))
+        finally:
+            calibration.WORKLOADS = original
+            os.remove(path)
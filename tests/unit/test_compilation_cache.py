@@ -0,0 +1,135 @@
+from unittest import TestCase
+from contracting.compilation.cache import CompilationCache, MISSING, cache_key, CODE
+from contracting.compilation.compiler import ContractingCompiler
+import tempfile
+import marshal
+import shutil
+
+TOKEN = '''
+balances = Hash()
+
+@export
+def transfer(to: str, amount: int):
+    balances[to] += amount
+'''
+
+BAD = '''
+import sys
+
+@export
+def f():
+    return _secret
+'''
+
+
+class TestCompilationCache(TestCase):
+    def setUp(self):
+        self.cache = CompilationCache()
+
+    def test_same_code_as_compiler(self):
+        expected = ContractingCompiler(module_name='token').parse_to_code(TOKEN)
+
+        self.assertEqual(self.cache.parse_to_code(TOKEN, module_name='token'), expected)
+        self.assertEqual(self.cache.parse_to_code(TOKEN, module_name='token'), expected)
+
+    def test_resubmission_hits(self):
+        self.cache.parse_to_code(TOKEN, module_name='token')
+        misses = self.cache.misses
+
+        self.cache.parse_to_code(TOKEN, module_name='token')
+
+        self.assertEqual(self.cache.misses, misses)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_other_name_reuses_lint_but_not_code(self):
+        first = self.cache.parse_to_code(TOKEN, module_name='token')
+        second = self.cache.parse_to_code(TOKEN, module_name='coin')
+
+        self.assertNotEqual(first, second)
+        self.assertIn("'coin'", second)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_lint_failures_are_cached_and_raised(self):
+        with self.assertRaises(Exception) as first:
+            self.cache.parse_to_code(BAD, module_name='bad')
+
+        with self.assertRaises(Exception) as second:
+            self.cache.parse_to_code(BAD, module_name='bad')
+
+        self.assertEqual(first.exception.args, second.exception.args)
+        self.assertGreater(self.cache.hits, 0)
+
+    def test_compiled_blob_matches_driver_format(self):
+        code = self.cache.parse_to_code(TOKEN, module_name='token')
+        blob = self.cache.compile(code)
+
+        # The same bytes the driver always stored
+        code_obj = compile(code, '', 'exec')
+        self.assertEqual(blob, marshal.dumps(code_obj))
+        self.assertIs(self.cache.compile(code), blob)
+
+    def test_contract_compiles_its_canonical_source(self):
+        code, blob, _ = self.cache.compile_contract(TOKEN, module_name='token')
+
+        self.assertEqual(code, ContractingCompiler(module_name='token').parse_to_code(TOKEN))
+        self.assertEqual(blob, self.cache.compile(code))
+        self.assertIs(self.cache.compile_contract(TOKEN, module_name='token')[1], blob)
+
+    def test_line_numbers_point_into_the_stored_source(self):
+        code, blob, _ = self.cache.compile_contract('\n\n\n@export\ndef f():\n    return 1\n', module_name='con')
+
+        functions = [c for c in marshal.loads(blob).co_consts if hasattr(c, 'co_firstlineno')]
+        lines = code.splitlines()
+
+        self.assertEqual(len(functions), 1)
+        self.assertTrue(lines[functions[0].co_firstlineno - 1].startswith('@'))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = CompilationCache(size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_keys_depend_on_every_part(self):
+        self.assertNotEqual(cache_key(CODE, TOKEN, 'a'), cache_key(CODE, TOKEN, 'b'))
+        self.assertNotEqual(cache_key(CODE, 'ab', 'c'), cache_key(CODE, 'a', 'bc'))
+
+
+class TestDiskCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_entries_survive_a_new_cache(self):
+        code = CompilationCache(directory=self.directory).parse_to_code(TOKEN, module_name='token')
+
+        fresh = CompilationCache(directory=self.directory)
+
+        self.assertEqual(fresh.parse_to_code(TOKEN, module_name='token'), code)
+        self.assertEqual(fresh.misses, 0)
+
+    def test_lint_result_is_shared_between_names(self):
+        CompilationCache(directory=self.directory).parse_to_code(TOKEN, module_name='token')
+        fresh = CompilationCache(directory=self.directory)
+
+        fresh.parse_to_code(TOKEN, module_name='coin')
+
+        # Only the code for the new name is missing; the lint result is found
+        self.assertEqual(fresh.misses, 1)
+        self.assertEqual(fresh.hits, 1)
+
+    def test_corrupt_entry_is_a_miss(self):
+        cache = CompilationCache(directory=self.directory)
+        cache.put('ab', 'value')
+
+        with open(cache.path('ab'), 'wb') as f:
+            f.write(b'garbage')
+
+        self.assertIs(CompilationCache(directory=self.directory).get('ab'), MISSING)
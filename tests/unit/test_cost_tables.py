@@ -0,0 +1,209 @@
+from unittest import TestCase, skipUnless
+from contracting.execution.metering import costs
+from contracting.execution.metering.tracer import Tracer
+from contracting.execution import runtime
+import tempfile
+import dis
+import sys
+import os
+import glob
+
+# The array tracer.c was compiled with before the tables moved to cu_costs*.const, indexed by opcode as the tracer
+# used it. It was meant to hold the 3.6 prices from cu_costs.const, but entry i held the price of opcode i + 1 up to
+# index 32 and the price of opcode i + 33 from there on.
+C_COSTS = (2, 4, 5, 2, 4, 1000, 1000, 1000, 2, 2, 3, 2, 1000, 1000, 4, 1000, 1000, 1000, 30, 3,
+           1000, 4, 3, 3, 3, 4, 4, 4, 5, 1000, 1000, 1000, 1000, 6, 30, 7, 12, 1000, 1610, 4, 7,
+           1000, 6, 6, 6, 6, 6, 2, 15, 15, 2, 126, 1000, 4, 4, 4, 4, 2, 2, 8, 8, 2, 6, 6, 4, 4,
+           1000, 2, 2, 2, 5, 8, 7, 4, 4, 38, 126, 4, 4, 4, 4, 4, 4, 3, 1000, 1000, 2, 4, 2, 3,
+           1000, 2, 2, 2, 1000, 1000, 1000, 5, 9, 7, 12, 1000, 7, 2, 2, 2, 1000, 1000, 12, 12, 15,
+           2, 8, 8, 5, 2, 5, 7, 9, 2, 8, 15, 30, 7, 8, 4)
+
+# Opcodes contracts run all the time, with what the C array charged for them on 3.6 and what every table charges now
+REPRICED = {
+    'POP_TOP': (4, 2),
+    'RETURN_VALUE': (3, 2),
+    'COMPARE_OP': (1000, 4),
+    'LOAD_CONST': (12, 2),
+    'LOAD_NAME': (1000, 2),
+    'LOAD_ATTR': (1000, 4),
+    'LOAD_GLOBAL': (5, 3),
+    'LOAD_FAST': (8, 2),
+    'STORE_FAST': (4, 2),
+    'BUILD_LIST': (2, 5),
+    'FOR_ITER': (2, 8),
+    'CALL_FUNCTION': (4, 9),
+    'MAKE_FUNCTION': (8, 7),
+}
+
+
+def shipped_tables():
+    return sorted(glob.glob(os.path.join(costs.COSTS_PATH, 'cu_costs*.const')))
+
+
+def c_cost(opcode):
+    # What the old tracer charged: bytes past 127 were read as signed, then negated
+    if opcode >= 128:
+        opcode = 256 - opcode
+    return C_COSTS[opcode] if opcode < len(C_COSTS) else costs.UNKNOWN_COST
+
+
+class TestCostTables(TestCase):
+    def setUp(self):
+        self.env = os.environ.pop(costs.COSTS_FILE_ENV, None)
+
+        fd, self.path = tempfile.mkstemp(suffix='.const')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+        os.environ.pop(costs.COSTS_FILE_ENV, None)
+        if self.env is not None:
+            os.environ[costs.COSTS_FILE_ENV] = self.env
+
+    def write(self, text):
+        with open(self.path, 'w') as f:
+            f.write(text)
+
+    def test_table_for_this_interpreter_is_picked(self):
+        name = os.path.basename(costs.cost_file())
+        versioned = 'cu_costs.{}.{}.const'.format(*sys.version_info[:2])
+
+        self.assertIn(name, (versioned, costs.DEFAULT_COSTS_FILE))
+
+    def test_unknown_version_falls_back_to_default(self):
+        self.assertEqual(os.path.basename(costs.cost_file((2, 7))), costs.DEFAULT_COSTS_FILE)
+
+    def test_environment_overrides_table(self):
+        os.environ[costs.COSTS_FILE_ENV] = self.path
+        self.assertEqual(costs.cost_file(), self.path)
+
+    def test_shipped_table_prices_every_opcode(self):
+        table = costs.read_costs(costs.cost_file())
+
+        self.assertEqual(costs.unpriced(table), [])
+        costs.build_table(table)
+
+    def test_versioned_tables_keep_the_3_6_prices(self):
+        base = costs.read_costs(os.path.join(costs.COSTS_PATH, costs.DEFAULT_COSTS_FILE))
+
+        for path in shipped_tables():
+            table = costs.read_costs(path)
+            changed = {name: (base[name], cost) for name, cost in table.items() if name in base and base[name] != cost}
+
+            self.assertEqual(changed, {}, path)
+
+    def test_repriced_opcodes(self):
+        for path in shipped_tables():
+            table = costs.read_costs(path)
+
+            for name, (_, cost) in REPRICED.items():
+                if name in table:
+                    self.assertEqual(table[name], cost, '{} in {}'.format(name, path))
+
+    @skipUnless(sys.version_info[:2] == (3, 6), 'The C array was indexed by 3.6 opcode numbers.')
+    def test_3_6_table_against_the_c_array(self):
+        table = costs.load_costs(os.path.join(costs.COSTS_PATH, costs.DEFAULT_COSTS_FILE))
+
+        # The entries the array did hold, put back on the opcodes they were meant for
+        for i, cost in enumerate(C_COSTS):
+            opcode = i + 1 if i < 33 else i + 33
+            self.assertEqual(table[opcode], cost, dis.opname[opcode])
+
+        for name, (old, _) in REPRICED.items():
+            self.assertEqual(c_cost(dis.opmap[name]), old, name)
+
+    def test_table_is_indexed_by_opcode_number(self):
+        self.write('# comment\nLOAD_CONST,7\n\nRETURN_VALUE, 9  # trailing comment\n')
+        table = costs.load_costs(self.path)
+
+        self.assertEqual(len(table), costs.TABLE_SIZE)
+        self.assertEqual(table[dis.opmap['LOAD_CONST']], 7)
+        self.assertEqual(table[dis.opmap['RETURN_VALUE']], 9)
+        self.assertEqual(table[dis.opmap['POP_TOP']], costs.UNKNOWN_COST)
+
+    def test_names_from_other_versions_are_rejected(self):
+        self.write('LOAD_CONST,2\nNOT_AN_OPCODE,2\n')
+
+        with self.assertRaises(costs.CostTableError):
+            costs.load_costs(self.path)
+
+    def test_malformed_lines_are_rejected(self):
+        for text in ('LOAD_CONST\n', 'LOAD_CONST,two\n', 'LOAD_CONST,-1\n', 'LOAD_CONST,1\nLOAD_CONST,2\n'):
+            self.write(text)
+            with self.assertRaises(costs.CostTableError):
+                costs.read_costs(self.path)
+
+    def test_cost_table_names_opcodes(self):
+        table = costs.load_costs()
+
+        self.assertEqual(costs.cost_table(table)['LOAD_CONST'], table[dis.opmap['LOAD_CONST']])
+
+
+class TestTracerCosts(TestCase):
+    def test_new_tracers_charge_unknown_cost(self):
+        self.assertEqual(set(Tracer().get_costs()), {costs.UNKNOWN_COST})
+
+    def test_set_costs_round_trips(self):
+        t = Tracer()
+        t.set_costs([5, 6, 7])
+
+        table = t.get_costs()
+
+        self.assertEqual(table[:3], [5, 6, 7])
+        self.assertEqual(table[3], costs.UNKNOWN_COST)
+
+    def test_set_costs_rejects_bad_tables(self):
+        t = Tracer()
+
+        with self.assertRaises(ValueError):
+            t.set_costs([1] * (costs.TABLE_SIZE + 1))
+
+        with self.assertRaises(OverflowError):
+            t.set_costs([-1])
+
+        with self.assertRaises(TypeError):
+            t.set_costs(5)
+
+    def test_costs_cannot_change_while_running(self):
+        t = Tracer()
+        t.set_mode(2)
+        t.set_stamp(1000)
+        t.start()
+
+        try:
+            with self.assertRaises(RuntimeError):
+                t.set_costs([1])
+        finally:
+            t.stop()
+
+    @skipUnless(sys.version_info >= (3, 7), 'Opcode tracing requires Python 3.7 or newer.')
+    def test_high_opcodes_are_charged_as_themselves(self):
+        scope = {'__contract__': True}
+        exec('def f(n):\n    return [i for i in range(n)]\n', scope)
+
+        # RESUME runs before a frame's opcode events are switched on, so it is never charged
+        opcodes = {i.opcode for i in dis.get_instructions(scope['f']) if i.opname != 'RESUME'}
+        high = {opcode for opcode in opcodes if opcode >= 128 and 256 - opcode not in opcodes}
+        if not high:
+            self.skipTest('No opcodes past 127 on this interpreter.')
+
+        # Bytes past 127 used to be read as signed and charged as 256 - opcode
+        table = [0] * costs.TABLE_SIZE
+        for opcode in high:
+            table[opcode] = 1
+            table[256 - opcode] = 1000
+
+        t = Tracer()
+        t.set_costs(table)
+        t.set_mode(1)
+        t.set_stamp(10 ** 9)
+        t.start()
+        scope['f'](3)
+        t.stop()
+
+        self.assertGreater(t.get_stamp_used(), 0)
+        self.assertLess(t.get_stamp_used(), 1000)
+
+    def test_runtimes_load_the_table(self):
+        self.assertEqual(runtime.Runtime().tracer.get_costs(), costs.load_costs())
@@ -0,0 +1,239 @@
+from unittest import TestCase
+from contracting.execution.ingestion import IngestionService, ServiceClosed
+import asyncio
+import time
+
+
+class FakeExecutor:
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = []
+
+    def execute(self, sender, contract_name, function_name, kwargs, **options):
+        if self.delay:
+            time.sleep(self.delay)
+
+        self.calls.append((sender, contract_name, function_name, kwargs))
+
+        if function_name == 'explode':
+            raise ValueError('boom')
+
+        return {
+            'status_code': 1 if function_name == 'fail' else 0,
+            'result': kwargs.get('n'),
+            'stamps_used': 1,
+            'writes': {},
+            'reads': set()
+        }
+
+
+class TestIngestionService(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_execute_resolves_with_executor_output(self):
+        executor = FakeExecutor()
+
+        async def go():
+            async with IngestionService(executor) as service:
+                return await service.execute('stu', 'con', 'func', kwargs={'n': 5})
+
+        output = self.run_async(go())
+
+        self.assertEqual(output['status_code'], 0)
+        self.assertEqual(output['result'], 5)
+        self.assertEqual(executor.calls, [('stu', 'con', 'func', {'n': 5})])
+
+    def test_transactions_are_batched_up_to_batch_size(self):
+        executor = FakeExecutor()
+        service = IngestionService(executor, batch_size=10, batch_timeout=0.2)
+
+        async def go():
+            await service.start()
+            futures = [service.submit_nowait('stu', 'con', 'func', kwargs={'n': i}) for i in range(25)]
+            outputs = await asyncio.gather(*futures)
+            await service.stop()
+            return outputs
+
+        outputs = self.run_async(go())
+
+        self.assertEqual([o['result'] for o in outputs], list(range(25)))
+        self.assertEqual(service.metrics()['batches'], 3)
+
+    def test_deadline_closes_partial_batch(self):
+        executor = FakeExecutor()
+        service = IngestionService(executor, batch_size=100, batch_timeout=0.01)
+
+        async def go():
+            await service.start()
+            output = await service.execute('stu', 'con', 'func', kwargs={'n': 1})
+            await service.stop()
+            return output
+
+        start = time.monotonic()
+        output = self.run_async(go())
+
+        self.assertEqual(output['result'], 1)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(service.metrics()['batches'], 1)
+
+    def test_submit_nowait_raises_when_queue_full(self):
+        executor = FakeExecutor()
+        service = IngestionService(executor, max_queue=2)
+
+        async def go():
+            await service.start()
+            futures = [service.submit_nowait('stu', 'con', 'func', kwargs={'n': i}) for i in range(2)]
+            with self.assertRaises(asyncio.QueueFull):
+                service.submit_nowait('stu', 'con', 'func', kwargs={'n': 2})
+            await asyncio.gather(*futures)
+            await service.stop()
+
+        self.run_async(go())
+
+        self.assertEqual(service.metrics()['rejected'], 1)
+        self.assertEqual(service.metrics()['max_queue_depth'], 2)
+
+    def test_submit_waits_for_room(self):
+        executor = FakeExecutor(delay=0.001)
+        service = IngestionService(executor, max_queue=4, batch_size=2)
+
+        async def go():
+            await service.start()
+            futures = []
+            for i in range(20):
+                futures.append(await service.submit('stu', 'con', 'func', kwargs={'n': i}))
+                self.assertLessEqual(service.metrics()['queue_depth'], 4)
+            outputs = await asyncio.gather(*futures)
+            await service.stop()
+            return outputs
+
+        outputs = self.run_async(go())
+
+        self.assertEqual([o['result'] for o in outputs], list(range(20)))
+
+    def test_failures_are_counted_and_do_not_fail_the_batch(self):
+        executor = FakeExecutor()
+        service = IngestionService(executor, batch_size=3, batch_timeout=0.2)
+
+        async def go():
+            await service.start()
+            ok = service.submit_nowait('stu', 'con', 'func', kwargs={'n': 1})
+            failed = service.submit_nowait('stu', 'con', 'fail', kwargs={})
+            raised = service.submit_nowait('stu', 'con', 'explode', kwargs={})
+
+            self.assertEqual((await ok)['status_code'], 0)
+            self.assertEqual((await failed)['status_code'], 1)
+            with self.assertRaises(ValueError):
+                await raised
+
+            await service.stop()
+
+        self.run_async(go())
+
+        metrics = service.metrics()
+        self.assertEqual(metrics['completed'], 3)
+        self.assertEqual(metrics['failed'], 2)
+        self.assertEqual(metrics['batches'], 1)
+
+    def test_executors_are_spread_across_workers(self):
+        executors = [FakeExecutor(delay=0.01), FakeExecutor(delay=0.01)]
+        service = IngestionService(executors, batch_size=1)
+
+        async def go():
+            await service.start()
+            futures = [service.submit_nowait('stu', 'con', 'func', kwargs={'n': i}) for i in range(10)]
+            await asyncio.gather(*futures)
+            await service.stop()
+
+        self.run_async(go())
+
+        self.assertTrue(all(e.calls for e in executors))
+        self.assertEqual(sum(len(e.calls) for e in executors), 10)
+
+    def test_stop_drains_queue_and_rejects_new_transactions(self):
+        executor = FakeExecutor()
+        service = IngestionService(executor, batch_size=4, batch_timeout=0.2)
+
+        async def go():
+            await service.start()
+            futures = [service.submit_nowait('stu', 'con', 'func', kwargs={'n': i}) for i in range(6)]
+            await service.stop()
+
+            self.assertTrue(all(f.done() for f in futures))
+
+            with self.assertRaises(ServiceClosed):
+                await service.submit('stu', 'con', 'func', kwargs={})
+
+        self.run_async(go())
+
+        self.assertEqual(len(executor.calls), 6)
+        self.assertEqual(service.metrics()['rejected'], 1)
+
+    def test_executors_are_not_shared_between_workers(self):
+        with self.assertRaises(AssertionError):
+            IngestionService(FakeExecutor(), workers=2)
+
+    def test_thread_safe_executor_serves_every_worker(self):
+        executor = FakeExecutor()
+        executor.thread_safe = True
+
+        service = IngestionService(executor, workers=3)
+
+        self.assertEqual(service.executors, [executor] * 3)
+
+    def test_executor_is_released_when_its_batch_returns(self):
+        executor = FakeExecutor(delay=0.3)
+        service = IngestionService(executor)
+
+        async def go():
+            await service.start()
+
+            future = service.submit_nowait('stu', 'con', 'func', kwargs={'n': 1})
+            await asyncio.sleep(0.05)
+
+            # Cancelling the dispatch doesn't stop the batch, so the executor is still in use
+            for task in list(service._running):
+                task.cancel()
+            await asyncio.sleep(0.05)
+
+            self.assertTrue(future.cancelled())
+            self.assertEqual(service._idle.qsize(), 0)
+
+            await asyncio.sleep(0.4)
+            self.assertEqual(service._idle.qsize(), 1)
+
+            await asyncio.wait_for(service.stop(), 1)
+
+        self.run_async(go())
+
+        self.assertEqual(len(executor.calls), 1)
+
+    def test_batch_that_cannot_run_fails_its_transactions(self):
+        executor = FakeExecutor()
+        service = IngestionService(executor)
+
+        async def go():
+            await service.start()
+
+            # A pool that has been shut down refuses the batch outright
+            service._pool.shutdown(wait=True)
+
+            future = service.submit_nowait('stu', 'con', 'func', kwargs={'n': 1})
+            with self.assertRaises(RuntimeError):
+                await future
+
+            await asyncio.wait_for(service.stop(), 1)
+
+        self.run_async(go())
+
+        self.assertEqual(executor.calls, [])
+        self.assertEqual(service.metrics()['failed'], 1)
@@ -0,0 +1,170 @@
+from unittest import TestCase
+from contracting.compilation.instrumenter import MeteringInstrumenter, instrument, compile_instrumented, METER_NAME
+from contracting.compilation.compiler import ContractingCompiler
+from contracting.execution.metering.tracer import Tracer, MODE_INSTRUMENTED
+import ast
+import sys
+
+
+def run(source, function, *args):
+    charges = []
+    scope = {METER_NAME: charges.append}
+
+    exec(compile_instrumented(source), scope)
+    result = scope[function](*args)
+
+    return result, charges
+
+
+LOOPS = '''
+def loop(n):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+def spin(n):
+    while n > 0:
+        n -= 1
+    return n
+
+def squares(n):
+    return [i * i for i in range(n) if i % 2]
+
+def pairs(n):
+    return {i: j for i in range(n) for j in range(2)}
+'''
+
+
+class TestMeteringInstrumenter(TestCase):
+    def test_instrumented_code_returns_same_results(self):
+        scope = {}
+        exec(LOOPS, scope)
+
+        for name in ('loop', 'spin', 'squares', 'pairs'):
+            result, _ = run(LOOPS, name, 10)
+            self.assertEqual(result, scope[name](10))
+
+    def test_every_charge_is_positive_or_zero(self):
+        _, charges = run(LOOPS, 'loop', 10)
+        self.assertTrue(all(c >= 0 for c in charges))
+        self.assertGreater(sum(charges), 0)
+
+    def test_for_loops_charge_per_iteration(self):
+        _, short = run(LOOPS, 'loop', 10)
+        _, long = run(LOOPS, 'loop', 100)
+
+        self.assertEqual(len(long) - len(short), 90)
+
+    def test_while_loops_charge_per_iteration(self):
+        _, short = run(LOOPS, 'spin', 10)
+        _, long = run(LOOPS, 'spin', 100)
+
+        self.assertEqual(len(long) - len(short), 90)
+
+    def test_comprehensions_charge_per_iteration(self):
+        _, short = run(LOOPS, 'squares', 10)
+        _, long = run(LOOPS, 'squares', 100)
+
+        # One charge per iteration, and one more for each element that passes the filter
+        self.assertEqual(len(long) - len(short), 90 + 45)
+
+    def test_nested_comprehensions_charge_inner_iterations(self):
+        _, short = run(LOOPS, 'pairs', 10)
+        _, long = run(LOOPS, 'pairs', 100)
+
+        self.assertGreater(len(long), len(short) * 5)
+
+    def test_lambdas_charge_per_call(self):
+        source = '''
+def apply(n):
+    f = lambda x: x + 1
+    return [f(i) for i in range(n)]
+'''
+        result, charges = run(source, 'apply', 3)
+
+        self.assertEqual(result, [1, 2, 3])
+        self.assertGreater(len(charges), 3 * 2)
+
+    def test_docstrings_are_kept(self):
+        source = '''
+def documented():
+    """Does nothing."""
+    return 1
+'''
+        scope = {METER_NAME: lambda cost: None}
+        exec(compile_instrumented(source), scope)
+
+        self.assertEqual(scope['documented'].__doc__, 'Does nothing.')
+
+    def test_module_body_is_charged(self):
+        tree = instrument('a = 1\nb = 2\n')
+
+        self.assertIsInstance(tree.body[0], ast.Expr)
+        self.assertEqual(tree.body[0].value.func.id, METER_NAME)
+
+    def test_costs_come_from_cost_table(self):
+        cheap = MeteringInstrumenter(costs=[1] * 256)
+        dear = MeteringInstrumenter(costs=[10] * 256)
+
+        cheap_tree = cheap.instrument(ast.parse('a = 1\n'))
+        dear_tree = dear.instrument(ast.parse('a = 1\n'))
+
+        self.assertEqual(dear_tree.body[0].value.args[0].n, cheap_tree.body[0].value.args[0].n * 10)
+
+    def test_global_declarations_are_free(self):
+        source = '''
+def setter():
+    global x
+    x = 5
+'''
+        scope = {METER_NAME: lambda cost: None}
+        exec(compile_instrumented(source), scope)
+        scope['setter']()
+
+        self.assertEqual(scope['x'], 5)
+
+    def test_compiler_can_instrument(self):
+        code = ContractingCompiler(module_name='stu').compile('''
+@export
+def f():
+    return 1
+''', lint=False, instrument=True)
+
+        self.assertIn(METER_NAME, code.co_names)
+
+
+class TestInstrumentedTracer(TestCase):
+    def test_instrumented_mode_does_not_install_trace(self):
+        t = Tracer()
+        t.set_mode(MODE_INSTRUMENTED)
+        t.set_stamp(1000)
+        t.start()
+
+        trace = sys.gettrace()
+
+        t.add_cost(100)
+        t.stop()
+
+        self.assertIsNone(trace)
+        self.assertEqual(t.get_stamp_used(), 100)
+
+    def test_unbounded_loop_runs_out_of_stamps(self):
+        source = '''
+def forever():
+    i = 0
+    while True:
+        i += 1
+'''
+        t = Tracer()
+        t.set_mode(MODE_INSTRUMENTED)
+        t.set_stamp(100000)
+        t.start()
+
+        scope = {METER_NAME: t.add_cost}
+        exec(compile_instrumented(source), scope)
+
+        with self.assertRaises(AssertionError):
+            scope['forever']()
+
+        self.assertFalse(t.is_started())
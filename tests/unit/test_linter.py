@@ -241,29 +241,6 @@ def a():
         self.assertEqual(chk, ['Line 0: S13- No valid contracting decorator found'])
         self.assertFalse(self.l._is_one_export)
 
-    def test_collect_function_defs(self):
-        code = '''
-@export
-def a():
-    return 42
-
-@export
-def b():
-    return 1000000
-
-@export
-def x():
-    return 64
-
-@export
-def y():
-    return 24
-'''
-        c = ast.parse(code)
-        self.l._collect_function_defs(c)
-        self.l.dump_violations()
-        self.assertEqual(self.l._functions, ['a', 'b', 'x', 'y'])
-
     def test_assignment_of_import(self):
         code = '''
 import import_this
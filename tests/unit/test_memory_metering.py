@@ -0,0 +1,107 @@
+from unittest import TestCase
+from contracting.execution.metering.tracer import Tracer, MODE_INSTRUMENTED
+import threading
+
+MB = 1024 * 1024
+
+
+def metered(limit):
+    t = Tracer()
+    t.set_mode(MODE_INSTRUMENTED)
+    t.set_stamp(10 ** 12)
+    t.set_memory_limit(limit)
+    return t
+
+
+class TestMemoryMetering(TestCase):
+    def test_allocations_past_limit_raise_memory_error(self):
+        t = metered(10 * MB)
+        t.start()
+
+        try:
+            with self.assertRaises(MemoryError):
+                b'a' * (20 * MB)
+        finally:
+            t.stop()
+
+        self.assertTrue(t.get_memory()['exceeded'])
+
+    def test_allocations_under_limit_are_counted(self):
+        t = metered(10 * MB)
+        t.start()
+        data = b'a' * MB
+        t.stop()
+
+        memory = t.get_memory()
+
+        self.assertGreaterEqual(memory['peak'], MB)
+        self.assertGreaterEqual(memory['live'], MB)
+        self.assertFalse(memory['exceeded'])
+        self.assertEqual(len(data), MB)
+
+    def test_freed_blocks_do_not_count_towards_limit(self):
+        t = metered(3 * MB)
+        t.start()
+        for _ in range(100):
+            data = b'a' * MB
+        t.stop()
+
+        memory = t.get_memory()
+
+        self.assertFalse(memory['exceeded'])
+        self.assertLess(memory['peak'], 3 * MB)
+        self.assertGreater(memory['allocated'], 100 * MB)
+
+    def test_memory_is_not_charged_for(self):
+        t = metered(10 * MB)
+        t.start()
+        data = b'a' * MB
+        t.stop()
+
+        self.assertEqual(t.get_stamp_used(), 0)
+
+    def test_no_limit_meters_nothing(self):
+        t = metered(0)
+        t.start()
+        data = b'a' * MB
+        t.stop()
+
+        self.assertEqual(t.get_memory()['allocated'], 0)
+
+    def test_other_threads_are_not_charged(self):
+        results = []
+
+        t = metered(MB)
+        t.start()
+
+        thread = threading.Thread(target=lambda: results.append(b'a' * (10 * MB)))
+        thread.start()
+        thread.join()
+
+        t.stop()
+
+        self.assertEqual(len(results[0]), 10 * MB)
+        self.assertFalse(t.get_memory()['exceeded'])
+
+    def test_stopped_tracer_does_not_meter(self):
+        t = metered(MB)
+        t.start()
+        t.stop()
+
+        data = b'a' * (10 * MB)
+
+        self.assertEqual(len(data), 10 * MB)
+
+    def test_limit_cannot_change_while_running(self):
+        t = metered(MB)
+        t.start()
+
+        try:
+            with self.assertRaises(RuntimeError):
+                t.set_memory_limit(2 * MB)
+        finally:
+            t.stop()
+
+    def test_limit_takes_no_cost(self):
+        with self.assertRaises(TypeError):
+            Tracer().set_memory_limit(MB, 1)
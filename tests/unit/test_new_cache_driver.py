@@ -32,6 +32,15 @@ class TestCacheDriver(TestCase):
         self.c.get('thing')
         self.assertEqual(self.c.get('thing'), 8999)
 
+    def test_peek_does_not_read(self):
+        self.d.set('thing', 8999)
+        self.c.set('other', 1234)
+
+        self.assertEqual(self.c.peek('thing'), 8999)
+        self.assertEqual(self.c.peek('other'), 1234)
+        self.assertEqual(self.c.reads, set())
+        self.assertNotIn('thing', self.c.cache)
+
     def test_commit_puts_all_objects_in_pending_writes_to_db(self):
         self.c.set('thing1', 1234)
         self.c.set('thing2', 1235)
@@ -279,6 +279,155 @@ class TestContractDriver(TestCase):
 
         self.assertDictEqual(items, kvs_2)
 
+    def test_iter_items_merges_cache_and_db_in_order(self):
+        for k in ['p_a', 'p_c', 'p_e', 'q_a']:
+            self.c.driver.set(k, k.upper())
+
+        self.c.set('p_b', 'new')
+        self.c.set('p_c', 'changed')
+        self.c.set('p_e', None)
+
+        items = list(self.c.iter_items('p_', batch_size=2))
+
+        self.assertListEqual(items, [('p_a', 'P_A'), ('p_b', 'new'), ('p_c', 'changed')])
+        self.assertEqual(self.c.reads, {'p_a'})
+
+    def test_iter_items_pages(self):
+        for i in range(10):
+            self.c.driver.set('p_{}'.format(i), i)
+        self.c.set('p_45', 45)
+
+        self.assertListEqual(list(self.c.iter_items('p_', start_after='p_3', limit=3, batch_size=2)),
+                             [('p_4', 4), ('p_45', 45), ('p_5', 5)])
+
+        self.assertListEqual(list(self.c.iter_items('p_', start_after='p_8', batch_size=1)), [('p_9', 9)])
+
+    def test_iter_items_only_reads_what_it_yields(self):
+        for i in range(10):
+            self.c.driver.set('p_{}'.format(i), i)
+
+        items = self.c.iter_items('p_', batch_size=4)
+        self.assertEqual(next(items), ('p_0', 0))
+
+        self.assertEqual(self.c.reads, {'p_0'})
+
+    def test_delete_prefix_hides_keys_until_commit(self):
+        for k in ['p_a', 'p_b', 'q_a']:
+            self.c.driver.set(k, k)
+
+        self.c.set('p_c', 'before')
+        self.c.delete_prefix('p_')
+        self.c.set('p_b', 'after')
+
+        self.assertIsNone(self.c.get('p_a'))
+        self.assertEqual(self.c.get('p_b'), 'after')
+        self.assertIsNone(self.c.get('p_c'))
+        self.assertDictEqual(self.c.items('p_'), {'p_b': 'after'})
+        self.assertListEqual(list(self.c.iter_items('p_')), [('p_b', 'after')])
+
+        # Nothing is deleted in the database until commit
+        self.assertEqual(self.c.driver.get('p_a'), 'p_a')
+
+        self.c.commit()
+
+        self.assertListEqual(self.c.driver.keys(), ['p_b', 'q_a'])
+        self.assertEqual(self.c.driver.get('p_b'), 'after')
+
+    def test_delete_prefix_is_only_committed_once(self):
+        self.c.driver.set('p_a', 1)
+
+        self.c.delete_prefix('p_')
+        self.c.commit()
+
+        self.assertListEqual(self.c.pending_deletes, [])
+
+        # Written after the range was deleted, by something other than this driver
+        self.c.driver.set('p_b', 2)
+        self.c.commit()
+
+        self.assertEqual(self.c.driver.get('p_b'), 2)
+        self.assertIsNone(self.c.get('p_a'))
+
+    def test_delete_prefix_is_forgotten_with_pending_state(self):
+        self.c.driver.set('p_a', 1)
+
+        self.c.delete_prefix('p_')
+        self.c.delete_prefix('p_a')
+        self.assertListEqual(self.c.pending_deletes, ['p_'])
+
+        self.c.clear_pending_state()
+
+        self.assertEqual(self.c.get('p_a'), 1)
+
+    def test_delete_contract_leaves_other_contracts(self):
+        self.c.set_contract(name='test', code='a = 1')
+        self.c.set_contract(name='test2', code='a = 2')
+        self.c.commit()
+
+        self.c.delete_contract('test')
+
+        self.assertIsNone(self.c.get_contract('test'))
+        self.assertEqual(self.c.get_contract('test2'), 'a = 2')
+        self.assertListEqual([k for k in self.c.driver.keys() if k.startswith('test.')], [])
+
+    def test_add_leaves_a_delta_without_reading(self):
+        self.c.driver.set('n', 10)
+
+        self.c.add('n', 5)
+        self.c.add('n', -2)
+        self.c.add('m', 1.5)
+
+        self.assertEqual(self.c.reads, set())
+        self.assertEqual(self.c.pending_writes, {})
+        self.assertEqual(self.c.pending_deltas, {'n': 3, 'm': 1.5})
+
+        self.c.commit()
+        self.c.commit()
+
+        self.assertEqual(self.c.driver.get('n'), 13)
+        self.assertEqual(self.c.driver.get('m'), 1.5)
+        self.assertEqual(self.c.pending_deltas, {})
+
+    def test_reading_sums_the_deltas_into_a_write(self):
+        self.c.driver.set('n', 10)
+
+        self.c.add('n', 5)
+        self.assertEqual(self.c.get('n'), 15)
+        self.assertEqual(self.c.pending_writes, {'n': 15})
+
+        # Once read, adding is an ordinary write
+        self.c.add('n', 1)
+        self.assertEqual(self.c.pending_writes, {'n': 16})
+        self.assertEqual(self.c.pending_deltas, {})
+
+    def test_writes_and_deletes_replace_deltas(self):
+        self.c.driver.set('p_n', 10)
+
+        self.c.add('p_n', 5)
+        self.c.set('p_n', 1)
+        self.c.add('p_m', 5)
+        self.c.add('p_o', 5)
+        self.c.delete_prefix('p_o')
+
+        self.assertEqual(self.c.pending_deltas, {'p_m': 5})
+        self.assertEqual(self.c.get('p_m'), 5)
+
+        self.c.commit()
+        self.assertEqual(self.c.driver.get('p_n'), 1)
+        self.assertIsNone(self.c.driver.get('p_o'))
+
+    def test_iterating_includes_keys_only_added_to(self):
+        self.c.driver.set('p_a', 1)
+        self.c.add('p_a', 1)
+        self.c.add('p_b', 2)
+
+        self.assertDictEqual(self.c.items('p_'), {'p_a': 2, 'p_b': 2})
+
+        self.c.clear_pending_state()
+        self.c.add('p_b', 2)
+
+        self.assertListEqual(list(self.c.iter_items('p_')), [('p_a', 1), ('p_b', 2)])
+
     def test_make_key_no_args(self):
         c = 'stubucks'
         v = 'balances'
@@ -381,3 +530,10 @@ print('hello, world!')
         self.assertEqual(self.c.get_owner('test'), 'something')
         self.assertEqual(self.c.get_time_submitted('test'), time)
 
+    def test_set_contract_keeps_given_compiled_code(self):
+        code_blob = marshal.dumps(compile('a = 1', '', 'exec'))
+
+        self.c.set_contract(name='test', code='a = 2', owner='something', compiled=code_blob)
+
+        self.assertEqual(self.c.get_contract('test'), 'a = 2')
+        self.assertEqual(self.c.get_compiled('test'), code_blob)
@@ -251,6 +251,39 @@ class TestDriver(TestCase):
         self.assertListEqual(keys, got_keys)
 
 
+    def test_bytes_are_stored_as_binary(self):
+        self.d.set('b', b'\x00\xffcompiled')
+
+        self.assertEqual(self.d.get('b'), b'\x00\xffcompiled')
+        self.assertEqual(self.d.db.find_one({'_id': 'b'})['v'], b'\x00\xffcompiled')
+
+    def test_bytes_stored_as_hex_still_decode(self):
+        self.d.db.update_one({'_id': 'b'}, {'$set': {'v': '{"__bytes__":"00ff"}'}}, upsert=True)
+
+        self.assertEqual(self.d.get('b'), b'\x00\xff')
+
+    def test_iter_starts_after_a_key(self):
+        for k in ['b1', 'b2', 'b3', 'b4', 'c1']:
+            self.d.set(k, k)
+
+        self.assertListEqual(self.d.iter(prefix='b', start_after='b2'), ['b3', 'b4'])
+        self.assertListEqual(self.d.iter(prefix='b', length=1, start_after='b2'), ['b3'])
+        self.assertListEqual(self.d.iter(prefix='b', start_after='b4'), [])
+
+    def test_get_many_returns_existing_keys(self):
+        self.d.set('a', 1)
+        self.d.set('b', {'x': 2})
+
+        self.assertDictEqual(self.d.get_many(['a', 'b', 'c']), {'a': 1, 'b': {'x': 2}})
+
+    def test_delete_prefix_deletes_only_keys_under_it(self):
+        for k in ['a.b:1', 'a.b:2', 'a.bc', 'aXb:1', 'c']:
+            self.d.set(k, k)
+
+        self.d.delete_prefix('a.b:')
+
+        self.assertListEqual(self.d.keys(), ['a.bc', 'aXb:1', 'c'])
+
 class TestInMemDriver(TestCase):
     # Flush this sucker every test
     def setUp(self):
@@ -497,3 +530,36 @@ class TestInMemDriver(TestCase):
         got_keys = self.d.keys()
 
         self.assertListEqual(keys, got_keys)
+
+    def test_bytes_are_stored_as_binary(self):
+        self.d.set('b', b'\x00\xffcompiled')
+
+        self.assertEqual(self.d.get('b'), b'\x00\xffcompiled')
+        self.assertEqual(len(self.d.db[b'b']), len(b'\x00\xffcompiled') + 1)
+
+    def test_bytes_stored_as_hex_still_decode(self):
+        self.d.db[b'b'] = b'{"__bytes__":"00ff"}'
+
+        self.assertEqual(self.d.get('b'), b'\x00\xff')
+
+    def test_iter_starts_after_a_key(self):
+        for k in ['b1', 'b2', 'b3', 'b4', 'c1']:
+            self.d.set(k, k)
+
+        self.assertListEqual(self.d.iter(prefix='b', start_after='b2'), ['b3', 'b4'])
+        self.assertListEqual(self.d.iter(prefix='b', length=1, start_after='b2'), ['b3'])
+        self.assertListEqual(self.d.iter(prefix='b', start_after='b4'), [])
+
+    def test_get_many_returns_existing_keys(self):
+        self.d.set('a', 1)
+        self.d.set('b', {'x': 2})
+
+        self.assertDictEqual(self.d.get_many(['a', 'b', 'c']), {'a': 1, 'b': {'x': 2}})
+
+    def test_delete_prefix_deletes_only_keys_under_it(self):
+        for k in ['a.b:1', 'a.b:2', 'a.bc', 'aXb:1', 'c']:
+            self.d.set(k, k)
+
+        self.d.delete_prefix('a.b:')
+
+        self.assertListEqual(self.d.keys(), ['a.bc', 'aXb:1', 'c'])
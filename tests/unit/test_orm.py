@@ -1,6 +1,8 @@
 from unittest import TestCase
 from contracting.db.driver import ContractDriver
-from contracting.db.orm import Datum, Variable, ForeignHash, ForeignVariable, Hash
+from contracting.db.orm import Datum, Variable, ForeignHash, ForeignVariable, Hash, OrderedHash, Counter, order_key
+from contracting.stdlib.bridge.decimal import ContractingDecimal
+from contracting.stdlib.env import gather
 # from contracting.stdlib.env import gather
 
 # Variable = gather()['Variable']
@@ -279,6 +281,165 @@ class TestHash(TestCase):
 
         self.assertEqual(h['hello'], 0)
 
+    def test_fast_accessors_use_the_same_keys_as_subscripts(self):
+        h = Hash('blah', 'scoob', driver=driver, default_value=0)
+
+        h._set_key(123, 'stu')
+        h._set_parts(1000, 'stu', 'raghu')
+        h._set_parts(5, 7)
+
+        self.assertEqual(driver.get('blah.scoob:stu'), 123)
+        self.assertEqual(driver.get('blah.scoob:stu:raghu'), 1000)
+        self.assertEqual(h[7], 5)
+
+        self.assertEqual(h._get_key('stu'), h['stu'])
+        self.assertEqual(h._get_parts('stu', 'raghu'), h['stu', 'raghu'])
+        self.assertEqual(h._get_key(('stu', 'raghu')), 1000)
+        self.assertEqual(h._get_key('nobody'), 0)
+
+    def test_fast_accessors_fail_like_subscripts(self):
+        h = Hash('blah', 'scoob', driver=driver)
+
+        bad_keys = [
+            ('stu:123',),
+            ('stu.123',),
+            ('a' * 1025,),
+            ('stu', 'raghu:1'),
+            ('stu', 'raghu.1'),
+            ('stu', slice(1, 2)),
+            ('a' * 800, 'b' * 100, 'c' * 200),
+        ]
+
+        for key in bad_keys:
+            subscript = key[0] if len(key) == 1 else key
+
+            with self.assertRaises(AssertionError) as expected:
+                h[subscript] = 1
+
+            with self.assertRaises(AssertionError) as fast:
+                if len(key) == 1:
+                    h._set_key(1, key[0])
+                else:
+                    h._set_parts(1, *key)
+            self.assertEqual(str(fast.exception), str(expected.exception))
+
+            with self.assertRaises(AssertionError) as fast:
+                if len(key) == 1:
+                    h._get_key(key[0])
+                else:
+                    h._get_parts(*key)
+            self.assertEqual(str(fast.exception), str(expected.exception))
+
+    def test_update_reads_and_writes_like_augmented_subscripts(self):
+        class RecordingDriver(ContractDriver):
+            def __init__(self):
+                super().__init__()
+                self.calls = []
+
+            def get(self, key, mark=True):
+                value = super().get(key, mark=mark)
+                self.calls.append(('get', key, value))
+                return value
+
+            def set(self, key, value, mark=True):
+                self.calls.append(('set', key, value))
+                super().set(key, value, mark=mark)
+
+        subscripts, updates = RecordingDriver(), RecordingDriver()
+
+        h = Hash('blah', 'scoob', driver=subscripts, default_value=0)
+        h['stu'] += 5
+        h['stu', 'raghu'] -= 1.5
+        h['stu'] **= 2
+
+        u = Hash('blah', 'scoob', driver=updates, default_value=0)
+        u._update(u._read_key('stu'), '+=', 5)
+        u._update(u._read_parts('stu', 'raghu'), '-=', 1.5)
+        u._update(u._read_key('stu'), '**=', 2)
+
+        self.assertEqual(updates.calls, subscripts.calls)
+        self.assertEqual(u['stu'], 25)
+
+        subscripts.flush()
+
+    def test_read_key_fails_like_subscripts(self):
+        h = Hash('blah', 'scoob', driver=driver)
+
+        with self.assertRaises(AssertionError):
+            h._read_key('stu:123')
+
+        with self.assertRaises(AssertionError):
+            h._read_parts('stu', 'raghu.1')
+
+    def test_get_key_checks_dimensions_of_a_tuple_value(self):
+        h = Hash('blah', 'scoob', driver=driver)
+
+        with self.assertRaises(AssertionError):
+            h._get_key(('a',) * 17)
+
+    def test_iter_yields_keys_as_subscripted(self):
+        h = Hash('blah', 'scoob', driver=driver)
+
+        h['stu'] = 1
+        h['stu', 'raghu'] = 2
+        h['stu', 'tejas'] = 3
+        h['x'] = 4
+
+        self.assertEqual(list(h.iter()), [('stu', 1), (('stu', 'raghu'), 2), (('stu', 'tejas'), 3), ('x', 4)])
+        self.assertEqual(list(h.iter('stu')), [(('stu', 'raghu'), 2), (('stu', 'tejas'), 3)])
+
+    def test_iter_pages(self):
+        h = Hash('blah', 'scoob', driver=driver)
+        for account in ['a', 'b', 'c', 'd', 'e']:
+            h[account] = account
+
+        first = list(h.iter(limit=2))
+        second = list(h.iter(start_after=first[-1][0], limit=2))
+
+        self.assertEqual([k for k, _ in first + second], ['a', 'b', 'c', 'd'])
+
+    def test_iter_start_after_is_validated(self):
+        h = Hash('blah', 'scoob', driver=driver)
+
+        with self.assertRaises(AssertionError):
+            list(h.iter(start_after='a:b'))
+
+    def test_remembered_keys_match_the_values_given(self):
+        h = Hash('blah', 'scoob', driver=driver)
+
+        h['stu', 'raghu'] = 1
+        h['stu', 'raghu'] = 2
+        h[1, 'x'] = 'one'
+        h[True, 'x'] = 'true'
+        h['1', 'x'] += '!'
+
+        self.assertEqual(h._keys, {('stu', 'raghu'): 'stu:raghu', ('1', 'x'): '1:x'})
+
+        self.assertEqual(driver.get('blah.scoob:stu:raghu'), 2)
+        self.assertEqual(driver.get('blah.scoob:1:x'), 'one!')
+        self.assertEqual(driver.get('blah.scoob:True:x'), 'true')
+
+    def test_keys_that_fail_are_not_remembered(self):
+        h = Hash('blah', 'scoob', driver=driver)
+
+        for _ in range(2):
+            with self.assertRaises(AssertionError):
+                h['stu', 'raghu:1'] = 1
+
+        h[['stu'], 'raghu'] = 1
+        self.assertEqual(h._keys, {})
+        self.assertEqual(driver.get("blah.scoob:['stu']:raghu"), 1)
+
+    def test_no_instance_dict(self):
+        h = Hash('blah', 'scoob', driver=driver)
+        v = Variable('blah', 'scoob', driver=driver)
+
+        with self.assertRaises(AttributeError):
+            h.extra = 1
+
+        with self.assertRaises(AttributeError):
+            v.extra = 1
+
     def test_get_all_when_none_exist(self):
         contract = 'blah'
         name = 'scoob'
@@ -513,6 +674,26 @@ class TestHash(TestCase):
 
         self.assertDictEqual({}, got)
 
+    def test_clear_applies_within_the_transaction(self):
+        h = Hash('blah', 'scoob', driver=driver, default_value=0)
+
+        h['1'] = 123
+        h[2, '1'] = 456
+        driver.commit()
+        driver.clear_pending_state()
+
+        h.clear()
+        h['3'] = 789
+
+        self.assertEqual(h['1'], 0)
+        self.assertEqual(h[2, '1'], 0)
+        self.assertEqual(list(h.iter()), [('3', 789)])
+
+        driver.commit()
+        driver.clear_pending_state()
+
+        self.assertDictEqual(h._items(), {'blah.scoob:3': 789})
+
 
 class TestForeignVariable(TestCase):
     def setUp(self):
@@ -599,6 +780,34 @@ class TestForeignHash(TestCase):
         with self.assertRaises(ReferenceError):
             f['stu'] = 1234
 
+    def test_fast_setters(self):
+        f = ForeignHash('stustu', 'balance', 'colinbucks', 'balances', driver=driver)
+
+        with self.assertRaises(ReferenceError):
+            f._set_key(1234, 'stu')
+
+        with self.assertRaises(ReferenceError):
+            f._set_parts(1234, 'stu', 'raghu')
+
+    def test_update(self):
+        f = ForeignHash('stustu', 'balance', 'colinbucks', 'balances', driver=driver)
+
+        h = Hash('colinbucks', 'balances', driver=driver)
+        h['stu'] = 1
+
+        with self.assertRaises(ReferenceError):
+            f._update(f._read_key('stu'), '+=', 1)
+
+    def test_fast_getters(self):
+        f = ForeignHash('stustu', 'balance', 'colinbucks', 'balances', driver=driver)
+
+        h = Hash('colinbucks', 'balances', driver=driver)
+        h['howdy'] = 555
+        h['howdy', 'there'] = 777
+
+        self.assertEqual(f._get_key('howdy'), 555)
+        self.assertEqual(f._get_parts('howdy', 'there'), 777)
+
     def test_getitem(self):
         # set up the foreign variable
         contract = 'stustu'
@@ -613,3 +822,172 @@ class TestForeignHash(TestCase):
         h['howdy'] = 555
 
         self.assertEqual(f['howdy'], 555)
+
+
+class TestOrderedHash(TestCase):
+    def setUp(self):
+        driver.flush()
+
+    def tearDown(self):
+        driver.flush()
+
+    def test_order_keys_sort_largest_first(self):
+        values = [10 ** 40, 100, 99, 10, 9, 1.23, ContractingDecimal('1.201'), 1.2, 1, 0.5, 0.001, 0, -0.001, -1,
+                  -1.2, -1.201, -1.23, -10, -10 ** 40]
+
+        entries = [order_key(v) + ':key' for v in values]
+
+        self.assertEqual(sorted(entries), entries)
+        self.assertEqual(order_key(1), order_key(1.0))
+        self.assertEqual(order_key(2), order_key(ContractingDecimal('2.000')))
+
+    def test_only_numbers_are_ordered(self):
+        h = OrderedHash('blah', 'scoob', driver=driver)
+
+        for value in ['1', True, [1], float('inf')]:
+            with self.assertRaises(AssertionError):
+                h['stu'] = value
+
+        self.assertIsNone(h['stu'])
+
+    def test_top_follows_changes(self):
+        h = OrderedHash('blah', 'scoob', driver=driver, default_value=0)
+
+        h['stu'] = 5
+        h['raghu'] = 10
+        h['tejas'] = 10
+        h['colin'] = 1
+
+        self.assertEqual(h.top(3), [('raghu', 10), ('tejas', 10), ('stu', 5)])
+
+        h['stu'] += 20
+        h['raghu'] = None
+
+        self.assertEqual(h.top(10), [('stu', 25), ('tejas', 10), ('colin', 1)])
+        self.assertEqual(h.top(0), [])
+
+    def test_range(self):
+        h = OrderedHash('blah', 'scoob', driver=driver)
+
+        for i, key in enumerate(['', 'a', 'b', 'c', 'd']):
+            h[key] = i * 10
+
+        self.assertEqual(h.range(10, 30), [('c', 30), ('b', 20), ('a', 10)])
+        self.assertEqual(h.range(hi=0), [('', 0)])
+        self.assertEqual(h.range(lo=35), [('d', 40)])
+        self.assertEqual(h.range(11, 19), [])
+
+    def test_rank(self):
+        h = OrderedHash('blah', 'scoob', driver=driver)
+
+        h['stu'] = 3
+        h['raghu'] = 2
+        h['tejas', 'x'] = 1
+
+        self.assertEqual(h.rank('stu'), 0)
+        self.assertEqual(h.rank(('tejas', 'x')), 2)
+        self.assertIsNone(h.rank('colin'))
+
+    def test_multi_dimensional_keys(self):
+        h = OrderedHash('blah', 'scoob', driver=driver)
+
+        h['votes', 'stu'] = 1
+        h['votes', 'raghu'] = 2
+        h['other'] = 3
+
+        self.assertEqual(h.top(2), [('other', 3), (('votes', 'raghu'), 2)])
+
+    def test_clear_part_of_the_hash(self):
+        h = OrderedHash('blah', 'scoob', driver=driver)
+
+        h['votes', 'stu'] = 1
+        h['votes', 'raghu'] = 2
+        h['other'] = 3
+        driver.commit()
+
+        h.clear('votes')
+
+        self.assertEqual(h.top(10), [('other', 3)])
+
+        h.clear()
+        driver.commit()
+        driver.clear_pending_state()
+
+        self.assertEqual(h.top(10), [])
+        self.assertEqual(driver.driver.keys(), [])
+
+
+class TestCounter(TestCase):
+    def setUp(self):
+        driver.flush()
+
+    def tearDown(self):
+        driver.flush()
+
+    def test_adding_does_not_read(self):
+        c = Counter('blah', 'scoob', driver=driver)
+
+        c.add('stu', 5)
+        c._update(c._read_key('stu'), '+=', 2)
+        c._update(c._read_parts('stu', 'raghu'), '-=', 3)
+
+        self.assertEqual(driver.reads, set())
+        self.assertEqual(driver.pending_deltas, {'blah.scoob:stu': 7, 'blah.scoob:stu:raghu': -3})
+
+        self.assertEqual(c['stu'], 7)
+        self.assertEqual(c['stu', 'raghu'], -3)
+        self.assertEqual(c['nobody'], 0)
+
+    def test_other_operators_read(self):
+        c = Counter('blah', 'scoob', driver=driver)
+        c['stu'] = 3
+        driver.commit()
+        driver.clear_pending_state()
+
+        c._update(c._read_key('stu'), '*=', 2)
+
+        self.assertEqual(driver.reads, {'blah.scoob:stu'})
+        self.assertEqual(c['stu'], 6)
+
+    def test_only_numbers_are_added(self):
+        c = Counter('blah', 'scoob', driver=driver)
+
+        with self.assertRaises(AssertionError):
+            c.add('stu', '1')
+
+        with self.assertRaises(AssertionError):
+            c._update(c._read_key('stu'), '-=', '1')
+
+    def test_deltas_are_summed_at_commit(self):
+        c = Counter('blah', 'scoob', driver=driver)
+        c['stu'] = ContractingDecimal('1.5')
+        driver.commit()
+        driver.clear_pending_state()
+
+        c.add('stu', 1)
+        c.add(('stu', 'x'), 2)
+        driver.commit()
+        driver.clear_pending_state()
+
+        self.assertEqual(c['stu'], ContractingDecimal('2.5'))
+        self.assertEqual(c['stu', 'x'], 2)
+
+
+class TestContractWrappers(TestCase):
+    def test_wrappers_have_no_instance_dict(self):
+        exports = gather()
+        objects = [
+            exports['Variable'](contract='c', name='v', driver=driver),
+            exports['Hash'](contract='c', name='h', driver=driver),
+            exports['ForeignVariable'](contract='c', name='fv', foreign_contract='d', foreign_name='v', driver=driver),
+            exports['ForeignHash'](contract='c', name='fh', foreign_contract='d', foreign_name='h', driver=driver),
+            exports['OrderedHash'](contract='c', name='oh', driver=driver),
+            exports['Counter'](contract='c', name='co', driver=driver)
+        ]
+
+        for o in objects:
+            with self.subTest(type=type(o).__name__):
+                self.assertFalse(hasattr(o, '__dict__'))
+
+                with self.assertRaises(AttributeError):
+                    o.key = 'other.balances'
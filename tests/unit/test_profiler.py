@@ -0,0 +1,126 @@
+from unittest import TestCase
+from contracting.execution.metering import profiler
+from contracting.execution import runtime
+import io
+
+CONTRACT_CODE = """
+def helper(n):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+def work(n, charge):
+    charge(500, 'read')
+    return helper(n)
+"""
+
+
+def untraced_charge(tracer):
+    # State access happens in driver code outside the contract, so it is charged to the nearest contract frame
+    def charge(cost, kind):
+        tracer.add_cost(cost, kind)
+    return charge
+
+
+class TestTracerProfile(TestCase):
+    def setUp(self):
+        globals().pop('__contract__', None)
+
+        self.scope = {'__contract__': True, '__name__': 'stu'}
+        exec(compile(CONTRACT_CODE, '<stu>', 'exec'), self.scope)
+
+        self.r = runtime.Runtime()
+
+    def run_profiled(self, profile=True):
+        self.r.set_up(stmps=10 ** 9, meter=True, profile=profile)
+        self.scope['work'](10, untraced_charge(self.r.tracer))
+        self.r.tracer.stop()
+
+        used = self.r.tracer.get_stamp_used()
+        costs = self.r.tracer.get_profile()
+        self.r.clean_up()
+
+        return used, costs
+
+    def test_profile_adds_up_to_stamps_used(self):
+        used, costs = self.run_profiled()
+
+        self.assertGreater(used, 0)
+        self.assertEqual(sum(costs.values()), used)
+
+    def test_costs_are_attributed_to_contract_lines(self):
+        _, costs = self.run_profiled()
+        functions = {(contract, function) for contract, function, _, _ in costs}
+
+        self.assertEqual(functions, {('stu', 'helper'), ('stu', 'work')})
+
+        # The loop body runs on every iteration, the return once
+        lines = {line: cost for (_, function, line, kind), cost in costs.items() if function == 'helper'}
+        self.assertGreater(lines[5], lines[6])
+
+    def test_add_cost_kinds_go_to_calling_contract_line(self):
+        _, costs = self.run_profiled()
+
+        self.assertEqual(costs[('stu', 'work', 9, 'read')], 500)
+
+    def test_profiling_does_not_change_cost(self):
+        profiled, _ = self.run_profiled()
+        unprofiled, costs = self.run_profiled(profile=False)
+
+        self.assertEqual(profiled, unprofiled)
+        self.assertEqual(costs, {})
+
+    def test_charges_outside_contracts_have_no_contract(self):
+        self.r.set_up(stmps=10 ** 9, meter=True, profile=True)
+        self.r.tracer.add_cost(10, profiler.WRITE)
+        self.r.tracer.stop()
+
+        self.assertEqual(self.r.tracer.get_profile(), {(None, None, 0, profiler.WRITE): 10})
+        self.r.clean_up()
+
+    def test_profiling_cannot_be_switched_while_running(self):
+        self.r.set_up(stmps=10 ** 9, meter=True)
+
+        try:
+            with self.assertRaises(RuntimeError):
+                self.r.tracer.set_profile(True)
+        finally:
+            self.r.clean_up()
+
+
+class TestProfileRows(TestCase):
+    PROFILE = {
+        ('stu', 'f', 3, profiler.EXECUTION): 10,
+        ('stu', 'f', 4, profiler.READ): 40,
+        ('stu', 'g', 8, profiler.EXECUTION): 25,
+        (None, None, 0, profiler.READ): 5
+    }
+
+    def test_entries_are_sorted_by_cost(self):
+        rows = profiler.entries(self.PROFILE)
+
+        self.assertEqual([row['cost'] for row in rows], [40, 25, 10, 5])
+        self.assertEqual(rows[0], {'contract': 'stu', 'function': 'f', 'line': 4, 'kind': 'read', 'cost': 40})
+
+    def test_merge_sums_rows(self):
+        rows = profiler.entries(self.PROFILE)
+        merged = profiler.merge(rows + rows)
+
+        self.assertEqual(merged[('stu', 'f', 3, profiler.EXECUTION)], 20)
+
+    def test_by_function(self):
+        totals = profiler.by_function(profiler.entries(self.PROFILE))
+
+        self.assertEqual(totals[0], (('stu', 'f'), 50))
+
+    def test_collapsed_stacks(self):
+        out = io.StringIO()
+        profiler.write_collapsed(profiler.entries(self.PROFILE), out)
+
+        self.assertEqual(out.getvalue().splitlines(), [
+            'stu;f;line 4;read 40',
+            'stu;g;line 8;execution 25',
+            'stu;f;line 3;execution 10',
+            '<runtime>;read 5'
+        ])
@@ -1,8 +1,10 @@
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 from contracting.execution import runtime
+from contracting import config
 import sys
 import psutil
 import os
+import threading
 
 
 class TestRuntime(TestCase):
@@ -111,3 +113,172 @@ class TestRuntime(TestCase):
 
         runtime.rt.clean_up()
         print(used_1)
+
+
+CONTRACT_CODE = """
+def heavy(n):
+    return sum([i * 2 for i in range(n)])
+"""
+
+
+def metered_cost(mode, n=100):
+    scope = {'__contract__': True}
+    exec(CONTRACT_CODE, scope)
+
+    r = runtime.Runtime()
+    r.set_up(stmps=10 ** 12, meter=True, mode=mode)
+    scope['heavy'](n)
+    r.tracer.stop()
+    used = r.tracer.get_stamp_used()
+    r.clean_up()
+
+    return used
+
+
+class TestMeteringModes(TestCase):
+    def setUp(self):
+        # Tests above leave __contract__ in this module's globals, which would meter the test code itself
+        globals().pop('__contract__', None)
+
+    @skipUnless(sys.version_info >= (3, 7), 'Opcode tracing requires Python 3.7 or newer.')
+    def test_opcode_mode_charges_every_instruction(self):
+        short = metered_cost(config.METERING_OPCODE, n=10)
+        long = metered_cost(config.METERING_OPCODE, n=1000)
+
+        # The same single line, but a hundred times the iterations of the comprehension
+        self.assertGreater(long, short * 10)
+
+    @skipUnless(sys.version_info >= (3, 7), 'Opcode tracing requires Python 3.7 or newer.')
+    def test_opcode_mode_is_deterministic(self):
+        self.assertEqual(metered_cost(config.METERING_OPCODE), metered_cost(config.METERING_OPCODE))
+
+    @skipUnless(sys.version_info >= (3, 7), 'Opcode tracing requires Python 3.7 or newer.')
+    def test_opcode_mode_enforces_stamp_limit(self):
+        scope = {'__contract__': True}
+        exec(CONTRACT_CODE, scope)
+
+        r = runtime.Runtime()
+        r.set_up(stmps=1000, meter=True, mode=config.METERING_OPCODE)
+        with self.assertRaises(AssertionError):
+            scope['heavy'](100)
+        r.clean_up()
+
+    def test_mode_cannot_change_while_running(self):
+        r = runtime.Runtime()
+        r.set_up(stmps=1000, meter=True)
+
+        with self.assertRaises(RuntimeError):
+            r.tracer.set_mode(runtime.MODE_LINE)
+
+        r.clean_up()
+
+    def test_unknown_mode_raises(self):
+        with self.assertRaises(ValueError):
+            runtime.Runtime().tracer.set_mode(5)
+
+    def test_bad_stamp_raises(self):
+        with self.assertRaises(TypeError):
+            runtime.Runtime().tracer.set_stamp('lots')
+
+
+class TestContractFrameDetection(TestCase):
+    def setUp(self):
+        globals().pop('__contract__', None)
+
+    def metered(self, *scopes):
+        code = compile('x = 0\nfor i in range(10):\n    x += i\n', '<test>', 'exec')
+
+        r = runtime.Runtime()
+        r.set_up(stmps=10 ** 12, meter=True)
+        for scope in scopes:
+            exec(code, scope)
+        r.tracer.stop()
+        used = r.tracer.get_stamp_used()
+        r.clean_up()
+
+        return used
+
+    def test_same_code_is_only_metered_with_contract_globals(self):
+        contract_only = self.metered({'__contract__': True})
+        mixed = self.metered({'__contract__': True}, {}, {})
+
+        self.assertGreater(contract_only, 0)
+        self.assertEqual(contract_only, mixed)
+
+    def test_non_contract_code_is_free(self):
+        self.assertEqual(self.metered({}), 0)
+
+    def test_many_code_objects_are_metered_consistently(self):
+        r = runtime.Runtime()
+        r.set_up(stmps=10 ** 12, meter=True)
+        for i in range(2000):
+            exec(compile('x = {}'.format(i), '<test>', 'exec'), {'__contract__': True})
+        r.tracer.stop()
+        many = r.tracer.get_stamp_used()
+        r.clean_up()
+
+        r.set_up(stmps=10 ** 12, meter=True)
+        exec(compile('x = 0', '<test>', 'exec'), {'__contract__': True})
+        r.tracer.stop()
+        one = r.tracer.get_stamp_used()
+        r.clean_up()
+
+        self.assertEqual(many, one * 2000)
+
+
+class TestRuntimeScoping(TestCase):
+    def test_runtimes_do_not_share_state(self):
+        a = runtime.Runtime()
+        b = runtime.Runtime()
+
+        a.env['x'] = 1
+
+        self.assertIsNone(b.env.get('x'))
+        self.assertIsNot(a.tracer, b.tracer)
+        self.assertIsNot(a.context, b.context)
+
+    def test_rt_resolves_to_active_runtime(self):
+        r = runtime.Runtime()
+
+        with r:
+            self.assertIs(runtime.get_runtime(), r)
+            runtime.rt.env['x'] = 1
+
+        self.assertEqual(r.env['x'], 1)
+        self.assertIs(runtime.get_runtime(), runtime.default_runtime)
+        self.assertIsNone(runtime.default_runtime.env.get('x'))
+
+    def test_nested_runtimes_restore_outer(self):
+        a = runtime.Runtime()
+        b = runtime.Runtime()
+
+        with a:
+            with b:
+                self.assertIs(runtime.get_runtime(), b)
+            self.assertIs(runtime.get_runtime(), a)
+
+    def test_active_runtime_is_per_thread(self):
+        r = runtime.Runtime()
+        seen = []
+
+        with r:
+            t = threading.Thread(target=lambda: seen.append(runtime.get_runtime()))
+            t.start()
+            t.join()
+
+        self.assertIs(seen[0], runtime.default_runtime)
+
+    def test_ctx_resolves_to_active_context(self):
+        r = runtime.Runtime()
+        r.context._base_state = {
+            'this': 'thing',
+            'caller': 'stu',
+            'owner': None,
+            'signer': 'stu'
+        }
+
+        with r:
+            self.assertEqual(runtime.ctx.caller, 'stu')
+            self.assertEqual(runtime.ctx.this, 'thing')
+
+        self.assertIsNone(runtime.ctx.caller)
@@ -0,0 +1,73 @@
+from unittest import TestCase
+from contracting.compilation.compiler import ContractingCompiler
+from contracting.compilation.linter import Linter
+import glob
+import ast
+import os
+
+TESTS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTRACTS = sorted(glob.glob(os.path.join(TESTS, '**', '*.s.py'), recursive=True))
+
+
+def two_pass(source, name):
+    # What compiling used to do: lint the whole tree, then transform it in a second walk
+    alerts = Linter().check(ast.parse(source))
+    if alerts is not None:
+        return 'alerts', sorted(alerts)
+
+    return 'code', ContractingCompiler(module_name=name).parse_to_code(source, lint=False)
+
+
+def single_pass(source, name):
+    try:
+        return 'code', ContractingCompiler(module_name=name, linter=Linter()).parse_to_code(source)
+    except Exception as e:
+        return 'alerts', sorted(e.args[0])
+
+
+class TestSinglePassCompile(TestCase):
+    def test_contracts_are_found(self):
+        self.assertGreater(len(CONTRACTS), 50)
+
+    def test_same_code_and_violations_as_two_passes(self):
+        # The final checks report from sets, so violations are compared without their order
+        for path in CONTRACTS:
+            with open(path) as f:
+                source = f.read()
+
+            name = os.path.basename(path).split('.')[0]
+            with self.subTest(contract=name):
+                self.assertEqual(single_pass(source, name), two_pass(source, name))
+
+    def test_decorators_are_linted_as_written(self):
+        source = '''
+@export
+def f():
+    return 1
+'''
+        # The compiler rewrites @export to @__export, which the linter would flag if it saw it
+        c = ContractingCompiler(module_name='stu', linter=Linter())
+        self.assertIn("__export('stu')", c.parse_to_code(source))
+
+    def test_private_function_named_like_a_decorator(self):
+        source = '''
+def export():
+    return 1
+
+@export
+def f():
+    return export()
+'''
+        code = ContractingCompiler(module_name='stu').parse_to_code(source, lint=False)
+
+        self.assertIn("@__export('stu')", code)
+        self.assertIn('return __export()', code)
+        self.assertNotIn('____export', code)
+
+    def test_linter_is_reset_between_contracts(self):
+        c = ContractingCompiler(module_name='stu', linter=Linter())
+
+        with self.assertRaises(Exception):
+            c.parse_to_code('import sys\n')
+
+        self.assertIn('def f', c.parse_to_code('@export\ndef f():\n    return 1\n'))
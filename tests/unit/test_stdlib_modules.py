@@ -0,0 +1,33 @@
+from unittest import TestCase
+from contracting.compilation.whitelists import STDLIB_MODULES, is_stdlib_module
+from contracting.compilation.stdlib_modules import MODULES
+from contracting.compilation.linter import Linter
+from contracting.stdlib.bridge import imports
+import ast
+
+
+class TestStdlibModules(TestCase):
+    def test_modules_are_known_for_this_version(self):
+        self.assertIsInstance(STDLIB_MODULES, frozenset)
+        self.assertIn('os', STDLIB_MODULES)
+        self.assertIn('__main__', STDLIB_MODULES)
+
+    def test_table_covers_versions_without_stdlib_module_names(self):
+        for minor in range(6, 10):
+            self.assertIn('json', MODULES[(3, minor)])
+
+    def test_submodules_count_as_their_package(self):
+        self.assertTrue(is_stdlib_module('os.path'))
+        self.assertTrue(is_stdlib_module('xml.dom.minidom'))
+        self.assertFalse(is_stdlib_module('currency'))
+        self.assertFalse(is_stdlib_module('os_helpers'))
+
+    def test_linter_rejects_stdlib_imports(self):
+        violations = Linter().check(ast.parse('import os.path\n\n@export\ndef f():\n    return 1\n'))
+
+        self.assertEqual(len(violations), 1)
+        self.assertIn('S14', violations[0])
+
+    def test_dynamic_import_of_stdlib_module_fails(self):
+        with self.assertRaises(ImportError):
+            imports.import_module('sys')